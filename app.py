@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 import argparse
-import functools
-import json
 import logging
 import multiprocessing
 import os
@@ -31,6 +29,7 @@ import middleware.auth
 import middleware.decompressor
 import middleware.json_translator
 import middleware.route_feature_check as rfc
+import middleware.single_flight
 import osinfo
 import paths
 import rescore
@@ -57,7 +56,19 @@ def parse_args():
     parser.add_argument('--delivery-db-cfg', default='internal')
     parser.add_argument('--delivery-endpoints', default='internal')
     parser.add_argument('--delivery-db-url', default=None)
+    parser.add_argument(
+        '--delivery-db-replica-url',
+        action='append',
+        default=[],
+        help='read-replica of the delivery-db used for read-only requests, may be repeated',
+    )
     parser.add_argument('--cache-dir', default=default_cache_dir)
+    parser.add_argument(
+        '--artefact-blob-chunk-size',
+        type=int,
+        default=artefacts.DEFAULT_CHUNK_SIZE_BYTES,
+        help='size (in bytes) of the chunks artefact blobs are streamed with',
+    )
     parser.add_argument('--es-config-name', default='sap_internal')
     parser.add_argument(
         '--invalid-semver-ok',
@@ -121,6 +132,9 @@ def init(parsed_arguments):
         )
         middlewares.append(rfc.ShortcutRoutesWithUnavailableFeatures(unavailable_features))
 
+    # must be the last middleware processing resources (see `SingleFlight`)
+    middlewares.append(middleware.single_flight.SingleFlight())
+
     oci_client = lookups.semver_sanitised_oci_client(
         cfg_factory=cfg_factory,
     )
@@ -272,11 +286,22 @@ def init_app(
         features.Features()
     )
 
+    app.add_route(
+        '/delivery-db/pool',
+        features.DeliveryDBPool(),
+    )
+
+    app.add_route(
+        '/github/request-scheduler',
+        features.GitHubRequestSchedulerMetrics(),
+    )
+
     app.add_route(
       '/ocm/artefacts/blob',
       artefacts.ArtefactBlob(
           component_descriptor_lookup=component_descriptor_lookup,
           oci_client=oci_client,
+          chunk_size=parsed_arguments.artefact_blob_chunk_size,
       ),
     )
 
@@ -533,9 +558,10 @@ def init_app(
         ),
     )
 
-    app.resp_options.media_handlers[falcon.MEDIA_JSON] = falcon.media.JSONHandler(
-        dumps=functools.partial(json.dumps, default=middleware.json_translator.json_serializer),
-    )
+    # uses `orjson` if available
+    json_handler = middleware.json_translator.json_handler()
+    app.req_options.media_handlers[falcon.MEDIA_JSON] = json_handler
+    app.resp_options.media_handlers[falcon.MEDIA_JSON] = json_handler
 
     app.add_error_handler(
         exception=Exception,
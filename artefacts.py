@@ -3,18 +3,98 @@ import zlib
 
 import falcon
 
+import oci.client
 import oci.model
 import ocm
 
+import util
+
+
+# larger chunks considerably reduce overhead (in python) for large blobs
+DEFAULT_CHUNK_SIZE_BYTES = 1024 * 1024
+
+
+def _byte_range(
+    req_range: tuple[int, int],
+    size: int,
+) -> tuple[int, int]:
+    '''
+    resolves the range as returned by `falcon.Request.range` to absolute (inclusive) positions
+    '''
+    first, last = req_range
+
+    if first < 0:
+        # suffix-range (i.e. last n bytes)
+        return max(size + first, 0), size - 1
+
+    if first >= size:
+        raise falcon.HTTPRangeNotSatisfiable(resource_length=size)
+
+    if last < 0 or last >= size:
+        last = size - 1
+
+    return first, last
+
+
+def _iter_byte_range(
+    chunks,
+    first: int,
+    last: int,
+):
+    '''
+    yields the requested byte range from the chunks of the complete blob
+    '''
+    pos = 0
+    for chunk in chunks:
+        start = max(first - pos, 0)
+        end = min(last + 1 - pos, len(chunk))
+        pos += len(chunk)
+
+        if start < end:
+            yield chunk[start:end]
+        if pos > last:
+            break
+
+
+def _ranged_blob(
+    oci_client: oci.client.Client,
+    image_reference: str,
+    digest: str,
+    first: int,
+    last: int,
+    chunk_size: int,
+):
+    '''
+    retrieves the given byte range of the blob from the OCI registry; as `oci.client.Client.blob`
+    does not allow passing a `Range` header, the blob is streamed and skipped up to the range (and
+    not read beyond it)
+    '''
+    blob = oci_client.blob(
+        image_reference=image_reference,
+        digest=digest,
+        stream=True,
+        absent_ok=True,
+    )
+    if blob is None:
+        raise falcon.HTTPNotFound(title=f'did not find blob {digest}')
+
+    return _iter_byte_range(
+        chunks=blob.iter_content(chunk_size=chunk_size),
+        first=first,
+        last=last,
+    )
+
 
 class ArtefactBlob:
     def __init__(
         self,
         component_descriptor_lookup,
         oci_client,
+        chunk_size: int=DEFAULT_CHUNK_SIZE_BYTES,
     ):
         self.component_descriptor_lookup = component_descriptor_lookup
         self.oci_client = oci_client
+        self.chunk_size = chunk_size
 
     def on_get(self, req: falcon.Request, resp: falcon.Response):
         '''
@@ -35,6 +115,13 @@ class ArtefactBlob:
                         content will be unzipped (for convenience)
 
         If artefact is not specified unambiguously, the first match will be used.
+
+        As blobs are immutable, responses carry the blob digest as ETag and may be cached by clients
+        indefinitely. Conditional requests (`If-None-Match`) are answered without retrieving the
+        blob.
+
+        Unless the content is unzipped, single byte ranges may be requested (`Range`, optionally
+        guarded by `If-Range`) to resume interrupted downloads.
         '''
         component_id = req.get_param(
             'component',
@@ -106,11 +193,58 @@ class ArtefactBlob:
             digest = access.localReference
             size = access.size
 
-        blob = self.oci_client.blob(
-            image_reference=component.current_ocm_repo.component_oci_ref(component),
-            digest=digest,
-            absent_ok=True,
-        )
+        unzip = unzip and access.mediaType == 'application/gzip'
+
+        # blobs are content-addressed, hence the digest identifies the representation (unless it
+        # is unzipped)
+        etag = f'{digest}+unzipped' if unzip else digest
+        resp.cache_control = util.IMMUTABLE_CACHE_CONTROL
+        if util.is_not_modified(
+            req=req,
+            resp=resp,
+            etag=etag,
+        ):
+            return
+
+        image_reference = component.current_ocm_repo.component_oci_ref(component)
+
+        # size of unzipped content is not known upfront
+        byte_range = None
+        if unzip or size is None:
+            resp.accept_ranges = 'none'
+        else:
+            resp.accept_ranges = 'bytes'
+
+            try:
+                req_range = req.range if req.range_unit == 'bytes' else None
+            except falcon.HTTPInvalidHeader:
+                # unsupported (e.g. multiple) ranges are ignored
+                req_range = None
+
+            # partial content must only be returned if representation did not change meanwhile
+            if_range = req.get_header('If-Range')
+            if req_range and (not if_range or if_range.strip() == f'"{etag}"'):
+                byte_range = _byte_range(req_range=req_range, size=size)
+
+        if byte_range:
+            first, last = byte_range
+            blob_chunks = _ranged_blob(
+                oci_client=self.oci_client,
+                image_reference=image_reference,
+                digest=digest,
+                first=first,
+                last=last,
+                chunk_size=self.chunk_size,
+            )
+        else:
+            blob = self.oci_client.blob(
+                image_reference=image_reference,
+                digest=digest,
+                absent_ok=True,
+            )
+            if blob is None:
+                raise falcon.HTTPNotFound(title=f'did not find blob {digest}')
+            blob_chunks = blob.iter_content(chunk_size=self.chunk_size)
 
         if access.mediaType == 'application/pdf':
             file_ending = '.pdf'
@@ -127,10 +261,10 @@ class ArtefactBlob:
         # https://developer.mozilla.org/en-US/docs/Web/HTML/Element/a#attributes
         resp.set_header('Content-Disposition', f'attachment; filename="{fname}"')
 
-        if unzip and access.mediaType == 'application/gzip':
+        if unzip:
             def iter_uncompressed():
                 decompressor = zlib.decompressobj(wbits=31)
-                for chunk in blob.iter_content(chunk_size=4096):
+                for chunk in blob_chunks:
                     yield decompressor.decompress(chunk)
                 yield decompressor.flush()
 
@@ -139,5 +273,11 @@ class ArtefactBlob:
             return
 
         resp.content_type = access.mediaType
-        resp.content_length = size
-        resp.stream = blob.iter_content(chunk_size=4096)
+        resp.stream = blob_chunks
+
+        if byte_range:
+            resp.status = falcon.HTTP_206
+            resp.content_range = (first, last, size)
+            resp.content_length = last - first + 1
+        elif size is not None:
+            resp.content_length = size
@@ -1,16 +1,48 @@
 import collections
-import datetime
+import contextlib
 import hashlib
+import logging
 import os
 import pickle
+import re
+import sqlite3
+import tempfile
 import threading
+import time
 
 import cachetools.keys
 
+import sqlite_util
+
+
+logger = logging.getLogger(__name__)
 
 own_dir = os.path.abspath(os.path.dirname(__file__))
 default_cache_dir = os.path.join(own_dir, '.cache', 'dora')
 
+# file names starting with a dot are reserved for the index and temporary files
+index_filename = '.index.sqlite'
+tmp_file_prefix = '.tmp-'
+
+
+def _write_atomically(filepath: str, data: bytes):
+    '''
+    writes `data` to a temporary file within the same directory and renames it afterwards, hence
+    concurrent readers either see the previous file or the complete new one
+    '''
+    cache_dir = os.path.dirname(filepath)
+    os.makedirs(name=cache_dir, exist_ok=True)
+
+    fd, tmp_filepath = tempfile.mkstemp(dir=cache_dir, prefix=tmp_file_prefix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_filepath)
+        raise
+
 
 class FilesystemCache:
     '''
@@ -18,26 +50,96 @@ class FilesystemCache:
     take care of clearing the cache, e.g. if it reaches a certain size.
     '''
     def __get_item__(self, filepath: str):
-        if os.path.exists(filepath):
-            return pickle.load(open(filepath, 'rb'))
-        raise self.__missing__(filepath)
+        try:
+            with open(filepath, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
 
-    def __set_item__(self, filepath: str, value):
-        cache_dir = os.path.dirname(filepath)
-        if not os.path.isdir(cache_dir):
-            os.makedirs(name=cache_dir, exist_ok=True)
+        return self.__missing__(filepath)
 
-        pickle.dump(value, open(filepath, 'wb'))
+    def __set_item__(self, filepath: str, value):
+        _write_atomically(filepath, pickle.dumps(value))
 
     def __missing__(self, filepath: str):
         raise KeyError(filepath)
 
 
+class _Index:
+    '''
+    SQLite database stored alongside the cached items of one directory, which keeps track of their
+    sizes, creation dates and usage. As it is stored on disk, it survives restarts and is shared
+    among all processes using the same directory (e.g. uWSGI workers).
+    '''
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, index_filename)
+        self._database = sqlite_util.SQLiteDatabase(
+            path=self.path,
+            ddl=self._create_schema,
+            pragmas=('synchronous=NORMAL',),
+        )
+
+    def _create_schema(self, connection: sqlite3.Connection):
+        with self._transaction(connection):
+            table_exists = connection.execute(
+                'SELECT 1 FROM sqlite_master WHERE type = \'table\' AND name = \'items\'',
+            ).fetchone()
+
+            if not table_exists:
+                connection.execute('''
+                    CREATE TABLE items (
+                        filename TEXT PRIMARY KEY,
+                        size INTEGER NOT NULL,
+                        hits INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                ''')
+                connection.execute('CREATE INDEX ix_items_usage ON items (hits, accessed_at)')
+                self._adopt_existing_items(connection)
+
+    def _adopt_existing_items(self, connection: sqlite3.Connection):
+        # items written before the index was introduced would otherwise never be evicted
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+
+            stat = entry.stat()
+            connection.execute(
+                'INSERT INTO items VALUES (?, ?, 0, ?, ?)',
+                (entry.name, stat.st_size, stat.st_mtime, stat.st_mtime),
+            )
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _transaction(connection: sqlite3.Connection):
+        # acquire write-lock immediately to prevent concurrent writers from interleaving
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def connection(self) -> sqlite3.Connection:
+        return self._database.connection()
+
+    def transaction(self):
+        return self._transaction(self.connection())
+
+
 class LFUFilesystemCache(FilesystemCache):
     '''
     Implements a Least-Frequently-Used filesystem cache. If `max_total_size_mib` is reached, the
-    least frequently used items are removed from the cache accordingly until enough space is
-    available again to store new items.
+    least frequently used items (ties are broken by least recent usage) are removed from the cache
+    accordingly until enough space is available again to store new items.
+
+    Sizes and usage of the items are tracked by an index per cache directory, which is persisted
+    alongside the items. Hence, the size limit also accounts for items stored by previous or
+    concurrent processes. Note that the limit applies per cache directory, so cache instances must
+    not share directories (see `cached`).
 
     @param max_total_size_mib:
         the maximum allowed total cache size in MiB, if `None`, LFU cache clearing is disabled
@@ -45,72 +147,186 @@ class LFUFilesystemCache(FilesystemCache):
     def __init__(self, max_total_size_mib: int | None=None):
         # convert MiB -> bytes
         self._max_total_size = max_total_size_mib * 1024 * 1024 if max_total_size_mib else None
-        self._item_sizes = {}
-        self._total_size = 0
-        self._ref_counters = collections.Counter()
-
-        self._item_sizes_lock = threading.Lock()
-        self._ref_counters_lock = threading.Lock()
 
-    def __get_item__(self, filepath: str):
-        item = super().__get_item__(filepath)
+        self._indexes: dict[str, _Index] = {}
+        self._indexes_lock = threading.Lock()
 
-        if self._max_total_size:
-            with self._ref_counters_lock:
-                self._ref_counters[filepath] -= 1
-
-        return item
-
-    def __set_item__(self, filepath: str, value):
-        if not self._max_total_size:
-            return super().__set_item__(filepath, value)
+        self._counters = collections.Counter()
+        self._counters_lock = threading.Lock()
 
+    def _index(self, filepath: str) -> _Index:
         cache_dir = os.path.dirname(filepath)
-        if not os.path.isdir(cache_dir):
-            os.makedirs(name=cache_dir, exist_ok=True)
 
-        pickled_value = pickle.dumps(value)
+        with self._indexes_lock:
+            if not (index := self._indexes.get(cache_dir)):
+                index = self._indexes[cache_dir] = _Index(cache_dir)
 
-        item_size = len(pickled_value)
-        if item_size > self._max_total_size:
-            raise ValueError(f'value too large ({item_size=})')
+        return index
 
-        while self._total_size + item_size > self._max_total_size:
-            self.pop_item()
+    def _count(self, counter: str, value: int=1):
+        with self._counters_lock:
+            self._counters[counter] += value
 
-        with self._item_sizes_lock:
-            self._item_sizes[filepath] = item_size
-        self._total_size += item_size
-        with self._ref_counters_lock:
-            self._ref_counters[filepath] -= 1
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return False
 
-        with open(filepath, 'wb') as f:
-            f.write(pickled_value)
+    def _remove(self, cache_dir: str, filenames: collections.abc.Iterable[str]):
+        for filename in filenames:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(cache_dir, filename))
 
-    def pop_item(self):
-        with self._ref_counters_lock:
-            ((filepath, _),) = self._ref_counters.most_common(1)
+    def __get_item__(self, filepath: str):
+        index = self._index(filepath)
+        filename = os.path.basename(filepath)
+        now = time.time()
+
+        with index.transaction() as connection:
+            row = connection.execute(
+                'SELECT created_at FROM items WHERE filename = ?',
+                (filename,),
+            ).fetchone()
+
+            if row and self._is_expired(created_at=row[0], now=now):
+                connection.execute('DELETE FROM items WHERE filename = ?', (filename,))
+                self._remove(index.cache_dir, (filename,))
+                self._count('expirations')
+                row = None
+
+            if row:
+                connection.execute(
+                    'UPDATE items SET hits = hits + 1, accessed_at = ? WHERE filename = ?',
+                    (now, filename),
+                )
+
+        if not row:
+            self._count('misses')
+            return self.__missing__(filepath)
 
-        value = self.__get_item__(filepath)
         try:
-            os.remove(filepath)
-        except OSError:
-            pass
+            with open(filepath, 'rb') as f:
+                item = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            # file was removed concurrently or is corrupted, hence drop it from the index
+            logger.warning(f'discarding unreadable cache item {filepath}: {e}')
+            with index.transaction() as connection:
+                connection.execute('DELETE FROM items WHERE filename = ?', (filename,))
+            self._remove(index.cache_dir, (filename,))
+            self._count('misses')
+            return self.__missing__(filepath)
+
+        self._count('hits')
+        return item
 
-        with self._item_sizes_lock:
-            self._total_size -= self._item_sizes[filepath]
-            del self._item_sizes[filepath]
-        with self._ref_counters_lock:
-            self._ref_counters.pop(filepath)
+    def __set_item__(self, filepath: str, value):
+        pickled_value = pickle.dumps(value)
 
-        return (filepath, value)
+        item_size = len(pickled_value)
+        if self._max_total_size and item_size > self._max_total_size:
+            raise ValueError(f'value too large ({item_size=})')
+
+        index = self._index(filepath)
+        filename = os.path.basename(filepath)
+        now = time.time()
+        victims = []
+
+        with index.transaction() as connection:
+            if self._max_total_size:
+                victims = self._select_victims(
+                    connection=connection,
+                    filename=filename,
+                    required_size=item_size,
+                    now=now,
+                )
+                connection.executemany(
+                    'DELETE FROM items WHERE filename = ?',
+                    ((victim,) for victim in victims),
+                )
+
+            connection.execute(
+                '''
+                INSERT INTO items VALUES (?, ?, 0, ?, ?)
+                ON CONFLICT (filename) DO UPDATE
+                SET size = excluded.size, created_at = excluded.created_at,
+                    accessed_at = excluded.accessed_at
+                ''',
+                (filename, item_size, now, now),
+            )
+
+            # rename while holding the write-lock, so that index and files cannot diverge because
+            # of concurrent writers
+            _write_atomically(filepath, pickled_value)
+
+        self._remove(index.cache_dir, victims)
+
+    def _select_victims(
+        self,
+        connection: sqlite3.Connection,
+        filename: str,
+        required_size: int,
+        now: float,
+    ) -> list[str]:
+        # an existing item with the same name is replaced, hence its size must not be accounted for
+        (total_size,) = connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM items WHERE filename != ?',
+            (filename,),
+        ).fetchone()
+
+        victims = []
+        if total_size + required_size <= self._max_total_size:
+            return victims
+
+        # victims are determined from the index only, i.e. without reading (or unpickling) them
+        for victim, size in connection.execute(
+            'SELECT filename, size FROM items WHERE filename != ? ORDER BY hits, accessed_at',
+            (filename,),
+        ):
+            victims.append(victim)
+            total_size -= size
+
+            if total_size + required_size <= self._max_total_size:
+                break
+
+        self._count('evictions', len(victims))
+        return victims
+
+    def metrics(self) -> dict:
+        '''
+        returns the counters of this cache instance (of the current process) as well as the amount
+        and total size of the items stored in its directories
+        '''
+        with self._counters_lock:
+            metrics = {
+                'hits': self._counters['hits'],
+                'misses': self._counters['misses'],
+                'evictions': self._counters['evictions'],
+                'expirations': self._counters['expirations'],
+            }
+
+        with self._indexes_lock:
+            indexes = list(self._indexes.values())
+
+        items_count = 0
+        total_size = 0
+        for index in indexes:
+            count, size = index.connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM items',
+            ).fetchone()
+            items_count += count
+            total_size += size
+
+        return metrics | {
+            'items_count': items_count,
+            'total_size_bytes': total_size,
+            'max_total_size_bytes': self._max_total_size,
+        }
 
 
 class TTLFilesystemCache(LFUFilesystemCache):
     '''
     Implements a Time-To-Live filesystem cache. If an item is older than `ttl`, it is removed from
-    the cache. If `max_total_size_mib` is reached, the least frequently used items are removed from
-    the cache accordingly until enough space is available again to store new items.
+    the cache. If `max_total_size_mib` is reached, expired items and afterwards the least frequently
+    used items are removed from the cache accordingly until enough space is available again to store
+    new items.
 
     @param ttl:
         the maximum allowed time a cache item is valid in seconds
@@ -121,18 +337,70 @@ class TTLFilesystemCache(LFUFilesystemCache):
         super().__init__(max_total_size_mib)
         self._ttl = ttl
 
-    def __get_item__(self, filepath: str):
-        if os.path.exists(filepath):
-            modified_on = datetime.datetime.fromtimestamp(os.path.getmtime(filepath))
-            age_seconds = datetime.datetime.now() - modified_on
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return now - created_at >= self._ttl
+
+    def _select_victims(
+        self,
+        connection: sqlite3.Connection,
+        filename: str,
+        required_size: int,
+        now: float,
+    ) -> list[str]:
+        expired = [
+            victim for (victim,) in connection.execute(
+                'SELECT filename FROM items WHERE filename != ? AND created_at <= ?',
+                (filename, now - self._ttl),
+            )
+        ]
+        connection.executemany(
+            'DELETE FROM items WHERE filename = ?',
+            ((victim,) for victim in expired),
+        )
+        self._count('expirations', len(expired))
+
+        return expired + super()._select_victims(
+            connection=connection,
+            filename=filename,
+            required_size=required_size,
+            now=now,
+        )
+
+
+# items were stored directly in the cache directory (named by the sha1 of their key) before they
+# were stored in a sub-directory per decorated function
+_legacy_item_filename = re.compile(r'[0-9a-f]{40}')
+_purged_cache_dirs: set[str] = set()
+_purged_cache_dirs_lock = threading.Lock()
+
+
+def _purge_legacy_items(cache_dir: str):
+    '''
+    removes items which were stored directly in `cache_dir`, as they are neither indexed nor can
+    they be attributed to a decorated function (their key does not contain the function), hence they
+    would otherwise never be evicted
+    '''
+    with _purged_cache_dirs_lock:
+        if cache_dir in _purged_cache_dirs:
+            return
+        _purged_cache_dirs.add(cache_dir)
 
-            if age_seconds.total_seconds() < self._ttl:
-                return super().__get_item__(filepath)
+    try:
+        entries = list(os.scandir(cache_dir))
+    except FileNotFoundError:
+        return
 
-        return self.__missing__(filepath)
+    removed_count = 0
+    for entry in entries:
+        if not _legacy_item_filename.fullmatch(entry.name) or not entry.is_file():
+            continue
 
-    def __set_item__(self, filepath: str, value):
-        super().__set_item__(filepath, value)
+        with contextlib.suppress(OSError):
+            os.remove(entry.path)
+            removed_count += 1
+
+    if removed_count:
+        logger.info(f'removed {removed_count} legacy cache items from {cache_dir}')
 
 
 def cached(
@@ -142,14 +410,20 @@ def cached(
 ):
     '''
     Decorator to wrap a function with a callable that saves results to a defined `FilesystemCache`.
+    Results are stored in a sub-directory of `cache_dir` per decorated function, so that size
+    limits of different caches do not interfere with each other.
     '''
     def decorator(func):
+        func_cache_dir = os.path.join(cache_dir, f'{func.__module__}.{func.__qualname__}')
+
         def wrapper(*args, **kwargs):
+            _purge_legacy_items(cache_dir)
+
             key = hashlib.sha1()
             for key_part in key_func(*args, **kwargs):
                 key.update(str(key_part).encode('utf-8'))
 
-            filepath = os.path.join(cache_dir, key.hexdigest())
+            filepath = os.path.join(func_cache_dir, key.hexdigest())
 
             try:
                 return cache.__get_item__(filepath)
@@ -161,5 +435,6 @@ def cached(
 
             return result
 
+        wrapper.cache = cache
         return wrapper
     return decorator
@@ -0,0 +1,30 @@
+import sqlalchemy as sa
+
+import deliverydb.migrations
+
+
+__cmd_name__ = 'deliverydb'
+
+
+def deduplicate_artefact_metadata(
+    db_url: str,
+    dry_run: bool=False,
+):
+    '''
+    merges artefact-metadata entries which share the same identity (required before the unique
+    index on artefact-metadata identity can be created, see `deliverydb.migrations`)
+    '''
+    engine = sa.create_engine(db_url)
+
+    with engine.begin() as connection:
+        duplicates = deliverydb.migrations.duplicate_artefact_metadata_identities(connection)
+
+        for identity in duplicates:
+            print(f'{identity.entries_count} entries: {tuple(identity)[:-1]}')
+
+        if dry_run:
+            return
+
+        removed_count = deliverydb.migrations.deduplicate_artefact_metadata(connection)
+
+    print(f'merged {len(duplicates)} identities, removed {removed_count} entries')
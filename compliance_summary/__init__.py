@@ -1,6 +1,8 @@
 import collections.abc
+import collections
 import dataclasses
 import enum
+import heapq
 import logging
 import typing
 
@@ -304,55 +306,351 @@ def component_summaries(
     critical flaw for each `data_type`.
     On absence of flaw per data_type, corresponding `default_entry` is taken.
     '''
+    summary_index = ComplianceSummaryIndex(
+        findings=findings,
+        rescorings=rescorings,
+        defaults=cfg.default_entries,
+        eol_client=eol_client,
+        artefact_metadata_cfg_by_type=artefact_metadata_cfg_by_type,
+    )
+
     for component in components:
-        if len(components) == 1:
-            # findings were already pre-filtered by query
-            filtered_findings = findings
-            filtered_rescorings = rescorings
-        else:
-            filtered_findings = tuple(
-                finding for finding in findings
+        yield summary_index.component_summary(
+            component=component,
+            # if there is only one component, findings were already pre-filtered by query
+            filter_by_component=len(components) != 1,
+        )
+
+
+def _artefact_kind_and_type(
+    artefact: ocm.Resource | ocm.Source,
+) -> tuple[dso.model.ArtefactKind, str]:
+    if isinstance(artefact, ocm.Resource):
+        artefact_kind = dso.model.ArtefactKind.RESOURCE
+    elif isinstance(artefact, ocm.Source):
+        artefact_kind = dso.model.ArtefactKind.SOURCE
+    else:
+        raise ValueError(artefact)
+
+    artefact_type = artefact.type.value if isinstance(artefact.type, enum.Enum) else artefact.type
+
+    return artefact_kind, artefact_type
+
+
+def _positions_by_component_id(
+    artefact_metadata: collections.abc.Iterable[dso.model.ArtefactMetadata],
+) -> dict[tuple[str | None, str | None], list[int]]:
+    '''
+    returns the (ascending) positions of `artefact_metadata`, grouped by component name and
+    version (unset name or version is grouped as `None`)
+    '''
+    positions_by_component_id = collections.defaultdict(list)
+
+    for position, artefact_metadatum in enumerate(artefact_metadata):
+        positions_by_component_id[(
+            artefact_metadatum.artefact.component_name or None,
+            artefact_metadatum.artefact.component_version or None,
+        )].append(position)
+
+    return positions_by_component_id
+
+
+def _rescoring_bucket(
+    datatype: str,
+    artefact_id: dso.model.ComponentArtefactId,
+    finding: object,
+) -> tuple:
+    '''
+    returns those properties a rescoring and a finding must have in common to match (see
+    `rescoring_util._iter_rescorings_for_finding`), `finding` being either a finding's data or the
+    `finding` of a rescoring
+    '''
+    if datatype == dso.model.Datatype.VULNERABILITY:
+        finding_id = (finding.package_name, finding.cve)
+    elif datatype == dso.model.Datatype.LICENSE:
+        finding_id = (finding.package_name, finding.license.name)
+    elif datatype == dso.model.Datatype.MALWARE_FINDING:
+        finding_id = (finding.malware, finding.content_digest, finding.filename)
+    else:
+        finding_id = None
+
+    return (
+        datatype,
+        artefact_id.artefact_kind,
+        artefact_id.artefact.artefact_type,
+        finding_id,
+    )
+
+
+class ComplianceSummaryIndex:
+    '''
+    Buckets `findings` and `rescorings` once by component and artefact id so that compliance
+    summaries of many components (and their artefacts) can be calculated without re-filtering
+    all findings and rescorings per component, artefact and datatype. The calculated summaries
+    equal those of `calculate_summary` and `calculate_artefact_summary`.
+    '''
+    def __init__(
+        self,
+        findings: collections.abc.Iterable[dso.model.ArtefactMetadata],
+        rescorings: collections.abc.Iterable[dso.model.ArtefactMetadata],
+        defaults: dict[str, ComplianceSummaryEntry],
+        eol_client: eol.EolClient,
+        artefact_metadata_cfg_by_type: dict[str, ArtefactMetadataCfg],
+    ):
+        self.findings = tuple(findings)
+        self.rescorings = tuple(rescorings)
+        self.defaults = defaults
+        self.eol_client = eol_client
+        self.artefact_metadata_cfg_by_type = artefact_metadata_cfg_by_type
+
+        self._finding_positions_by_component_id = _positions_by_component_id(self.findings)
+        self._rescoring_positions_by_component_id = _positions_by_component_id(self.rescorings)
+
+    def _positions_of_component(
+        self,
+        positions_by_component_id: dict[tuple[str | None, str | None], list[int]],
+        component: ocm.Component,
+    ) -> collections.abc.Iterable[int]:
+        '''
+        yields positions of those entries which are either not bound to a component name or
+        version, or which match the ones of `component`, in their original order
+        '''
+        component_ids = dict.fromkeys((
+            (component.name, component.version),
+            (component.name, None),
+            (None, component.version),
+            (None, None),
+        ))
+
+        return heapq.merge(*(
+            positions_by_component_id.get(component_id, ())
+            for component_id in component_ids
+        ))
+
+    def findings_of_component(
+        self,
+        component: ocm.Component,
+    ) -> tuple[dso.model.ArtefactMetadata]:
+        '''
+        returns those findings which refer to an artefact of `component` (see
+        `ocm_util.find_artefact_of_component_or_none`)
+        '''
+        extra_ids_by_artefact_id = collections.defaultdict(set)
+        for artefact in component.resources + component.sources:
+            artefact_kind, artefact_type = _artefact_kind_and_type(artefact)
+
+            extra_ids_by_artefact_id[(
+                artefact_kind,
+                artefact.name,
+                artefact.version,
+                artefact_type,
+            )].add(dso.model.normalise_artefact_extra_id(artefact.extraIdentity))
+
+        findings = []
+        for position in self._positions_of_component(
+            positions_by_component_id=self._finding_positions_by_component_id,
+            component=component,
+        ):
+            finding = self.findings[position]
+
+            if not (local_artefact := finding.artefact.artefact):
+                continue
+
+            if not (
+                local_artefact.artefact_name
+                and local_artefact.artefact_version
+                and local_artefact.artefact_type
+            ):
+                # partial artefact ids match leniently, fallback to linear search
                 if ocm_util.find_artefact_of_component_or_none(
                     component=component,
                     artefact=finding.artefact,
-                )
-            )
+                ):
+                    findings.append(finding)
+                continue
 
-            filtered_rescorings = tuple(
-                rescoring for rescoring in rescorings
-                if (
-                    not rescoring.artefact.component_name or
-                    rescoring.artefact.component_name == component.name
-                ) and (
-                    not rescoring.artefact.component_version or
-                    rescoring.artefact.component_version == component.version
-                )
+            extra_ids = extra_ids_by_artefact_id.get((
+                finding.artefact.artefact_kind,
+                local_artefact.artefact_name,
+                local_artefact.artefact_version,
+                local_artefact.artefact_type,
+            ))
+
+            if extra_ids is None:
+                continue
+
+            if (
+                local_artefact.artefact_extra_id
+                and local_artefact.normalised_artefact_extra_id() not in extra_ids
+            ):
+                continue
+
+            findings.append(finding)
+
+        return tuple(findings)
+
+    def rescorings_of_component(
+        self,
+        component: ocm.Component,
+    ) -> tuple[dso.model.ArtefactMetadata]:
+        return tuple(
+            self.rescorings[position]
+            for position in self._positions_of_component(
+                positions_by_component_id=self._rescoring_positions_by_component_id,
+                component=component,
             )
+        )
 
-        yield ComponentComplianceSummary(
+    def component_summary(
+        self,
+        component: ocm.Component,
+        filter_by_component: bool=True,
+    ) -> ComponentComplianceSummary:
+        if filter_by_component:
+            findings = self.findings_of_component(component)
+            rescorings = self.rescorings_of_component(component)
+        else:
+            findings = self.findings
+            rescorings = self.rescorings
+
+        # only rescorings of the same bucket have to be considered per finding
+        rescorings_by_bucket = collections.defaultdict(list)
+        for rescoring in rescorings:
+            rescorings_by_bucket[_rescoring_bucket(
+                datatype=rescoring.data.referenced_type,
+                artefact_id=rescoring.artefact,
+                finding=rescoring.data.finding,
+            )].append(rescoring)
+
+        severities = {}
+
+        def severity_of(finding: dso.model.ArtefactMetadata) -> ComplianceEntrySeverity:
+            if (severity := severities.get(id(finding))) is not None:
+                return severity
+
+            severity_name = severity_for_finding(
+                finding=finding,
+                rescorings=rescorings_by_bucket.get(_rescoring_bucket(
+                    datatype=finding.meta.type,
+                    artefact_id=finding.artefact,
+                    finding=(
+                        finding.data.finding
+                        if finding.meta.type == dso.model.Datatype.MALWARE_FINDING
+                        else finding.data
+                    ),
+                ), ()),
+                eol_client=self.eol_client,
+                artefact_metadata_cfg=self.artefact_metadata_cfg_by_type.get(finding.meta.type),
+            )
+            severity = severities[id(finding)] = ComplianceEntrySeverity[severity_name]
+
+            return severity
+
+        findings_by_artefact_id = collections.defaultdict(list)
+        for finding in findings:
+            findings_by_artefact_id[(
+                finding.artefact.artefact_kind,
+                finding.artefact.artefact.artefact_name,
+                finding.artefact.artefact.artefact_version,
+                finding.artefact.artefact.artefact_type,
+                finding.artefact.artefact.normalised_artefact_extra_id(),
+            )].append(finding)
+
+        artefact_summaries = []
+        for artefact in component.resources + component.sources:
+            artefact_kind, artefact_type = _artefact_kind_and_type(artefact)
+
+            findings_for_artefact = findings_by_artefact_id.get((
+                artefact_kind,
+                artefact.name,
+                artefact.version,
+                artefact_type,
+                dso.model.normalise_artefact_extra_id(artefact.extraIdentity),
+            ), ())
+
+            artefact_summaries.append(ArtefactComplianceSummary(
+                artefact=dso.model.ComponentArtefactId(
+                    component_name=component.name,
+                    component_version=component.version,
+                    artefact_kind=artefact_kind.value,
+                    artefact=dso.model.LocalArtefactId(
+                        artefact_name=artefact.name,
+                        artefact_version=artefact.version,
+                        artefact_type=artefact_type,
+                        artefact_extra_id=artefact.extraIdentity,
+                    ),
+                ),
+                entries=self._summary_entries(
+                    findings=findings_for_artefact,
+                    severity_of=severity_of,
+                ),
+            ))
+
+        return ComponentComplianceSummary(
             componentId=ocm.ComponentIdentity(
                 name=component.name,
                 version=component.version,
             ),
-            entries=list(calculate_summary(
-                artefact_metadata_cfg_by_type=artefact_metadata_cfg_by_type,
-                findings=filtered_findings,
-                rescorings=filtered_rescorings,
-                defaults=cfg.default_entries,
-                types=tuple(type for type in cfg.default_entries.keys()),
-                eol_client=eol_client,
-            )),
-            artefacts=list(calculate_artefact_summary(
-                component=component,
-                artefact=artefact,
-                findings=filtered_findings,
-                rescorings=filtered_rescorings,
-                defaults=cfg.default_entries,
-                eol_client=eol_client,
-                artefact_metadata_cfg_by_type=artefact_metadata_cfg_by_type,
-            ) for artefact in component.resources + component.sources),
+            entries=self._summary_entries(
+                findings=findings,
+                severity_of=severity_of,
+            ),
+            artefacts=artefact_summaries,
         )
 
+    def _summary_entries(
+        self,
+        findings: collections.abc.Iterable[dso.model.ArtefactMetadata],
+        severity_of: collections.abc.Callable[
+            [dso.model.ArtefactMetadata],
+            ComplianceEntrySeverity,
+        ],
+    ) -> list[ComplianceSummaryEntry]:
+        '''
+        single-pass equivalent of `calculate_summary` for all types of `defaults`
+        '''
+        findings_by_type = collections.defaultdict(list)
+        datasources = set()
+        for finding in findings:
+            findings_by_type[finding.meta.type].append(finding)
+            datasources.add(finding.meta.datasource)
+
+        entries = []
+        for finding_type, default_entry in self.defaults.items():
+            if not (findings_with_given_type := findings_by_type.get(finding_type)):
+                # check if scan exists and has no findings instead of
+                # component is not scanned and thus has no findinngs
+                if default_entry.source in datasources:
+                    entries.append(ComplianceSummaryEntry(
+                        type=finding_type,
+                        source=default_entry.source,
+                        severity=ComplianceEntrySeverity.CLEAN,
+                        scanStatus=ComplianceScanStatus.OK,
+                    ))
+                else:
+                    entries.append(default_entry)
+                continue
+
+            most_critical = ComplianceSummaryEntry(
+                type=findings_with_given_type[0].meta.type,
+                source=findings_with_given_type[0].meta.datasource,
+                severity=ComplianceEntrySeverity.UNKNOWN,
+                scanStatus=ComplianceScanStatus.OK,
+            )
+
+            for finding in findings_with_given_type:
+                if (severity := severity_of(finding)) > most_critical.severity:
+                    most_critical = ComplianceSummaryEntry(
+                        type=finding.meta.type,
+                        source=finding.meta.datasource,
+                        severity=severity,
+                        scanStatus=ComplianceScanStatus.OK,
+                    )
+
+            entries.append(most_critical)
+
+        return entries
+
 
 def calculate_artefact_summary(
     component: ocm.Component,
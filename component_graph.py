@@ -0,0 +1,318 @@
+'''
+Resolution of component dependency graphs, i.e. the component nodes (incl. their paths) of the
+transitive closure of component references of a root component.
+
+As component versions are immutable, resolved graphs of release versions are cached per root
+component version. The cache consists of an in-memory LRU cache per process, backed by a
+filesystem cache which survives restarts and is shared among processes (see `caching`).
+'''
+import collections.abc
+import concurrent.futures
+import hashlib
+import logging
+import os
+import threading
+
+import cachetools
+
+import cnudie.iter
+import cnudie.retrieve
+import dso.labels
+import ocm
+import version as versionutil
+
+import caching
+
+
+logger = logging.getLogger(__name__)
+
+own_dir = os.path.abspath(os.path.dirname(__file__))
+default_cache_dir = os.path.join(own_dir, '.cache', 'component-graphs')
+
+# max. amount of concurrent component descriptor lookups per resolved component tree
+COMPONENT_DESCRIPTOR_LOOKUP_WORKERS = 8
+
+
+def _referenced_component_ids(
+    component: ocm.Component,
+) -> collections.abc.Generator[ocm.ComponentIdentity, None, None]:
+    '''
+    yields the ids of the components referenced by `component` in the same order as they are
+    traversed by `cnudie.iter.iter`
+    '''
+    for cref in component.componentReferences:
+        yield ocm.ComponentIdentity(
+            name=cref.componentName,
+            version=cref.version,
+        )
+
+    if not (extra_crefs_label := component.find_label(
+        name=dso.labels.ExtraComponentReferencesLabel.name,
+    )):
+        return
+
+    extra_crefs_label: dso.labels.ExtraComponentReferencesLabel = dso.labels.deserialise_label(
+        label=extra_crefs_label,
+    )
+
+    for extra_cref in extra_crefs_label.value:
+        yield ocm.ComponentIdentity(
+            name=extra_cref.component_reference.name,
+            version=extra_cref.component_reference.version,
+        )
+
+
+def prefetch_component_descriptors(
+    component: ocm.Component | ocm.ComponentDescriptor,
+    component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById,
+    recursion_depth: int=-1,
+    max_workers: int=COMPONENT_DESCRIPTOR_LOOKUP_WORKERS,
+) -> cnudie.retrieve.ComponentDescriptorLookupById:
+    '''
+    Retrieves the component descriptors of all components (transitively) referenced by `component`
+    using up to `max_workers` concurrent lookups, i.e. references are looked up as soon as the
+    descriptor of the referencing component is available. Each component version is only
+    looked up once, regardless of how often it is referenced.
+
+    Returns a lookup which serves the retrieved component descriptors from memory (and delegates to
+    `component_descriptor_lookup` otherwise). Hence, iterating the component tree using
+    `cnudie.iter.iter` with the returned lookup yields the same nodes in the same order, without
+    requiring any further round trips.
+    '''
+    if isinstance(component, ocm.ComponentDescriptor):
+        component = component.component
+
+    component_descriptors: dict[ocm.ComponentIdentity, ocm.ComponentDescriptor] = {}
+
+    def lookup(
+        component_id: ocm.ComponentIdentity,
+        *args,
+        **kwargs,
+    ) -> ocm.ComponentDescriptor:
+        if not args and not kwargs and (
+            # lookups might be invoked using other component-id types
+            component_descriptor := component_descriptors.get(ocm.ComponentIdentity(
+                name=component_id.name,
+                version=component_id.version,
+            ))
+        ):
+            return component_descriptor
+
+        return component_descriptor_lookup(component_id, *args, **kwargs)
+
+    if recursion_depth == 0:
+        return lookup
+
+    tpe = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    pending: dict[concurrent.futures.Future, ocm.ComponentIdentity] = {}
+    # greatest remaining recursion depth per component, `-1` means unlimited
+    remaining_depths: dict[ocm.ComponentIdentity, int] = {}
+
+    def exceeds(depth: int, other_depth: int) -> bool:
+        return other_depth != -1 and (depth == -1 or depth > other_depth)
+
+    def submit_references(component: ocm.Component, recursion_depth: int):
+        if recursion_depth == 0:
+            return
+        elif recursion_depth > 0:
+            recursion_depth -= 1
+
+        for component_id in _referenced_component_ids(component):
+            if component_id in remaining_depths:
+                if not exceeds(recursion_depth, remaining_depths[component_id]):
+                    # component was already reached with at least the same remaining depth
+                    continue
+
+                # lookups complete in arbitrary order, so a shorter path might be found later on
+                remaining_depths[component_id] = recursion_depth
+                if component_descriptor := component_descriptors.get(component_id):
+                    submit_references(component_descriptor.component, recursion_depth)
+                continue
+
+            remaining_depths[component_id] = recursion_depth
+            pending[tpe.submit(component_descriptor_lookup, component_id)] = component_id
+
+    try:
+        submit_references(component, recursion_depth)
+
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+
+            for future in done:
+                component_id = pending.pop(future)
+                component_descriptor = component_descriptors[component_id] = future.result()
+
+                submit_references(
+                    component=component_descriptor.component,
+                    recursion_depth=remaining_depths[component_id],
+                )
+    finally:
+        tpe.shutdown(wait=False, cancel_futures=True)
+
+    return lookup
+
+
+class ComponentGraphCache:
+    '''
+    Caches resolved component dependency graphs (i.e. the component nodes yielded by
+    `cnudie.iter.iter`) per root component version and recursion depth. Only graphs of release
+    versions are cached, as other versions might be overwritten.
+
+    @param max_total_size_mib:
+        the maximum allowed total size of the filesystem cache in MiB
+    @param max_memory_items:
+        the maximum amount of graphs kept in memory (per process)
+    '''
+    def __init__(
+        self,
+        cache_dir: str=default_cache_dir,
+        max_total_size_mib: int=256,
+        max_memory_items: int=32,
+    ):
+        self.cache_dir = cache_dir
+        self._filesystem_cache = caching.LFUFilesystemCache(max_total_size_mib=max_total_size_mib)
+        self._memory_cache = cachetools.LRUCache(maxsize=max_memory_items)
+        self._memory_cache_lock = threading.Lock()
+        self._memory_hits_count = 0
+
+    def _filepath(
+        self,
+        component_id: ocm.ComponentIdentity,
+        recursion_depth: int,
+    ) -> str:
+        key = hashlib.sha1(
+            f'{component_id.name}:{component_id.version}:{recursion_depth}'.encode('utf-8'),
+        ).hexdigest()
+
+        return os.path.join(self.cache_dir, key)
+
+    def get(
+        self,
+        component_id: ocm.ComponentIdentity,
+        recursion_depth: int=-1,
+    ) -> tuple[cnudie.iter.ComponentNode, ...] | None:
+        filepath = self._filepath(component_id, recursion_depth)
+
+        with self._memory_cache_lock:
+            if (component_nodes := self._memory_cache.get(filepath)) is not None:
+                self._memory_hits_count += 1
+                return component_nodes
+
+        try:
+            component_nodes = self._filesystem_cache.__get_item__(filepath)
+        except KeyError:
+            return None
+
+        with self._memory_cache_lock:
+            self._memory_cache[filepath] = component_nodes
+
+        return component_nodes
+
+    def put(
+        self,
+        component_id: ocm.ComponentIdentity,
+        component_nodes: tuple[cnudie.iter.ComponentNode, ...],
+        recursion_depth: int=-1,
+    ):
+        filepath = self._filepath(component_id, recursion_depth)
+
+        with self._memory_cache_lock:
+            self._memory_cache[filepath] = component_nodes
+
+        try:
+            self._filesystem_cache.__set_item__(filepath, component_nodes)
+        except ValueError as e:
+            # graph exceeds the size limit of the filesystem cache, keep it in memory only
+            logger.warning(f'not caching component graph of {component_id} on disk: {e}')
+
+    def metrics(self) -> dict:
+        with self._memory_cache_lock:
+            memory_metrics = {
+                'memory_hits': self._memory_hits_count,
+                'memory_items_count': len(self._memory_cache),
+            }
+
+        return memory_metrics | {
+            f'filesystem_{name}': value
+            for name, value in self._filesystem_cache.metrics().items()
+        }
+
+
+graph_cache = ComponentGraphCache()
+
+
+def is_immutable(component_version: str) -> bool:
+    parsed_version = versionutil.parse_to_semver(
+        version=component_version,
+        invalid_semver_ok=True,
+    )
+
+    return bool(parsed_version) and versionutil.is_final(parsed_version)
+
+
+def component_nodes(
+    component: ocm.Component | ocm.ComponentDescriptor,
+    component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById,
+    recursion_depth: int=-1,
+    cache: ComponentGraphCache=None,
+) -> tuple[cnudie.iter.ComponentNode, ...]:
+    '''
+    Returns the component nodes of the dependency graph of `component` in the same order as yielded
+    by `cnudie.iter.iter` (using `prune_unique=False`), i.e. components which are referenced
+    multiple times are included once per path.
+
+    Note that the returned nodes (and the components they refer to) are shared with other callers,
+    as it is already the case for component descriptors returned by cached lookups.
+    '''
+    if isinstance(component, ocm.ComponentDescriptor):
+        component = component.component
+
+    component_id = ocm.ComponentIdentity(
+        name=component.name,
+        version=component.version,
+    )
+    cache = (cache or graph_cache) if is_immutable(component.version) else None
+
+    if cache and (nodes := cache.get(component_id, recursion_depth)) is not None:
+        return nodes
+
+    nodes = tuple(cnudie.iter.iter(
+        component=component,
+        lookup=prefetch_component_descriptors(
+            component=component,
+            component_descriptor_lookup=component_descriptor_lookup,
+            recursion_depth=recursion_depth,
+        ),
+        recursion_depth=recursion_depth,
+        prune_unique=False,
+        node_filter=cnudie.iter.Filter.components,
+    ))
+
+    if cache:
+        cache.put(component_id, nodes, recursion_depth)
+
+    return nodes
+
+
+def iter_artefact_nodes(
+    component_nodes: collections.abc.Iterable[cnudie.iter.ComponentNode],
+) -> collections.abc.Generator[cnudie.iter.ResourceNode | cnudie.iter.SourceNode, None, None]:
+    '''
+    yields the artefact nodes of `component_nodes` in the same order as yielded by
+    `cnudie.iter.iter` (using `cnudie.iter.Filter.artefacts`)
+    '''
+    for component_node in component_nodes:
+        for resource in component_node.component.resources:
+            yield cnudie.iter.ResourceNode(
+                path=component_node.path,
+                resource=resource,
+            )
+
+        for source in component_node.component.sources:
+            yield cnudie.iter.SourceNode(
+                path=component_node.path,
+                source=source,
+            )
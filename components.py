@@ -2,6 +2,7 @@ import dataclasses
 import datetime
 import dataclasses_json
 import enum
+import hashlib
 import io
 import logging
 import tarfile
@@ -29,9 +30,9 @@ import github.util
 import oci.client
 import oci.model as om
 import ocm
-import version as versionutil
 
 import compliance_summary as cs
+import component_graph
 import deliverydb.model as dm
 import deliverydb.util
 import eol
@@ -42,6 +43,7 @@ import responsibles.github_statistics
 import responsibles.labels
 import responsibles
 import util
+import version_index
 import yp
 
 logger = logging.getLogger(__name__)
@@ -267,8 +269,26 @@ class Component:
             invalid_semver_ok=self._invalid_semver_ok,
         )
 
+        version = req.get_param('version', default='greatest')
+        if version != 'greatest' and component_graph.is_immutable(version):
+            resp.cache_control = util.IMMUTABLE_CACHE_CONTROL
+        else:
+            # greatest version and non-final (e.g. snapshot) versions might change, hence clients
+            # must revalidate
+            resp.cache_control = ('no-cache',)
+
+        # the descriptor is serialised anyways, hence derive the etag from the actual representation
+        util.is_not_modified(
+            req=req,
+            resp=resp,
+            etag=hashlib.sha256(resp.render_body()).hexdigest(),
+        )
+
 
 class ComponentDependencies:
+    single_flight = True
+    response_cache_ttl_seconds = 30
+
     def __init__(
         self,
         component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById,
@@ -570,6 +590,24 @@ def component_versions(
     )
 
 
+def _version_index(
+    component_name: str,
+    version_lookup: cnudie.retrieve.VersionLookupByComponent=None,
+    ocm_repo: ocm.OcmRepository=None,
+    oci_client: oci.client.Client=None,
+) -> version_index.VersionIndex:
+    return version_index.version_index(
+        component_name=component_name,
+        versions=component_versions(
+            component_name=component_name,
+            version_lookup=version_lookup,
+            ocm_repo=ocm_repo,
+            oci_client=oci_client,
+        ) or (),
+        ocm_repo_url=ocm_repo.baseUrl if ocm_repo else None,
+    )
+
+
 def greatest_component_version(
     component_name: str,
     version_lookup: cnudie.retrieve.VersionLookupByComponent=None,
@@ -578,44 +616,16 @@ def greatest_component_version(
     version_filter: features.VersionFilter=features.VersionFilter.RELEASES_ONLY,
     invalid_semver_ok: bool=False,
 ) -> str | None:
-    versions = component_versions(
+    return _version_index(
         component_name=component_name,
         version_lookup=version_lookup,
         ocm_repo=ocm_repo,
         oci_client=oci_client,
+    ).greatest_version(
+        only_releases=version_filter == features.VersionFilter.RELEASES_ONLY,
+        invalid_semver_ok=invalid_semver_ok,
     )
 
-    greatest_candidate = None
-    greatest_candidate_semver = None
-    for candidate in versions:
-        if isinstance(candidate, str):
-            candidate_semver = versionutil.parse_to_semver(
-                version=candidate,
-                invalid_semver_ok=invalid_semver_ok,
-            )
-
-            if not candidate_semver:
-                continue
-        else:
-            candidate_semver = candidate
-
-        if (
-            version_filter == features.VersionFilter.RELEASES_ONLY
-            and (candidate_semver.prerelease or candidate_semver.build)
-        ):
-            continue
-
-        if not greatest_candidate_semver:
-            greatest_candidate_semver = candidate_semver
-            greatest_candidate = candidate
-            continue
-
-        if candidate_semver > greatest_candidate_semver:
-            greatest_candidate_semver = candidate_semver
-            greatest_candidate = candidate
-
-    return greatest_candidate
-
 
 def greatest_component_versions(
     component_name: str,
@@ -627,45 +637,23 @@ def greatest_component_versions(
     version_filter: features.VersionFilter=features.VersionFilter.RELEASES_ONLY,
     invalid_semver_ok: bool=False,
 ) -> list[str]:
-    versions = component_versions(
+    return _version_index(
         component_name=component_name,
         version_lookup=version_lookup,
         ocm_repo=ocm_repo,
         oci_client=oci_client,
-    )
-
-    if not versions:
-        return []
-
-    versions = [
-        v for v in versions
-        if versionutil.parse_to_semver(
-            version=v,
-            invalid_semver_ok=invalid_semver_ok,
-        )
-    ]
-
-    if version_filter == features.VersionFilter.RELEASES_ONLY:
-        versions = [
-            v for v in versions
-            if not (pv := versionutil.parse_to_semver(
-                version=v,
-                invalid_semver_ok=invalid_semver_ok,
-            )).prerelease and not pv.build
-        ]
-
-    versions = sorted(versions, key=lambda v: versionutil.parse_to_semver(
-        version=v,
+    ).greatest_versions(
+        max_versions=max_versions,
+        max_version=greatest_version,
+        only_releases=version_filter == features.VersionFilter.RELEASES_ONLY,
         invalid_semver_ok=invalid_semver_ok,
-    ))
-
-    if greatest_version:
-        versions = versions[:versions.index(greatest_version)+1]
-
-    return versions[-max_versions:]
+    )
 
 
 class GreatestComponentVersions:
+    single_flight = True
+    response_cache_ttl_seconds = 30
+
     def __init__(
         self,
         version_lookup: cnudie.retrieve.VersionLookupByComponent,
@@ -1083,13 +1071,11 @@ def _components(
     )
 
     try:
-        return tuple(cnudie.iter.iter(
-            component=component_descriptor,
-            lookup=component_descriptor_lookup,
+        return component_graph.component_nodes(
+            component=component_descriptor.component,
+            component_descriptor_lookup=component_descriptor_lookup,
             recursion_depth=recursion_depth,
-            prune_unique=False,
-            node_filter=lambda node: isinstance(node, cnudie.iter.ComponentNode),
-        ))
+        )
     except om.OciImageNotFoundException as e:
         err_str = 'error occurred during retrieval of component dependencies of ' \
         f'{component_descriptor.component.name=} in {component_descriptor.component.version=}'
@@ -1102,6 +1088,8 @@ def _components(
 
 class ComplianceSummary:
     required_features = (features.FeatureDeliveryDB,)
+    single_flight = True
+    response_cache_ttl_seconds = 30
 
     def __init__(
         self,
@@ -1219,20 +1207,20 @@ class ComplianceSummary:
             dso.model.Datatype.MALWARE_FINDING,
         )
 
-        findings_query = session.query(dm.ArtefactMetaData).filter(
-            sa.or_(deliverydb.util.ArtefactMetadataQueries.component_queries(
+        findings_query = session.query(*deliverydb.util.artefact_metadata_wire_columns).filter(
+            deliverydb.util.ArtefactMetadataQueries.component_query(
                 components=components,
                 component_descriptor_lookup=self._component_descriptor_lookup,
-            )),
+            ),
             dm.ArtefactMetaData.type.in_(type_filter),
         )
-        rescorings_query = session.query(dm.ArtefactMetaData).filter(
+        rescorings_query = session.query(*deliverydb.util.artefact_metadata_wire_columns).filter(
             dm.ArtefactMetaData.type == dso.model.Datatype.RESCORING,
-            sa.or_(deliverydb.util.ArtefactMetadataQueries.component_queries(
+            deliverydb.util.ArtefactMetadataQueries.component_query(
                 components=components,
                 none_ok=True,
                 component_descriptor_lookup=self._component_descriptor_lookup,
-            )),
+            ),
             deliverydb.util.ArtefactMetadataFilters.filter_for_rescoring_type(type_filter),
         )
 
@@ -84,12 +84,21 @@ class ClamAVConfig:
         cfg-element used to create s3 client to retrieve artefacts
     :param tuple[str] artefact_types:
         list of artefact types which should be scanned, other artefact types are skipped
+    :param int max_scan_workers:
+        max. amount of image layers which are scanned concurrently
+    :param int max_in_flight_octets:
+        max. total size of image layers which are scanned concurrently
+    :param int max_concurrency_per_registry:
+        max. amount of image layers which are scanned concurrently from the same oci registry
     '''
     delivery_service_url: str
     lookup_new_backlog_item_interval: int
     rescan_interval: int
     aws_cfg_name: str
     artefact_types: tuple[str]
+    max_scan_workers: int
+    max_in_flight_octets: int
+    max_concurrency_per_registry: int
 
 
 @dataclasses.dataclass(frozen=True)
@@ -416,12 +425,33 @@ def deserialise_clamav_config(
         ),
     ))
 
+    max_scan_workers = deserialise_config_property(
+        config=clamav_config,
+        property_key='max_scan_workers',
+        default_value=4,
+    )
+
+    max_in_flight_octets = deserialise_config_property(
+        config=clamav_config,
+        property_key='max_in_flight_octets',
+        default_value=4 * 1024 ** 3, # 4 GiB
+    )
+
+    max_concurrency_per_registry = deserialise_config_property(
+        config=clamav_config,
+        property_key='max_concurrency_per_registry',
+        default_value=4,
+    )
+
     return ClamAVConfig(
         delivery_service_url=delivery_service_url,
         lookup_new_backlog_item_interval=lookup_new_backlog_item_interval,
         rescan_interval=rescan_interval,
         aws_cfg_name=aws_cfg_name,
         artefact_types=artefact_types,
+        max_scan_workers=max_scan_workers,
+        max_in_flight_octets=max_in_flight_octets,
+        max_concurrency_per_registry=max_concurrency_per_registry,
     )
 
 
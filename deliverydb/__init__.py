@@ -1,9 +1,21 @@
+import dataclasses
 import functools
+import os
+import threading
+import time
 
+import sqlalchemy as sa
 import sqlalchemy.dialects.postgresql as sap
 import sqlalchemy.orm.session
+import sqlalchemy.pool
 
-import deliverydb.model as dm
+import deliverydb.migrations
+
+try:
+    # only available if running as uWSGI application
+    import uwsgidecorators
+except ImportError:
+    uwsgidecorators = None
 
 
 def do_raise(self):
@@ -14,28 +26,170 @@ def do_raise(self):
 sap.JSONB.__init__ = do_raise
 
 
+@dataclasses.dataclass(frozen=True)
+class PoolCfg:
+    '''
+    Settings of the connection-pool which is maintained per process. Hence, the maximum number of
+    connections to the database is `processes * (size + max_overflow)`. As each thread uses at most
+    one connection at a time, `size` should match the number of threads per process.
+
+    `pre_ping` tests connections upon checkout (costs one round trip per checkout), alternatively
+    `recycle_seconds` may be set to a value lower than the idle timeout of the database server.
+    '''
+    size: int = 5
+    max_overflow: int = 10
+    timeout_seconds: float = 30
+    recycle_seconds: int = -1 # never recycle connections
+    pre_ping: bool = True
+
+
+class _InstrumentedQueuePool(sa.pool.QueuePool):
+    '''
+    `QueuePool` which additionally records the amount of checkouts as well as the time it took to
+    obtain connections (i.e. waiting for a connection to be returned to the pool and establishing
+    new connections)
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts_count = 0
+        self.timeouts_count = 0
+        self.wait_seconds_total = 0
+        self.wait_seconds_max = 0
+
+    def _do_get(self):
+        start = time.monotonic()
+
+        try:
+            return super()._do_get()
+        except sa.exc.TimeoutError:
+            with self._metrics_lock:
+                self.timeouts_count += 1
+            raise
+        finally:
+            wait_seconds = time.monotonic() - start
+
+            with self._metrics_lock:
+                self.checkouts_count += 1
+                self.wait_seconds_total += wait_seconds
+                self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+
+_engines: list[sa.Engine] = []
+
+
+def _dispose_engines():
+    # connections of the parent process must not be used by child processes, hence discard them
+    # (without closing, as they are still in use by the parent process)
+    for engine in _engines:
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_engines)
+
+if uwsgidecorators:
+    # uWSGI forks its workers without invoking the hooks registered by `os.register_at_fork`
+    uwsgidecorators.postfork(_dispose_engines)
+
+
 @functools.cache
-def _sqlalchemy_session(db_url: str) -> sqlalchemy.orm.session.Session:
-    import sqlalchemy as sa
+def _engine(
+    db_url: str,
+    pool_cfg: PoolCfg,
+    replica: bool,
+) -> sa.Engine:
+    url = sa.engine.make_url(db_url)
+
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # in-memory databases must not use more than one connection
+        pool_kwargs = {}
+    else:
+        pool_kwargs = {
+            'poolclass': _InstrumentedQueuePool,
+            'pool_size': pool_cfg.size,
+            'max_overflow': pool_cfg.max_overflow,
+            'pool_timeout': pool_cfg.timeout_seconds,
+            'pool_recycle': pool_cfg.recycle_seconds,
+        }
 
     engine = sa.create_engine(
         db_url,
         echo=False,
         future=True,
-        pool_pre_ping=True,
+        pool_pre_ping=pool_cfg.pre_ping,
+        **pool_kwargs,
     )
 
-    Base = dm.Base
-    Base.metadata.create_all(engine)
+    if not replica:
+        # read-replicas receive the schema from the primary
+        deliverydb.migrations.migrate(engine)
+
+    _engines.append(engine)
+
+    return engine
 
-    return sa.orm.sessionmaker(bind=engine)
+
+def engine(
+    db_url: str,
+    pool_cfg: PoolCfg=None,
+    replica: bool=False,
+) -> sa.Engine:
+    return _engine(db_url, pool_cfg or PoolCfg(), replica)
+
+
+@functools.cache
+def _sqlalchemy_session(
+    db_url: str,
+    pool_cfg: PoolCfg,
+    replica: bool,
+) -> sqlalchemy.orm.session.sessionmaker:
+    return sa.orm.sessionmaker(bind=_engine(db_url, pool_cfg, replica))
 
 
-def sqlalchemy_session(db_url: str) -> sqlalchemy.orm.session.Session:
+def sqlalchemy_session(
+    db_url: str,
+    pool_cfg: PoolCfg=None,
+    replica: bool=False,
+) -> sqlalchemy.orm.session.Session:
     '''
     Caller must close database-session.
 
     Using session object managed by `DBSessionLifecycle` middleware is the preferred way to obtain
     a database-session.
+
+    If `replica` is set, `db_url` refers to a read-replica, for which no schema migrations are
+    applied.
+    '''
+    return _sqlalchemy_session(db_url, pool_cfg or PoolCfg(), replica)()
+
+
+def pool_metrics(
+    db_url: str,
+    pool_cfg: PoolCfg=None,
+) -> dict:
     '''
-    return _sqlalchemy_session(db_url=db_url)()
+    returns metrics of the connection-pool of the current process
+    '''
+    pool_cfg = pool_cfg or PoolCfg()
+    pool = engine(db_url, pool_cfg).pool
+
+    metrics = {
+        'pid': os.getpid(),
+        'pool': pool.status(),
+    }
+
+    if not isinstance(pool, _InstrumentedQueuePool):
+        return metrics
+
+    return metrics | {
+        'size': pool.size(),
+        'max_overflow': pool_cfg.max_overflow,
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'checkouts_count': pool.checkouts_count,
+        'timeouts_count': pool.timeouts_count,
+        'wait_seconds_total': pool.wait_seconds_total,
+        'wait_seconds_max': pool.wait_seconds_max,
+        'wait_seconds_avg': pool.wait_seconds_total / max(pool.checkouts_count, 1),
+    }
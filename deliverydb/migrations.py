@@ -0,0 +1,260 @@
+'''
+Versioned schema migrations for the delivery-db.
+
+Each migration is applied exactly once (in order of its version) and recorded in the
+`schema_version` table. Migrations are applied within a single transaction which, for PostgreSQL,
+is guarded by an advisory lock so that concurrently starting service instances do not race.
+
+New migrations must be appended to `MIGRATIONS` and must not alter existing ones.
+'''
+import collections.abc
+import dataclasses
+import logging
+
+import sqlalchemy as sa
+
+import deliverydb.model as dm
+
+
+logger = logging.getLogger(__name__)
+
+# arbitrary, but fixed key used for `pg_advisory_xact_lock`
+MIGRATION_LOCK_KEY = 0x64656c6976657279 # "delivery" in hex
+
+
+@dataclasses.dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: collections.abc.Callable[[sa.Connection], None]
+
+
+# schema as of the introduction of schema migrations, which must not be derived from the (current)
+# model, as fresh databases would differ from migrated ones otherwise
+_baseline_metadata = sa.MetaData()
+sa.Table(
+    'artefact_metadata',
+    _baseline_metadata,
+    sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+    sa.Column('creation_date', sa.DateTime(timezone=True), server_default=sa.sql.func.now()),
+    sa.Column('type', sa.String(length=64)),
+    sa.Column('component_name', sa.String(length=256)),
+    sa.Column('component_version', sa.String(length=64)),
+    sa.Column('artefact_kind', sa.String(length=32)),
+    sa.Column('artefact_name', sa.String(length=128)),
+    sa.Column('artefact_version', sa.String(length=64)),
+    sa.Column('artefact_type', sa.String(length=64)),
+    sa.Column('artefact_extra_id_normalised', sa.String(length=1024)),
+    sa.Column('artefact_extra_id', sa.JSON),
+    sa.Column('meta', sa.JSON),
+    sa.Column('data', sa.JSON),
+    sa.Column('data_key', sa.CHAR(length=40)),
+    sa.Column('datasource', sa.String(length=64)),
+    sa.Column('cfg_name', sa.String(length=64)),
+    sa.Column('referenced_type', sa.String(length=64)),
+    sa.Column('discovery_date', sa.Date),
+    sa.Index(
+        'ix_artefact_metadata_component_name',
+        'component_name',
+        'component_version',
+        'type',
+        'artefact_type',
+    ),
+)
+
+
+def _create_tables(connection: sa.Connection):
+    # no-op for existing tables (i.e. databases which were set up prior to schema migrations)
+    _baseline_metadata.create_all(connection, checkfirst=True)
+
+
+def _create_artefact_metadata_indexes(
+    *index_names: str,
+) -> collections.abc.Callable[[sa.Connection], None]:
+    def create_indexes(connection: sa.Connection):
+        for index in dm.ArtefactMetaData.__table__.indexes:
+            if index.name in index_names:
+                # `checkfirst` relies on reflection, which does not support expression-based
+                # indexes for all dialects
+                connection.execute(sa.schema.CreateIndex(index, if_not_exists=True))
+
+    return create_indexes
+
+
+def duplicate_artefact_metadata_identities(
+    connection: sa.Connection,
+) -> list[sa.Row]:
+    '''
+    returns the identities (see `dm.artefact_metadata_identity`) which are shared by more than one
+    artefact-metadata entry, incl. the amount of entries (`entries_count`)
+    '''
+    return connection.execute(
+        sa.select(
+            *dm.artefact_metadata_identity,
+            sa.func.count().label('entries_count'),
+        ).where(
+            dm.artefact_metadata_identity_where,
+        ).group_by(
+            *dm.artefact_metadata_identity,
+        ).having(
+            sa.func.count() > 1,
+        ),
+    ).all()
+
+
+def deduplicate_artefact_metadata(
+    connection: sa.Connection,
+) -> int:
+    '''
+    merges artefact-metadata entries with the same identity into the oldest entry (i.e. the one
+    which used to be updated by subsequent uploads), which receives the newest payload (determined
+    by `meta.last_update`) and the earliest discovery date. Returns the amount of removed entries.
+
+    Must be run explicitly by operators in case migration 3 (unique index on artefact-metadata
+    identity) refuses to apply because of duplicates.
+    '''
+    removed_count = 0
+
+    for identity in duplicate_artefact_metadata_identities(connection):
+        entries = connection.execute(
+            sa.select(
+                dm.ArtefactMetaData.id,
+                dm.ArtefactMetaData.meta,
+                dm.ArtefactMetaData.data,
+                dm.ArtefactMetaData.discovery_date,
+            ).where(
+                dm.artefact_metadata_identity_where,
+                *(
+                    expression == value
+                    for expression, value in zip(dm.artefact_metadata_identity, identity)
+                ),
+            ).order_by(
+                dm.ArtefactMetaData.id,
+            ),
+        ).all()
+
+        oldest_entry = entries[0]
+        newest_entry = max(
+            entries,
+            key=lambda entry: ((entry.meta or {}).get('last_update') or '', entry.id),
+        )
+        discovery_dates = [entry.discovery_date for entry in entries if entry.discovery_date]
+
+        connection.execute(
+            sa.update(dm.ArtefactMetaData).where(
+                dm.ArtefactMetaData.id == oldest_entry.id,
+            ).values(
+                meta=newest_entry.meta,
+                data=newest_entry.data,
+                discovery_date=min(discovery_dates, default=None),
+            ),
+        )
+
+        removed_ids = [entry.id for entry in entries[1:]]
+        connection.execute(
+            sa.delete(dm.ArtefactMetaData).where(dm.ArtefactMetaData.id.in_(removed_ids)),
+        )
+        removed_count += len(removed_ids)
+
+        logger.info(
+            f'merged artefact-metadata entries {removed_ids} into {oldest_entry.id} '
+            f'(payload of {newest_entry.id}), {identity=}'
+        )
+
+    return removed_count
+
+
+def _create_artefact_metadata_identity_index(connection: sa.Connection):
+    # duplicates could have been created by concurrent uploads; as they might differ in their
+    # payload, they must not be removed implicitly but be merged explicitly by operators
+    if duplicates := duplicate_artefact_metadata_identities(connection):
+        identities = '\n'.join(
+            f'{identity.entries_count} entries: {tuple(identity)[:-1]}'
+            for identity in duplicates[:20]
+        )
+        if len(duplicates) > 20:
+            identities += '\n...'
+
+        raise RuntimeError(
+            f'{len(duplicates)} artefact-metadata identities are shared by multiple entries, merge '
+            'them (see `deduplicate_artefact_metadata` command of `cli/_deliverydb.py`) before '
+            f'applying this migration:\n{identities}'
+        )
+
+    _create_artefact_metadata_indexes('ux_artefact_metadata_identity')(connection)
+
+
+MIGRATIONS = (
+    Migration(
+        version=1,
+        description='create tables',
+        apply=_create_tables,
+    ),
+    Migration(
+        version=2,
+        description='add indexes for artefact-id, rescoring and latest-metadata lookups',
+        apply=_create_artefact_metadata_indexes(
+            'ix_artefact_metadata_artefact_id',
+            'ix_artefact_metadata_artefact_id_without_component_version',
+            'ix_artefact_metadata_rescorings',
+            'ix_artefact_metadata_latest',
+        ),
+    ),
+    Migration(
+        version=3,
+        description='add unique index on artefact-metadata identity',
+        apply=_create_artefact_metadata_identity_index,
+    ),
+)
+
+
+def schema_version(connection: sa.Connection) -> int:
+    '''
+    returns the version of the latest applied migration or `0` if no migration was applied yet
+    '''
+    if not sa.inspect(connection).has_table(dm.SchemaVersion.__tablename__):
+        return 0
+
+    return connection.execute(
+        sa.select(sa.func.max(dm.SchemaVersion.version)),
+    ).scalar() or 0
+
+
+def migrate(
+    engine: sa.Engine,
+    migrations: collections.abc.Sequence[Migration]=MIGRATIONS,
+):
+    '''
+    applies all pending `migrations`, raises if the database schema is newer than the latest known
+    migration (i.e. a newer version of this service already migrated the database)
+    '''
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(
+                sa.text('SELECT pg_advisory_xact_lock(:key)'),
+                {'key': MIGRATION_LOCK_KEY},
+            )
+
+        current_version = schema_version(connection)
+        latest_version = max(migration.version for migration in migrations)
+
+        if current_version > latest_version:
+            raise RuntimeError(
+                f'delivery-db schema {current_version=} is newer than {latest_version=}'
+            )
+
+        dm.SchemaVersion.__table__.create(connection, checkfirst=True)
+
+        for migration in sorted(migrations, key=lambda migration: migration.version):
+            if migration.version <= current_version:
+                continue
+
+            logger.info(
+                f'applying delivery-db migration {migration.version}: {migration.description}'
+            )
+            migration.apply(connection)
+
+            connection.execute(sa.insert(dm.SchemaVersion).values(
+                version=migration.version,
+                description=migration.description,
+            ))
@@ -54,6 +54,20 @@ class ArtefactMetaData(Base):
     discovery_date = Column(sa.Date)
 
 
+class SchemaVersion(Base):
+    '''
+    one entry per applied schema migration, see `deliverydb.migrations`
+    '''
+    __tablename__ = 'schema_version'
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(sa.String(length=256))
+    applied_at = Column(
+        sa.DateTime(timezone=True),
+        server_default=sa.sql.func.now(),
+    )
+
+
 sa.Index(
     None,
     ArtefactMetaData.component_name,
@@ -61,3 +75,70 @@ sa.Index(
     ArtefactMetaData.type,
     ArtefactMetaData.artefact_type,
 )
+
+# lookups of (single) scan results by artefact id, see `ArtefactMetadataFilters`
+sa.Index(
+    'ix_artefact_metadata_artefact_id',
+    ArtefactMetaData.component_name,
+    ArtefactMetaData.artefact_name,
+    ArtefactMetaData.type,
+    ArtefactMetaData.datasource,
+    ArtefactMetaData.data_key,
+)
+
+# lookups of scan results which are not bound to a component version (e.g. BDBA scan results)
+sa.Index(
+    'ix_artefact_metadata_artefact_id_without_component_version',
+    ArtefactMetaData.artefact_name,
+    ArtefactMetaData.artefact_version,
+    ArtefactMetaData.artefact_type,
+    ArtefactMetaData.type,
+    postgresql_where=ArtefactMetaData.component_version == None,
+    sqlite_where=ArtefactMetaData.component_version == None,
+)
+
+# lookups of rescorings applicable to a finding, see `rescoring_util`
+sa.Index(
+    'ix_artefact_metadata_rescorings',
+    ArtefactMetaData.referenced_type,
+    ArtefactMetaData.artefact_kind,
+    ArtefactMetaData.artefact_type,
+    ArtefactMetaData.component_name,
+    ArtefactMetaData.artefact_name,
+    postgresql_where=ArtefactMetaData.type == 'rescorings',
+    sqlite_where=ArtefactMetaData.type == 'rescorings',
+)
+
+# lookups of latest metadata per type
+sa.Index(
+    'ix_artefact_metadata_latest',
+    ArtefactMetaData.component_name,
+    ArtefactMetaData.type,
+    ArtefactMetaData.creation_date.desc(),
+)
+
+# identity of artefact-metadata entries, entries with the same identity are updated instead of
+# being created again, see `deliverydb.util.artefact_metadata_identity`
+# note: expressions and predicate are rendered as literals so that they can be used as conflict
+# target for `INSERT ... ON CONFLICT` statements as well
+artefact_metadata_identity = (
+    ArtefactMetaData.type,
+    ArtefactMetaData.component_name,
+    sa.func.coalesce(ArtefactMetaData.component_version, sa.literal_column("''")),
+    ArtefactMetaData.artefact_kind,
+    ArtefactMetaData.artefact_name,
+    sa.func.coalesce(ArtefactMetaData.artefact_version, sa.literal_column("''")),
+    ArtefactMetaData.artefact_type,
+    ArtefactMetaData.datasource,
+    sa.func.coalesce(ArtefactMetaData.data_key, sa.literal_column("''")),
+)
+# rescorings are identified by their artefact-extra-id as well, see `rescore.Rescore.on_post`
+artefact_metadata_identity_where = ArtefactMetaData.type != sa.literal_column("'rescorings'")
+
+sa.Index(
+    'ux_artefact_metadata_identity',
+    *artefact_metadata_identity,
+    unique=True,
+    postgresql_where=artefact_metadata_identity_where,
+    sqlite_where=artefact_metadata_identity_where,
+)
@@ -0,0 +1,209 @@
+'''
+Routing of read-only database-sessions to read-replicas of the delivery-db.
+
+Replicas are used in turns as long as their replication lag does not exceed the configured
+tolerance. The replication lag is determined at most once per check interval and replica, whereas
+checks run in the background so that requests are never blocked by slow or unreachable replicas.
+If no replica is available (i.e. all replicas are either lagging behind, not reachable or not
+checked yet), the primary is used instead.
+'''
+import dataclasses
+import functools
+import itertools
+import logging
+import math
+import threading
+import time
+
+import sqlalchemy as sa
+import sqlalchemy.orm.session
+import sqlalchemy.pool
+
+import deliverydb
+
+
+logger = logging.getLogger(__name__)
+
+# the replay timestamp does not advance while there are no writes on the primary, hence a replica
+# which has replayed all received WAL is considered to be up-to-date
+POSTGRESQL_REPLICATION_LAG_QUERY = sa.text('''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+''')
+
+
+@dataclasses.dataclass(frozen=True)
+class ReplicaCfg:
+    urls: tuple[str, ...] = ()
+    max_lag_seconds: float = 30
+    lag_check_interval_seconds: float = 10
+    lag_check_timeout_seconds: float = 5
+
+
+@dataclasses.dataclass
+class _ReplicaState:
+    url: str
+    available: bool = False
+    lag_seconds: float | None = None
+    checked_at: float = -math.inf
+    checking: bool = False
+
+
+def replication_lag_seconds(
+    engine: sa.Engine,
+) -> float:
+    '''
+    returns the replication lag of the database `engine` is connected to, `0` for dialects which
+    do not support replication
+    '''
+    with engine.connect() as connection:
+        # connect regardless of dialect so that unreachable replicas are detected
+        if engine.dialect.name != 'postgresql':
+            return 0
+
+        return float(connection.execute(POSTGRESQL_REPLICATION_LAG_QUERY).scalar())
+
+
+@functools.cache
+def _lag_check_engine(
+    db_url: str,
+    timeout_seconds: float,
+) -> sa.Engine:
+    '''
+    returns an engine for lag checks, which does not share the connection-pool used for sessions
+    and limits the time for connecting as well as for the lag query. As connections are not pooled,
+    the engine may also be used by forked processes.
+    '''
+    url = sa.engine.make_url(db_url)
+
+    if url.get_backend_name() == 'postgresql':
+        connect_args = {
+            'connect_timeout': max(math.ceil(timeout_seconds), 1),
+            'options': f'-c statement_timeout={int(timeout_seconds * 1000)}',
+        }
+    elif url.get_backend_name() == 'sqlite':
+        connect_args = {'timeout': timeout_seconds}
+    else:
+        connect_args = {}
+
+    return sa.create_engine(
+        db_url,
+        poolclass=sa.pool.NullPool,
+        connect_args=connect_args,
+    )
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary_url: str,
+        replica_cfg: ReplicaCfg,
+        pool_cfg: deliverydb.PoolCfg=None,
+    ):
+        self.primary_url = primary_url
+        self.replica_cfg = replica_cfg
+        self.pool_cfg = pool_cfg
+
+        self._replicas = [_ReplicaState(url=url) for url in replica_cfg.urls]
+        self._round_robin = itertools.count()
+        self._condition = threading.Condition()
+
+        # replicas are not used until they were checked, hence start checking right away
+        self._start_due_checks()
+
+    def _check(self, replica: _ReplicaState):
+        # must not hold the lock while checking, as connecting might take long
+        try:
+            engine = _lag_check_engine(
+                db_url=replica.url,
+                timeout_seconds=self.replica_cfg.lag_check_timeout_seconds,
+            )
+            lag_seconds = replication_lag_seconds(engine)
+            available = lag_seconds <= self.replica_cfg.max_lag_seconds
+        except sa.exc.SQLAlchemyError as e:
+            logger.warning(f'delivery-db read-replica is not reachable: {e}')
+            lag_seconds = None
+            available = False
+
+        with self._condition:
+            if available != replica.available:
+                logger.info(
+                    f'delivery-db read-replica {"became" if available else "is not"} available; '
+                    f'{lag_seconds=}, {self.replica_cfg.max_lag_seconds=}'
+                )
+
+            replica.lag_seconds = lag_seconds
+            replica.available = available
+            replica.checked_at = time.monotonic()
+            replica.checking = False
+            self._condition.notify_all()
+
+    def _claim_due_checks(self) -> list[_ReplicaState]:
+        now = time.monotonic()
+
+        with self._condition:
+            due_replicas = [
+                replica for replica in self._replicas
+                if (
+                    not replica.checking
+                    and now - replica.checked_at >= self.replica_cfg.lag_check_interval_seconds
+                )
+            ]
+            for replica in due_replicas:
+                replica.checking = True
+
+        return due_replicas
+
+    def _start_due_checks(self):
+        for replica in self._claim_due_checks():
+            threading.Thread(
+                target=self._check,
+                args=(replica,),
+                name='delivery-db-replica-lag-check',
+                daemon=True,
+            ).start()
+
+    def check_replicas(self):
+        '''
+        waits for checks which are running in the background and checks all replicas which are due
+        for a check afterwards synchronously (checks are only run in the background otherwise)
+        '''
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not any(replica.checking for replica in self._replicas),
+            )
+
+        for replica in self._claim_due_checks():
+            self._check(replica)
+
+    def _available_replicas(self) -> list[_ReplicaState]:
+        # only the recorded state is used, outdated states are updated in the background
+        self._start_due_checks()
+
+        with self._condition:
+            return [replica for replica in self._replicas if replica.available]
+
+    def session(
+        self,
+        read_only: bool=False,
+    ) -> sqlalchemy.orm.session.Session:
+        '''
+        returns a database-session for the primary or, if `read_only` is set, for one of the
+        available read-replicas (falls back to the primary if none is available)
+        '''
+        if read_only and self._replicas and (replicas := self._available_replicas()):
+            replica = replicas[next(self._round_robin) % len(replicas)]
+
+            return deliverydb.sqlalchemy_session(
+                db_url=replica.url,
+                pool_cfg=self.pool_cfg,
+                replica=True,
+            )
+
+        return deliverydb.sqlalchemy_session(
+            db_url=self.primary_url,
+            pool_cfg=self.pool_cfg,
+        )
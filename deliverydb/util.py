@@ -1,16 +1,18 @@
 import collections.abc
 import dataclasses
+import enum
 import hashlib
 
 import sqlalchemy as sa
-import sqlalchemy.sql.elements as sqle
+import sqlalchemy.dialects.postgresql
+import sqlalchemy.dialects.sqlite
 
 import ci.util
-import cnudie.iter
 import cnudie.retrieve
 import dso.model
 import ocm
 
+import component_graph
 import deliverydb.model as dm
 
 
@@ -85,9 +87,80 @@ def to_db_artefact_metadata(
     )
 
 
+def artefact_metadata_identity(
+    artefact_metadata: dm.ArtefactMetaData | sa.Row,
+) -> tuple:
+    '''
+    returns the identity of `artefact_metadata` as defined by `dm.artefact_metadata_identity`
+
+    note: the artefact-extra-id is not included (yet) because there is only one entry for all ocm
+    resources with different extra-ids at the moment
+    '''
+    return (
+        artefact_metadata.type,
+        artefact_metadata.component_name,
+        artefact_metadata.component_version or '',
+        artefact_metadata.artefact_kind,
+        artefact_metadata.artefact_name,
+        artefact_metadata.artefact_version or '',
+        artefact_metadata.artefact_type,
+        artefact_metadata.datasource,
+        artefact_metadata.data_key or '',
+    )
+
+
+def upsert_artefact_metadata_statement(
+    dialect_name: str,
+) -> sa.Insert:
+    '''
+    returns an `INSERT` statement for artefact-metadata which updates the payload of an existing
+    entry with the same identity instead of failing (as it might have been created concurrently in
+    the meantime)
+    '''
+    if dialect_name == 'postgresql':
+        insert = sqlalchemy.dialects.postgresql.insert
+    elif dialect_name == 'sqlite':
+        insert = sqlalchemy.dialects.sqlite.insert
+    else:
+        return sa.insert(dm.ArtefactMetaData)
+
+    statement = insert(dm.ArtefactMetaData)
+
+    return statement.on_conflict_do_update(
+        index_elements=dm.artefact_metadata_identity,
+        index_where=dm.artefact_metadata_identity_where,
+        set_={
+            'data': statement.excluded.data,
+            'meta': statement.excluded.meta,
+        },
+    )
+
+
+# columns required to serialise artefact metadata to their wire representation, selecting only
+# these columns (instead of ORM entities) avoids the overhead of the ORM's identity map
+artefact_metadata_wire_columns = (
+    dm.ArtefactMetaData.id,
+    dm.ArtefactMetaData.type,
+    dm.ArtefactMetaData.component_name,
+    dm.ArtefactMetaData.component_version,
+    dm.ArtefactMetaData.artefact_kind,
+    dm.ArtefactMetaData.artefact_name,
+    dm.ArtefactMetaData.artefact_version,
+    dm.ArtefactMetaData.artefact_type,
+    dm.ArtefactMetaData.artefact_extra_id,
+    dm.ArtefactMetaData.meta,
+    dm.ArtefactMetaData.data,
+    dm.ArtefactMetaData.discovery_date,
+)
+
+
 def db_artefact_metadata_to_dict(
-    artefact_metadata: dm.ArtefactMetaData,
+    artefact_metadata: dm.ArtefactMetaData | sa.Row,
 ) -> dict:
+    '''
+    returns the wire representation of `artefact_metadata`, which is either an ORM entity or a row
+    containing (at least) the `artefact_metadata_wire_columns`
+    '''
     return {
         'id': artefact_metadata.id,
         'artefact': {
@@ -112,7 +185,7 @@ def db_artefact_metadata_to_dict(
 
 
 def db_artefact_metadata_to_dso(
-    artefact_metadata: dm.ArtefactMetaData,
+    artefact_metadata: dm.ArtefactMetaData | sa.Row,
 ) -> dso.model.ArtefactMetadata:
     artefact_metadata_dict = db_artefact_metadata_to_dict(
         artefact_metadata=artefact_metadata,
@@ -157,6 +230,63 @@ class ArtefactMetadataFilters:
             dm.ArtefactMetaData.data_key == artefact_metadata.data_key,
         )
 
+    @staticmethod
+    def by_single_scan_results(
+        artefact_metadata: collections.abc.Iterable[dm.ArtefactMetaData],
+    ) -> sa.ColumnElement[bool]:
+        '''
+        Same as `by_single_scan_result` but matches any of `artefact_metadata`. Entries are grouped
+        by their properties which are `None`, so that each group results in one (index-friendly)
+        tuple `IN` predicate instead of one predicate per entry.
+        '''
+        columns = (
+            dm.ArtefactMetaData.component_name,
+            dm.ArtefactMetaData.artefact_name,
+            dm.ArtefactMetaData.type,
+            dm.ArtefactMetaData.datasource,
+            dm.ArtefactMetaData.data_key,
+            dm.ArtefactMetaData.component_version,
+            dm.ArtefactMetaData.artefact_type,
+            dm.ArtefactMetaData.artefact_version,
+            dm.ArtefactMetaData.artefact_extra_id_normalised,
+        )
+
+        values_by_none_columns = collections.defaultdict(set)
+        for artefact_metadatum in artefact_metadata:
+            values = tuple(getattr(artefact_metadatum, column.key) for column in columns)
+            none_columns = tuple(value is None for value in values)
+
+            values_by_none_columns[none_columns].add(tuple(
+                value for value in values
+                if value is not None
+            ))
+
+        if not values_by_none_columns:
+            return sa.false()
+
+        def predicate(
+            none_columns: tuple[bool],
+            values: set[tuple],
+        ) -> sa.ColumnElement[bool]:
+            specified_columns = [
+                column for column, is_none in zip(columns, none_columns)
+                if not is_none
+            ]
+
+            return sa.and_(
+                *(
+                    column == None
+                    for column, is_none in zip(columns, none_columns)
+                    if is_none
+                ),
+                sa.tuple_(*specified_columns).in_(values) if specified_columns else True,
+            )
+
+        return sa.or_(*(
+            predicate(none_columns=none_columns, values=values)
+            for none_columns, values in values_by_none_columns.items()
+        ))
+
     @staticmethod
     def filter_for_rescoring_type(
         type_filter: list[str]=None,
@@ -170,127 +300,281 @@ class ArtefactMetadataFilters:
         )
 
 
-class ArtefactMetadataQueries:
-    @staticmethod
-    def artefact_queries(
-        artefacts: collections.abc.Iterable[ocm.Resource | ocm.Source]=None,
-        component: ocm.ComponentIdentity=None,
-        component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById=None,
-        none_ok: bool=False,
-    ) -> collections.abc.Generator[sqle.BooleanClauseList, None, None]:
-        '''
-        Generates single SQL expressions which check for equality with one artefact of `artefacts`.
-        If `artefacts` is not specified, `component` and `component_descriptor_lookup` _must_ be
-        both specified to retrieve all artefacts of the given `component`.
+def _values_cte(
+    name: str,
+    columns: collections.abc.Iterable[str],
+    rows: collections.abc.Iterable[tuple],
+) -> sa.CTE:
+    '''
+    Returns a common table expression which ships `rows` as one `VALUES` list. Values are rendered
+    as literals, so the amount of bind parameters (which is limited by the database drivers) does
+    not grow with the number of rows.
+    '''
+    return sa.values(
+        *(sa.column(column, sa.String) for column in columns),
+        name=name,
+        literal_binds=True,
+    ).data(list(rows)).cte(name)
+
+
+def _matches(
+    column: sa.Column,
+    value: sa.ColumnElement,
+    none_ok: bool=False,
+) -> sa.ColumnElement[bool]:
+    '''
+    Checks `column` for equality with `value`, whereby `None` equals `None` (same semantics as
+    comparing a column with a Python value). If `none_ok` is set to `True`, a database entry with
+    `None` as value also matches.
+    '''
+    if none_ok:
+        return sa.or_(
+            column == value,
+            column == None,
+        )
+
+    return sa.or_(
+        column == value,
+        sa.and_(
+            column == None,
+            value == None,
+        ),
+    )
 
-        Intended to be concatenated using an `OR` expression which semantically checks a database
-        entry to be one of `artefacts`.
 
-        If a property mismatches but the value stored in the database is `None` and `none_ok` is set
-        to `True`, the predecate evaluates to `True` anyways.
-        '''
-        if not (artefacts or (component and component_descriptor_lookup)):
+def _matches_if_specified(
+    column: sa.Column,
+    value: sa.ColumnElement,
+    none_ok: bool=False,
+) -> sa.ColumnElement[bool]:
+    '''
+    Same as `_matches` but evaluates to `True` if `value` is `None`, i.e. not specified.
+    '''
+    if none_ok:
+        return sa.or_(
+            value == None,
+            column == value,
+            column == None,
+        )
+
+    return sa.or_(
+        value == None,
+        column == value,
+    )
+
+
+def _iter_component_artefacts(
+    components: collections.abc.Iterable[ocm.ComponentIdentity],
+    component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById=None,
+) -> collections.abc.Generator[tuple[str, ...], None, None]:
+    '''
+    Yields the artefact ids of all artefacts (including the ones of referenced components) of those
+    `components` which have a version set.
+    '''
+    seen_components = set()
+
+    for component in components:
+        if not component.version:
+            continue
+
+        if (component.name, component.version) in seen_components:
+            continue
+        seen_components.add((component.name, component.version))
+
+        if not component_descriptor_lookup:
             raise ValueError(
-                'either `artefacts` or `component` and `component_descriptor_lookup` '
-                'must be specified'
+                '`component_descriptor_lookup` must be specified to retrieve artefacts of '
+                f'{component.name}:{component.version}'
             )
 
-        if not artefacts:
-            if component.version:
-                component: ocm.Component = component_descriptor_lookup(component).component
-
-                artefacts = tuple(
-                    artefact_node.artefact for artefact_node in cnudie.iter.iter(
-                    component=component,
-                    lookup=component_descriptor_lookup,
-                    node_filter=cnudie.iter.Filter.artefacts,
-                ))
-            else:
-                # if no component version is specified, artefact specific querying must be
-                # taken care of by the caller
-                yield True
-                return
-
-        for artefact in artefacts:
-            yield sa.and_(
-                # if name or version is missing and `none_ok` is set, set predicate to `True`
-                sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.artefact_name == None,
-                    ),
-                    dm.ArtefactMetaData.artefact_name == artefact.name,
-                ),
-                sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.artefact_version == None,
-                    ),
-                    dm.ArtefactMetaData.artefact_version == artefact.version,
-                ),
-                sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.artefact_type == None,
-                    ),
-                    dm.ArtefactMetaData.artefact_type == artefact.type,
-                ),
-                sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.artefact_extra_id_normalised == None,
-                    ),
-                    dm.ArtefactMetaData.artefact_extra_id_normalised
-                        == dso.model.normalise_artefact_extra_id(
-                        artefact_extra_id=artefact.extraIdentity,
-                    ),
+        component_descriptor = component_descriptor_lookup(ocm.ComponentIdentity(
+            name=component.name,
+            version=component.version,
+        ))
+
+        for artefact_node in component_graph.iter_artefact_nodes(component_graph.component_nodes(
+            component=component_descriptor.component,
+            component_descriptor_lookup=component_descriptor_lookup,
+        )):
+            artefact = artefact_node.artefact
+
+            yield (
+                component.name,
+                component.version,
+                artefact.name,
+                artefact.version,
+                artefact.type.value if isinstance(artefact.type, enum.Enum) else artefact.type,
+                dso.model.normalise_artefact_extra_id(
+                    artefact_extra_id=artefact.extraIdentity,
                 ),
             )
 
+
+class ArtefactMetadataQueries:
     @staticmethod
-    def component_queries(
-        components: tuple[ocm.Component | ocm.ComponentIdentity],
+    def artefact_refs_query(
+        artefact_refs: collections.abc.Iterable[dso.model.ComponentArtefactId],
         none_ok: bool=False,
         component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById=None,
-    ) -> collections.abc.Generator[sqle.BooleanClauseList, None, None]:
+    ) -> sa.ColumnElement[bool]:
         '''
-        Generates single SQL expressions which check for equality with one component of `components`
-        by name and version.
-
-        Intended to be concatenated using an `OR` expression which semantically checks a database
-        entry to be one of `components`.
+        Returns a single SQL expression which checks a database entry to match one of
+        `artefact_refs`. The artefact refs are shipped as `VALUES` list and joined against the
+        database entries (instead of concatenating one predicate per artefact ref using an `OR`
+        expression), so that the complexity of the SQL statement does not grow with the number of
+        `artefact_refs`.
 
-        If a property mismatches but the value stored in the database is `None` and `none_ok` is set
-        to `True`, the predecate evaluates to `True` anyways.
+        The component name and version must match (`None` only matches `None`). Properties of the
+        local artefact id are only checked if they are specified. If a property mismatches but the
+        value stored in the database is `None` and `none_ok` is set to `True`, the predicate
+        evaluates to `True` anyways.
 
         If the component version of a database entry is not specified and `none_ok` is not `True`,
-        it is checked whether the component in question contains an artefact version which matches
-        the database entry. This is especially useful for retrieving BDBA scan results which don't
+        it is checked whether the component in question contains an artefact which matches the
+        database entry. This is especially useful for retrieving BDBA scan results which don't
         contain a component version (for deduplication), to only query scan results for artefact
-        versions which are included in the specified component versions.
+        versions which are included in the specified component versions. In this case,
+        `component_descriptor_lookup` must be specified.
         '''
-        for component in components:
-            yield sa.and_(
-                # if name or version is missing and `none_ok` is set, set predicate to `True`
-                sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.component_name == None,
-                    ),
-                    dm.ArtefactMetaData.component_name == component.name,
+        artefact_refs = tuple(artefact_refs)
+
+        if not artefact_refs:
+            return sa.false()
+
+        refs = _values_cte(
+            name='artefact_refs',
+            columns=(
+                'component_name',
+                'component_version',
+                'artefact_name',
+                'artefact_version',
+                'artefact_type',
+                'artefact_extra_id_normalised',
+            ),
+            rows=dict.fromkeys(
+                (
+                    artefact_ref.component_name,
+                    artefact_ref.component_version,
+                    # empty values (e.g. empty extra id) are considered "not specified"
+                    artefact_ref.artefact and artefact_ref.artefact.artefact_name or None,
+                    artefact_ref.artefact and artefact_ref.artefact.artefact_version or None,
+                    artefact_ref.artefact and artefact_ref.artefact.artefact_type or None,
+                    artefact_ref.artefact
+                        and artefact_ref.artefact.normalised_artefact_extra_id() or None,
+                ) for artefact_ref in artefact_refs
+            ),
+        )
+
+        if none_ok:
+            component_version_unknown = dm.ArtefactMetaData.component_version == None
+        else:
+            component_artefacts_rows = tuple(dict.fromkeys(_iter_component_artefacts(
+                components=(
+                    ocm.ComponentIdentity(
+                        name=artefact_ref.component_name,
+                        version=artefact_ref.component_version,
+                    ) for artefact_ref in artefact_refs
                 ),
-                sa.or_(
-                    dm.ArtefactMetaData.component_version == component.version,
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.component_version == None,
+                component_descriptor_lookup=component_descriptor_lookup,
+            )))
+
+            if component_artefacts_rows:
+                component_artefacts = _values_cte(
+                    name='component_artefacts',
+                    columns=(
+                        'component_name',
+                        'component_version',
+                        'artefact_name',
+                        'artefact_version',
+                        'artefact_type',
+                        'artefact_extra_id_normalised',
+                    ),
+                    rows=component_artefacts_rows,
+                )
+
+                artefact_of_component = sa.exists().where(
+                    component_artefacts.c.component_name == refs.c.component_name,
+                    component_artefacts.c.component_version == refs.c.component_version,
+                    _matches(
+                        dm.ArtefactMetaData.artefact_name,
+                        component_artefacts.c.artefact_name,
+                    ),
+                    _matches(
+                        dm.ArtefactMetaData.artefact_version,
+                        component_artefacts.c.artefact_version,
                     ),
-                    sa.and_(
-                        dm.ArtefactMetaData.component_version == None,
-                        sa.or_(ArtefactMetadataQueries.artefact_queries(
-                            component=component,
-                            component_descriptor_lookup=component_descriptor_lookup,
-                        )),
+                    _matches(
+                        dm.ArtefactMetaData.artefact_type,
+                        component_artefacts.c.artefact_type,
                     ),
+                    _matches(
+                        dm.ArtefactMetaData.artefact_extra_id_normalised,
+                        component_artefacts.c.artefact_extra_id_normalised,
+                    ),
+                ).correlate_except(component_artefacts)
+            else:
+                artefact_of_component = sa.false()
+
+            component_version_unknown = sa.and_(
+                dm.ArtefactMetaData.component_version == None,
+                sa.or_(
+                    # if no component version is specified, artefact specific querying must be
+                    # taken care of by the caller
+                    refs.c.component_version == None,
+                    artefact_of_component,
                 ),
             )
+
+        return sa.exists().where(
+            _matches(
+                dm.ArtefactMetaData.component_name,
+                refs.c.component_name,
+                none_ok=none_ok,
+            ),
+            sa.or_(
+                dm.ArtefactMetaData.component_version == refs.c.component_version,
+                component_version_unknown,
+            ),
+            _matches_if_specified(
+                dm.ArtefactMetaData.artefact_name,
+                refs.c.artefact_name,
+                none_ok=none_ok,
+            ),
+            _matches_if_specified(
+                dm.ArtefactMetaData.artefact_version,
+                refs.c.artefact_version,
+                none_ok=none_ok,
+            ),
+            _matches_if_specified(
+                dm.ArtefactMetaData.artefact_type,
+                refs.c.artefact_type,
+                none_ok=none_ok,
+            ),
+            _matches_if_specified(
+                dm.ArtefactMetaData.artefact_extra_id_normalised,
+                refs.c.artefact_extra_id_normalised,
+                none_ok=none_ok,
+            ),
+        ).correlate_except(refs)
+
+    @staticmethod
+    def component_query(
+        components: collections.abc.Iterable[ocm.Component | ocm.ComponentIdentity],
+        none_ok: bool=False,
+        component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById=None,
+    ) -> sa.ColumnElement[bool]:
+        '''
+        Returns a single SQL expression which checks a database entry to be one of `components`
+        by name and version, see `artefact_refs_query` for details.
+        '''
+        return ArtefactMetadataQueries.artefact_refs_query(
+            artefact_refs=(
+                dso.model.ComponentArtefactId(
+                    component_name=component.name,
+                    component_version=component.version,
+                    artefact=None,
+                ) for component in components
+            ),
+            none_ok=none_ok,
+            component_descriptor_lookup=component_descriptor_lookup,
+        )
@@ -6,7 +6,7 @@ import datetime
 import enum
 import functools
 import logging
-import statistics
+import threading
 import typing
 import urllib.parse
 
@@ -15,6 +15,7 @@ import dateutil.parser
 import falcon
 import falcon.media.validators
 import github3
+import numpy as np
 
 import ci.util
 import cnudie.retrieve
@@ -23,11 +24,14 @@ import ocm
 import version as versionutil
 
 import caching
+import component_graph
 import components
+import dora_ledger
+import github_scheduler
+import version_index
 
 
 logger = logging.getLogger(__name__)
-changes_by_dependencies_cache = dict()
 
 
 @dataclasses.dataclass(frozen=True)
@@ -43,22 +47,12 @@ class CodeChange:
 @dataclasses.dataclass(frozen=True)
 class ComponentDependencyChangeWithCommits:
     '''
-    Holds a Dependency Change for a specific Component as well as the commits included within the
-    Dependency Change
+    Holds a Dependency Change (incl. the commits included within the Dependency Change) which was
+    deployed with a specific version of the target Component
     '''
-    component: ocm.Component
-    dependency_component_vector: components.ComponentVector
-    commits: list[github3.github.repo.commit.ShortCommit]
-
-
-@dataclasses.dataclass(frozen=True)
-class ComponentWithDependencyChanges:
-    '''
-    Holds a component descriptor as well as a list of dependency updates, which
-    where introduced in this component Version
-    '''
-    component_descriptor: ocm.ComponentDescriptor
-    dependency_changes: list[components.ComponentVector]
+    target_component_version: str
+    deployment_date: datetime.datetime
+    dependency_change: dora_ledger.DependencyChange
 
 
 class CalculationType(enum.StrEnum):
@@ -106,6 +100,8 @@ class DoraDependencyResponse:
     '''
     change_lead_time_median: float
     change_lead_time_average: float
+    change_lead_time_p50: float
+    change_lead_time_p90: float
     deployment_frequency: float
     changes_monthly: list[DoraMonthlyResponse]
     deployments: list[DoraDeploymentsResponse]
@@ -117,81 +113,19 @@ class DoraDependencyResponse:
 class DoraResponse:
     '''
     Helper datacalss for creating JSON response for the DoraMetrics Route
+
+    @param incomplete_versions:
+        versions of the target component whose dependency changes could not be determined, hence
+        they are not considered for the metrics
     '''
     change_lead_time_median: float
     change_lead_time_average: float
+    change_lead_time_p50: float
+    change_lead_time_p90: float
     dependencies: dict[str, DoraDependencyResponse]
+    incomplete_versions: list[str] = dataclasses.field(default_factory=list)
 
 
-def versions_descriptors_newer_than(
-    component_name: str,
-    date: datetime.datetime,
-    component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById,
-    version_lookup: cnudie.retrieve.VersionLookupByComponent,
-    only_releases: bool = True,
-    invalid_semver_ok: bool = False,
-    sorting_direction: typing.Literal['asc', 'desc'] = 'desc'
-):
-    '''
-    This function retrieves the component descriptors for the versions
-    of a specific Component, which are newer then the given date.
-
-    asc-sorting means old to new => [0.102.0 ... 0.321.2]
-
-    desc-sorting means new to old => [0.321.2 ... 0.102.0]
-    '''
-
-    def _filter_component_newer_than_date(
-        descriptor: ocm.ComponentDescriptor,
-        date: datetime.datetime,
-    ) -> bool:
-        creation_date: datetime.datetime = components.get_creation_date(descriptor.component)
-        return creation_date > date
-
-    versions = all_versions_sorted(
-        component=component_name,
-        sorting_direction='desc',
-        invalid_semver_ok=invalid_semver_ok,
-        only_releases=only_releases,
-        version_lookup=version_lookup,
-    )
-
-    descriptors: list[ocm.ComponentDescriptor] = []
-
-    for version in versions:
-        descriptor = component_descriptor_lookup((component_name, version))
-        try:
-            if not _filter_component_newer_than_date(descriptor, date):
-                break
-        except KeyError:
-            continue
-        descriptors.append(descriptor)
-
-    if sorting_direction == 'asc':
-        descriptors.reverse()
-
-    return descriptors
-
-
-def _cache_key_gen_all_versions_sorted(
-    component: cnudie.retrieve.ComponentName,
-    version_lookup: cnudie.retrieve.VersionLookupByComponent,
-    only_releases: bool = True,
-    invalid_semver_ok: bool = False,
-    sorting_direction: typing.Literal['asc', 'desc'] = 'desc',
-):
-    return cachetools.keys.hashkey(
-        cnudie.util.to_component_name(component),
-        only_releases,
-        invalid_semver_ok,
-        sorting_direction,
-    )
-
-
-@caching.cached(
-    cache=caching.TTLFilesystemCache(ttl=60 * 60 * 24, max_total_size_mib=128), # 1 day
-    key_func=_cache_key_gen_all_versions_sorted,
-)
 def all_versions_sorted(
     component: cnudie.retrieve.ComponentName,
     version_lookup: cnudie.retrieve.VersionLookupByComponent,
@@ -208,32 +142,16 @@ def all_versions_sorted(
     '''
     component_name = cnudie.util.to_component_name(component)
 
-    def filter_version(version: str, invalid_semver_ok: bool, only_releases:bool):
-        if not (parsed_version := versionutil.parse_to_semver(
-            version=version,
-            invalid_semver_ok=invalid_semver_ok,
-        )):
-            return False
-
-        if only_releases:
-            return versionutil.is_final(parsed_version)
-
-        return True
-
-    versions = (
-        version for version
-        in version_lookup(component_name)
-        if filter_version(version, invalid_semver_ok, only_releases)
+    versions = version_index.version_index(
+        component_name=component_name,
+        versions=version_lookup(component_name),
+    ).versions(
+        only_releases=only_releases,
+        invalid_semver_ok=invalid_semver_ok,
     )
 
-    versions = sorted(
-        versions,
-        key=lambda v: versionutil.parse_to_semver(
-            version=v,
-            invalid_semver_ok=invalid_semver_ok,
-        ),
-        reverse=sorting_direction == 'desc',
-    )
+    if sorting_direction == 'desc':
+        versions.reverse()
 
     return versions
 
@@ -320,23 +238,7 @@ def commits_for_component_change(
     ).commits())
 
 
-def _cache_key_changes_by_dependencies(
-    target_descriptors_with_updates: tuple[ComponentWithDependencyChanges],
-):
-    return cachetools.keys.hashkey(''.join([(
-        f'{target_descriptor_with_updates.component_descriptor.component.name}'
-        f'{target_descriptor_with_updates.component_descriptor.component.version}'
-    ) for target_descriptor_with_updates in target_descriptors_with_updates]))
-
-
-def categorize_by_changed_component(
-    target_descriptors_with_updates: tuple[ComponentWithDependencyChanges],
-    github_api_lookup,
-) -> dict[str, list[ComponentDependencyChangeWithCommits]]:
-    dependencies: dict[str, list[ComponentDependencyChangeWithCommits]] = (
-        collections.defaultdict(list[ComponentDependencyChangeWithCommits])
-    )
-
+def _github_repo_lookup(github_api_lookup):
     _github_api = functools.cache(github_api_lookup)
 
     @functools.cache
@@ -346,203 +248,286 @@ def categorize_by_changed_component(
 
         return github.repository(org, repo)
 
-    def resolve_changes(
-        target_descriptor_with_updates: ComponentWithDependencyChanges,
-    ):
-        for dependency_update in target_descriptor_with_updates.dependency_changes:
-            target_component = target_descriptor_with_updates.component_descriptor.component
-            dependency_component_name = dependency_update.end.name
+    return _github_repo
 
-            left_component = dependency_update.start
-            right_component = dependency_update.end
 
-            left_src = cnudie.util.main_source(
-                left_component,
-                absent_ok=True,
-            )
-            right_src = cnudie.util.main_source(
-                right_component,
-                absent_ok=True,
-            )
+@dataclasses.dataclass(frozen=True)
+class CompareRequest:
+    '''
+    range of commits (of a GitHub repository) contained in a dependency change
+    '''
+    repo_url: str
+    left_commit: str
+    right_commit: str
 
-            if not left_src or not right_src:
-                continue
 
-            left_access = left_src.access
-            right_access = right_src.access
+def compare_request(
+    dependency_update: components.ComponentVector,
+) -> CompareRequest | None:
+    '''
+    returns the range of commits contained in the passed-in dependency update. Returns `None` if the
+    commits cannot be determined, i.e. if the dependency is not sourced from GitHub or if the
+    repository changed between the component versions.
+    '''
+    left_src = cnudie.util.main_source(
+        dependency_update.start,
+        absent_ok=True,
+    )
+    right_src = cnudie.util.main_source(
+        dependency_update.end,
+        absent_ok=True,
+    )
 
-            if not left_access.type is ocm.AccessType.GITHUB:
-                continue
-            if not right_access.type is ocm.AccessType.GITHUB:
-                continue
+    if not left_src or not right_src:
+        return None
 
-            left_repo_url = ci.util.urlparse(left_access.repoUrl)
-            right_repo_url = ci.util.urlparse(right_access.repoUrl)
+    left_access = left_src.access
+    right_access = right_src.access
 
-            if not left_repo_url == right_repo_url:
-                continue # ensure there was no repository-change between component-versions
+    if not left_access.type is ocm.AccessType.GITHUB:
+        return None
+    if not right_access.type is ocm.AccessType.GITHUB:
+        return None
 
-            left_commit = left_access.commit or left_access.ref
-            right_commit = right_access.commit or right_access.ref
+    if not ci.util.urlparse(left_access.repoUrl) == ci.util.urlparse(right_access.repoUrl):
+        return None # ensure there was no repository-change between component-versions
 
-            github_repo = _github_repo(
-                repo_url=left_repo_url, # already checked for equality; choose either
-            )
+    return CompareRequest(
+        repo_url=left_access.repoUrl, # already checked for equality; choose either
+        left_commit=left_access.commit or left_access.ref,
+        right_commit=right_access.commit or right_access.ref,
+    )
 
-            dependencies[dependency_component_name].append(
-                ComponentDependencyChangeWithCommits(
-                    component=target_component,
-                    dependency_component_vector=dependency_update,
-                    commits=commits_for_component_change(
-                        left_commit=left_commit,
-                        right_commit=right_commit,
-                        github_repo=github_repo,
-                    ),
-                )
-            )
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as tpe:
-        futures = {
-            tpe.submit(resolve_changes, target_descriptor_with_updates)
-            for target_descriptor_with_updates in target_descriptors_with_updates
-        }
-        concurrent.futures.wait(futures)
+def dependency_updates(
+    component: ocm.Component,
+    predecessor_component: ocm.Component | None,
+    component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById,
+) -> list[components.ComponentVector]:
+    '''
+    returns the dependency updates which were introduced with the passed-in version of the target
+    component compared to its predecessor version
+    '''
+    if not predecessor_component:
+        return []
 
-    key = _cache_key_changes_by_dependencies(target_descriptors_with_updates)
-    changes_by_dependencies_cache[key] = dependencies
+    if not (component_diff := _diff_components(
+        component_vector=components.ComponentVector(
+            start=predecessor_component,
+            end=component,
+        ),
+        component_descriptor_lookup=component_descriptor_lookup,
+    )):
+        return []
 
-    return dependencies
+    return dependency_changes_between_versions(
+        component_diff=component_diff,
+        only_rising_changes=True,
+    )
 
 
-def _cache_key_gen_dora(
-    component_dependency_changes_with_commits: list[
-        ComponentDependencyChangeWithCommits
+def ledger_entry(
+    component: ocm.Component,
+    predecessor_component: ocm.Component | None,
+    dependency_updates: list[components.ComponentVector],
+    commits_by_compare_request: dict[
+        CompareRequest,
+        tuple[github3.github.repo.commit.ShortCommit],
     ],
-    time_span_days: int | None = None,
-    calculation_type: CalculationType | None = None
-):
-    component_versions = tuple(
-        component_dependency_change_with_commits.component.version
-        for component_dependency_change_with_commits in component_dependency_changes_with_commits
+) -> dora_ledger.LedgerEntry:
+    '''
+    @param commits_by_compare_request:
+        commits of the dependency updates, must contain all compare-requests of the dependency
+        updates sourced from GitHub
+    '''
+    dependency_changes = []
+
+    for dependency_update in dependency_updates:
+        if not (request := compare_request(dependency_update)):
+            continue
+
+        dependency_changes.append(dora_ledger.DependencyChange(
+            dependency_name=dependency_update.end.name,
+            start_version=dependency_update.start.version,
+            end_version=dependency_update.end.version,
+            repo_url=request.repo_url,
+            commits=tuple(
+                dora_ledger.Commit(
+                    sha=commit.sha,
+                    date=dateutil.parser.isoparse(commit.commit.author['date']),
+                ) for commit in commits_by_compare_request[request]
+            ),
+        ))
+
+    return dora_ledger.LedgerEntry(
+        version=component.version,
+        predecessor_version=predecessor_component.version if predecessor_component else None,
+        deployment_date=components.get_creation_date(component),
+        dependency_changes=tuple(dependency_changes),
     )
-    hashkey_elements = (
-        component_dependency_changes_with_commits[0].component.name,
-        component_dependency_changes_with_commits[0].dependency_component_vector.start.name,
-        component_dependency_changes_with_commits[0].dependency_component_vector.end.name,
-        component_dependency_changes_with_commits[0].dependency_component_vector.start.version,
-        component_dependency_changes_with_commits[0].dependency_component_vector.end.version,
-        component_versions,
+
+
+def categorize_by_changed_component(
+    ledger_entries: collections.abc.Iterable[dora_ledger.LedgerEntry],
+    dependency_name_filter: collections.abc.Iterable[str] | None = None,
+) -> dict[str, list[ComponentDependencyChangeWithCommits]]:
+    dependencies: dict[str, list[ComponentDependencyChangeWithCommits]] = (
+        collections.defaultdict(list[ComponentDependencyChangeWithCommits])
     )
-    if time_span_days: hashkey_elements += (time_span_days, datetime.date.today())
-    if calculation_type: hashkey_elements += (calculation_type,)
 
-    return cachetools.keys.hashkey(*hashkey_elements)
+    for entry in ledger_entries:
+        for dependency_change in entry.dependency_changes:
+            if (
+                dependency_name_filter
+                and dependency_change.dependency_name not in dependency_name_filter
+            ):
+                continue
+
+            dependencies[dependency_change.dependency_name].append(
+                ComponentDependencyChangeWithCommits(
+                    target_component_version=entry.version,
+                    deployment_date=entry.deployment_date,
+                    dependency_change=dependency_change,
+                )
+            )
 
+    return dependencies
 
-@caching.cached(
-    cache=caching.LFUFilesystemCache(max_total_size_mib=128),
-    key_func=_cache_key_gen_dora,
-)
-def calculate_change_lead_time(
-    component_dependency_changes_with_commits: list[
-        ComponentDependencyChangeWithCommits
-    ],
+
+def _is_in_time_span(
+    date: datetime.datetime,
     time_span_days: int,
-    calculation_type: CalculationType,
-) -> datetime.timedelta:
-    time_differences: list[datetime.timedelta] = []
+) -> bool:
+    return date > datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=time_span_days)
 
-    for component_dependency_change_with_commits in component_dependency_changes_with_commits:
-        deployment_date = components.get_creation_date(
-            component_dependency_change_with_commits.component
-        )
-        for commit in component_dependency_change_with_commits.commits:
-            if (
-                    (
-                            commit_date := dateutil.parser.isoparse(commit.commit.author['date'])
-                    ) > (
-                    datetime.datetime.now(datetime.timezone.utc)
-                    - datetime.timedelta(days=time_span_days)
+
+def _to_datetime64(dates: collections.abc.Iterable[datetime.datetime]) -> np.ndarray:
+    # datetime64 has no notion of timezones, hence dates are converted to (naive) UTC
+    return np.fromiter(
+        (int(date.timestamp()) for date in dates),
+        dtype=np.int64,
+    ).astype('datetime64[s]')
+
+
+def _time_span_start(time_span_days: int) -> np.datetime64:
+    return _to_datetime64((
+        datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=time_span_days),
+    ))[0]
+
+
+def _to_days(seconds: float) -> int:
+    return datetime.timedelta(seconds=float(seconds)).days
+
+
+@dataclasses.dataclass(frozen=True)
+class CommitArrays:
+    '''
+    Holds the commits of dependency changes as (index-aligned) arrays, so that lead times can be
+    aggregated vectorised. Commits are ordered by dependency change, `change_offsets` holds the
+    index of the first commit of each dependency change.
+    '''
+    code_changes: np.ndarray # CodeChange (object)
+    commit_dates: np.ndarray # datetime64[s]
+    deployment_dates: np.ndarray # datetime64[s]
+    change_offsets: np.ndarray
+
+    @staticmethod
+    def from_dependency_changes(
+        component_dependency_changes_with_commits: list[
+            ComponentDependencyChangeWithCommits
+        ],
+    ) -> 'CommitArrays':
+        code_changes = [
+            CodeChange(
+                commit_sha=commit.sha,
+                commit_date=commit.date,
+                deployment_date=component_dependency_change_with_commits.deployment_date,
             )
-            ):
-                time_differences.append(deployment_date -  commit_date)
+            for component_dependency_change_with_commits in component_dependency_changes_with_commits
+            for commit in component_dependency_change_with_commits.dependency_change.commits
+        ]
+        commits_counts = [
+            len(component_dependency_change_with_commits.dependency_change.commits)
+            for component_dependency_change_with_commits in component_dependency_changes_with_commits
+        ]
 
-    if not time_differences:
-        time_differences.append(datetime.timedelta(seconds=-1))
-    if calculation_type is CalculationType.MEDIAN:
-        result_in_seconds: float = statistics.median(
-            [time_difference.total_seconds()
-             for time_difference in time_differences]
+        code_changes_array = np.empty(len(code_changes), dtype=object)
+        code_changes_array[:] = code_changes
+
+        return CommitArrays(
+            code_changes=code_changes_array,
+            commit_dates=_to_datetime64(
+                code_change.commit_date for code_change in code_changes
+            ),
+            deployment_dates=_to_datetime64(
+                code_change.deployment_date for code_change in code_changes
+            ),
+            change_offsets=np.cumsum([0] + commits_counts[:-1], dtype=np.int64),
         )
+
+    @property
+    def lead_times_seconds(self) -> np.ndarray:
+        return (self.deployment_dates - self.commit_dates).astype(np.float64)
+
+    def in_time_span_mask(self, time_span_days: int) -> np.ndarray:
+        return self.commit_dates > _time_span_start(time_span_days)
+
+
+def calculate_change_lead_time(
+    lead_times_seconds: np.ndarray,
+    calculation_type: CalculationType,
+) -> datetime.timedelta:
+    if not lead_times_seconds.size:
+        return datetime.timedelta(seconds=-1)
+
+    if calculation_type is CalculationType.MEDIAN:
+        result_in_seconds = np.median(lead_times_seconds)
     else:
-        result_in_seconds: float = statistics.mean(
-            [time_difference.total_seconds()
-             for time_difference in time_differences]
-        )
-    return datetime.timedelta(seconds=result_in_seconds)
+        result_in_seconds = np.mean(lead_times_seconds)
+
+    return datetime.timedelta(seconds=float(result_in_seconds))
+
+
+def change_lead_time_percentiles(
+    lead_times_seconds: np.ndarray,
+    percentiles: collections.abc.Sequence[int]=(50, 90),
+) -> list[int]:
+    '''
+    returns the passed-in percentiles of the change lead times in days (-1 if there are no changes)
+    '''
+    if not lead_times_seconds.size:
+        return [-1 for _ in percentiles]
+
+    return [
+        _to_days(seconds)
+        for seconds in np.percentile(lead_times_seconds, percentiles)
+    ]
 
 
-@caching.cached(
-    cache=caching.LFUFilesystemCache(max_total_size_mib=128),
-    key_func=_cache_key_gen_dora,
-)
 def dora_changes_monthly(
-    component_dependency_changes_with_commits: list[
-        ComponentDependencyChangeWithCommits
-    ],
+    commit_arrays: CommitArrays,
     time_span_days: int,
 ) -> list[DoraMonthlyResponse]:
+    mask = commit_arrays.in_time_span_mask(time_span_days)
+    commit_months = commit_arrays.commit_dates[mask].astype('datetime64[M]')
+    lead_times_seconds = commit_arrays.lead_times_seconds[mask]
+    code_changes = commit_arrays.code_changes[mask]
 
-    code_changes_by_month: dict[
-        tuple[int, int],
-        list[tuple[datetime.datetime, CodeChange]],
-    ] = (
-        collections.defaultdict(list[tuple[datetime.datetime, CodeChange]])
-    )
-
-    for component_dependency_change_with_commits in component_dependency_changes_with_commits:
-        for commit in component_dependency_change_with_commits.commits:
-            if (
-                    (
-                            commit_date := dateutil.parser.isoparse(commit.commit.author['date'])
-                    ) > (
-                    datetime.datetime.now(datetime.timezone.utc) -
-                    datetime.timedelta(days=time_span_days)
-            )
-            ):
-                commit_sha: str = commit.sha
-                key = (commit_date.year, commit_date.month)
-                code_changes_by_month[key].append(
-                    (
-                        components.get_creation_date(
-                            component_dependency_change_with_commits.component
-                        ),
-                        CodeChange(
-                            commit_date=commit_date,
-                            commit_sha=commit_sha,
-                            deployment_date=components.get_creation_date(
-                                component_dependency_change_with_commits.component
-                            ),
-                        ),
-                    ),
-                )
+    months, month_indices = np.unique(commit_months, return_inverse=True)
 
     by_month_list: list[DoraMonthlyResponse] = []
+    months_with_changes = set()
 
-    for (year, month), code_changes in code_changes_by_month.items():
-
-        median_change_lead_time = datetime.timedelta(seconds=statistics.median(
-            [
-                (deploy_date - commits_and_date.commit_date).total_seconds()
-                for deploy_date, commits_and_date in code_changes
-            ]
-        ))
+    for idx, month in enumerate(months):
+        month_mask = month_indices == idx
+        month_date = month.astype(datetime.date)
+        months_with_changes.add((month_date.year, month_date.month))
 
         by_month_list.append(DoraMonthlyResponse(
-            changes=[commits_and_date for _, commits_and_date in code_changes],
-            month=month,
-            year=year,
-            median_change_lead_time=median_change_lead_time.days,
+            changes=code_changes[month_mask].tolist(),
+            month=month_date.month,
+            year=month_date.year,
+            median_change_lead_time=_to_days(np.median(lead_times_seconds[month_mask])),
         ))
 
     # create "empty" months which lie within the time_span_days
@@ -551,124 +536,60 @@ def dora_changes_monthly(
     )
 
     while entry_date < datetime.datetime.now(datetime.timezone.utc):
-        if (entry_date.year, entry_date.month) not in code_changes_by_month:
+        if (entry_date.year, entry_date.month) not in months_with_changes:
             by_month_list.append(DoraMonthlyResponse(
                 changes=[],
                 month=entry_date.month,
                 year=entry_date.year,
                 median_change_lead_time=-1,
             ))
+            months_with_changes.add((entry_date.year, entry_date.month))
         entry_date += datetime.timedelta(days=30)
 
-    return by_month_list
+    return sorted(by_month_list, key=lambda monthly: (monthly.year, monthly.month))
 
 
-@caching.cached(
-    cache=caching.LFUFilesystemCache(max_total_size_mib=128),
-    key_func=_cache_key_gen_dora,
-)
 def dora_deployments(
-        component_dependency_changes_with_commits: list[
-            ComponentDependencyChangeWithCommits
-        ],
+    component_dependency_changes_with_commits: list[
+        ComponentDependencyChangeWithCommits
+    ],
+    commit_arrays: CommitArrays,
 ) -> list[DoraDeploymentsResponse]:
     deployments: list[DoraDeploymentsResponse] = []
 
-    for component_dependency_change_with_commits in component_dependency_changes_with_commits:
-
-        median_change_lead_time = datetime.timedelta(
-            seconds=statistics.median([
-                (components.get_creation_date(
-                    component_dependency_change_with_commits.component
-                ) - dateutil.parser.isoparse(
-                    commit.commit.author['date']
-                )).total_seconds()
-                for commit in component_dependency_change_with_commits.commits
-            ]) if component_dependency_change_with_commits.commits else 0,
-        )
-
-        deployment_date = components.get_creation_date(
-            component_dependency_change_with_commits.component
-        )
+    lead_times_seconds_by_change = np.split(
+        commit_arrays.lead_times_seconds,
+        commit_arrays.change_offsets[1:],
+    )
+    code_changes_by_change = np.split(
+        commit_arrays.code_changes,
+        commit_arrays.change_offsets[1:],
+    )
 
+    for component_dependency_change_with_commits, lead_times_seconds, code_changes in zip(
+        component_dependency_changes_with_commits,
+        lead_times_seconds_by_change,
+        code_changes_by_change,
+    ):
         deployments.append(
             DoraDeploymentsResponse(
-                deployment_date=deployment_date,
+                deployment_date=component_dependency_change_with_commits.deployment_date,
                 component_version=(
-                    component_dependency_change_with_commits.dependency_component_vector.end.version
+                    component_dependency_change_with_commits.dependency_change.end_version
+                ),
+                target_deployment_version=(
+                    component_dependency_change_with_commits.target_component_version
+                ),
+                changes=code_changes.tolist(),
+                median_change_lead_time=_to_days(
+                    np.median(lead_times_seconds) if lead_times_seconds.size else 0
                 ),
-                target_deployment_version=component_dependency_change_with_commits.component.version,
-                changes=[
-                    CodeChange(
-                        commit_date=dateutil.parser.isoparse(commit.commit.author['date']),
-                        commit_sha=commit.sha,
-                        deployment_date=deployment_date,
-                    )
-                    for commit in component_dependency_change_with_commits.commits
-                ],
-                median_change_lead_time=median_change_lead_time.days,
             )
         )
 
     return deployments
 
 
-def all_change_lead_time_durations(
-    component_dependency_changes_with_commits: list[
-        ComponentDependencyChangeWithCommits
-    ],
-    time_span_days: int,
-) -> list[int]:
-    commit_durations = []
-    for component_dependency_change_with_commits in component_dependency_changes_with_commits:
-        commit_durations.extend(
-            [
-                (
-                        components.get_creation_date(
-                            component_dependency_change_with_commits.component
-                        )
-                        - dateutil.parser.isoparse(commit.commit.author['date'])
-                ).total_seconds()
-                for commit in component_dependency_change_with_commits.commits
-                if (
-                    dateutil.parser.isoparse(commit.commit.author['date']) >
-                    (
-                            datetime.datetime.now(datetime.timezone.utc)
-                            - datetime.timedelta(days=time_span_days)
-                    )
-            )
-            ]
-        )
-
-    return commit_durations
-
-
-def all_changes(
-    component_dependency_changes_with_commits: list[
-        ComponentDependencyChangeWithCommits
-    ],
-    time_span_days: int,
-) -> list[CodeChange]:
-
-    all_changes = []
-    for component_dependency_change_with_commits in component_dependency_changes_with_commits:
-        all_changes.extend(
-            [
-                CodeChange(
-                    commit_sha=commit.sha,
-                    commit_date=dateutil.parser.isoparse(commit.commit.author['date']),
-                    deployment_date=components.get_creation_date(
-                        component_dependency_change_with_commits.component,
-                    ),
-                ) for commit in component_dependency_change_with_commits.commits
-                if dateutil.parser.isoparse(commit.commit.author['date']) >
-                   datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=time_span_days)
-            ]
-        )
-
-    return all_changes
-
-
 def create_response_object(
     target_updates_by_dependency: dict[
         str,
@@ -681,85 +602,255 @@ def create_response_object(
         DoraDependencyResponse,
     ] = {}
 
-    all_change_lead_time_durations_seconds = []
+    all_change_lead_times_seconds = []
 
     for dependency_name, component_dependency_changes_with_commits \
             in target_updates_by_dependency.items():
 
-        median = calculate_change_lead_time(
-            component_dependency_changes_with_commits,
-            time_span_days,
-            CalculationType.MEDIAN,
-        )
-        average = calculate_change_lead_time(
+        commit_arrays = CommitArrays.from_dependency_changes(
             component_dependency_changes_with_commits,
-            time_span_days,
-            CalculationType.AVERAGE,
-        )
-        changes_monthly = dora_changes_monthly(
-            component_dependency_changes_with_commits,
-            time_span_days,
         )
+        mask = commit_arrays.in_time_span_mask(time_span_days)
+        lead_times_seconds = commit_arrays.lead_times_seconds[mask]
+        all_change_lead_times_seconds.append(lead_times_seconds)
+
+        median = calculate_change_lead_time(lead_times_seconds, CalculationType.MEDIAN)
+        average = calculate_change_lead_time(lead_times_seconds, CalculationType.AVERAGE)
+        p50, p90 = change_lead_time_percentiles(lead_times_seconds)
+
         deployments = dora_deployments(
             component_dependency_changes_with_commits,
+            commit_arrays,
         )
-        changes = all_changes(
-            component_dependency_changes_with_commits,
-            time_span_days,
-        )
-        repo_url = cnudie.util.main_source(
-            component_dependency_changes_with_commits[0].dependency_component_vector.start
-        ).access.repoUrl
 
         dependencies_response[dependency_name] = DoraDependencyResponse(
             change_lead_time_median=median.days,
             change_lead_time_average=average.days,
+            change_lead_time_p50=p50,
+            change_lead_time_p90=p90,
             deployment_frequency=round(time_span_days / len(deployments), 2),
-            changes_monthly=changes_monthly,
+            changes_monthly=dora_changes_monthly(
+                commit_arrays,
+                time_span_days,
+            ),
             deployments=deployments,
-            all_changes=changes,
-            repo_url=repo_url,
+            all_changes=commit_arrays.code_changes[mask].tolist(),
+            repo_url=component_dependency_changes_with_commits[0].dependency_change.repo_url,
         )
 
-        all_change_lead_time_durations_seconds.extend(
-            all_change_lead_time_durations(
-                component_dependency_changes_with_commits,
-                time_span_days,
-            )
-        )
+    if all_change_lead_times_seconds:
+        all_change_lead_times_seconds = np.concatenate(all_change_lead_times_seconds)
+    else:
+        all_change_lead_times_seconds = np.empty(0)
 
-    if all_change_lead_time_durations_seconds != []:
-        change_lead_time_median = datetime.timedelta(
-            seconds=statistics.median(
-                all_change_lead_time_durations_seconds
-            )
-        ).days
-        change_lead_time_average = datetime.timedelta(
-            seconds=statistics.mean(
-                all_change_lead_time_durations_seconds
-            )
-        ).days
+    if all_change_lead_times_seconds.size:
+        change_lead_time_median = _to_days(np.median(all_change_lead_times_seconds))
+        change_lead_time_average = _to_days(np.mean(all_change_lead_times_seconds))
     else:
         change_lead_time_median = -1
         change_lead_time_average = -1
 
+    p50, p90 = change_lead_time_percentiles(all_change_lead_times_seconds)
+
     return DoraResponse(
         change_lead_time_median=change_lead_time_median,
         change_lead_time_average=change_lead_time_average,
+        change_lead_time_p50=p50,
+        change_lead_time_p90=p90,
         dependencies=dependencies_response,
     )
 
 
 class DoraMetrics:
+    '''
+    DORA metrics are aggregated from the change ledger of the target component (see `dora_ledger`).
+    Versions which are not recorded in the ledger yet are processed in the background, meanwhile
+    requests are answered with `202 Accepted`. Versions whose dependency changes could not be
+    determined are recorded as failed (without changes) and are retried in the background, while
+    metrics are served from the recorded entries.
+    '''
+    single_flight = True
+    response_cache_ttl_seconds = 60
+
     def __init__(
         self,
         component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById,
         component_version_lookup: cnudie.retrieve.VersionLookupByComponent,
         github_api_lookup,
+        ledger: dora_ledger.ChangeLedger=None,
+        max_workers: int=4,
     ):
         self._component_descriptor_lookup = component_descriptor_lookup
         self._component_version_lookup = component_version_lookup
         self.github_api_lookup = github_api_lookup
+        self.ledger = ledger or dora_ledger.ChangeLedger()
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        # names of target components whose ledger is currently being updated
+        self._pending_components: set[str] = set()
+        self._pending_components_lock = threading.Lock()
+
+    def _ledger_entries_in_time_span(
+        self,
+        target_component_name: str,
+        time_span_days: int,
+    ) -> tuple[
+        list[dora_ledger.LedgerEntry],
+        list[tuple[str, str | None, datetime.datetime]],
+        list[tuple[str, str | None, datetime.datetime]],
+    ]:
+        '''
+        returns the ledger entries of the versions of the target component within the time span
+        (sorted descending), the versions (and their predecessor versions and deployment dates)
+        which are not recorded yet, as well as the versions of failed entries which are due for
+        retry
+        '''
+        versions = all_versions_sorted(
+            component=target_component_name,
+            version_lookup=self._component_version_lookup,
+            sorting_direction='desc',
+        )
+        entries_by_version = self.ledger.entries(target_component_name)
+
+        ledger_entries = []
+        missing_versions = []
+        retry_versions = []
+
+        for idx, version in enumerate(versions):
+            predecessor_version = versions[idx + 1] if idx + 1 < len(versions) else None
+
+            if (
+                (entry := entries_by_version.get(version))
+                and entry.predecessor_version == predecessor_version
+            ):
+                if not _is_in_time_span(entry.deployment_date, time_span_days):
+                    break
+                ledger_entries.append(entry)
+                if entry.retry_due:
+                    retry_versions.append((version, predecessor_version, entry.deployment_date))
+                continue
+
+            descriptor = self._component_descriptor_lookup(
+                ocm.ComponentIdentity(target_component_name, version),
+            )
+            try:
+                deployment_date = components.get_creation_date(descriptor.component)
+            except KeyError:
+                continue
+
+            if not _is_in_time_span(deployment_date, time_span_days):
+                break
+
+            missing_versions.append((version, predecessor_version, deployment_date))
+
+        return ledger_entries, missing_versions, retry_versions
+
+    def _update_ledger(
+        self,
+        target_component_name: str,
+        missing_versions: list[tuple[str, str | None, datetime.datetime]],
+    ):
+        '''
+        records ledger entries for the given versions, versions whose dependency changes cannot be
+        determined are recorded as failed entries (see `dora_ledger.failed_entry`)
+        '''
+        def component(version: str | None) -> ocm.Component | None:
+            if not version:
+                return None
+
+            return self._component_descriptor_lookup(
+                ocm.ComponentIdentity(target_component_name, version),
+            ).component
+
+        def resolve_dependency_updates(version: str, predecessor_version: str | None, _):
+            try:
+                component_ = component(version)
+                predecessor_component = component(predecessor_version)
+
+                return component_, predecessor_component, dependency_updates(
+                    component=component_,
+                    predecessor_component=predecessor_component,
+                    component_descriptor_lookup=self._component_descriptor_lookup,
+                )
+            except Exception as e:
+                logger.warning(f'failed to diff {target_component_name}:{version}: {e}')
+                return e
+
+        def add_failed_entry(
+            version: str,
+            predecessor_version: str | None,
+            deployment_date: datetime.datetime,
+            error: str,
+        ):
+            self.ledger.add(
+                component_name=target_component_name,
+                entry=dora_ledger.failed_entry(
+                    version=version,
+                    predecessor_version=predecessor_version,
+                    deployment_date=deployment_date,
+                    error=error,
+                    previous_entry=previous_entries.get(version),
+                ),
+            )
+
+        try:
+            previous_entries = self.ledger.entries(target_component_name)
+            github_repo_lookup = _github_repo_lookup(self.github_api_lookup)
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as tpe:
+                resolved_versions = []
+                for missing_version, resolved in zip(
+                    missing_versions,
+                    tpe.map(
+                        lambda missing_version: resolve_dependency_updates(*missing_version),
+                        missing_versions,
+                    ),
+                ):
+                    if isinstance(resolved, Exception):
+                        add_failed_entry(*missing_version, error=f'diff failed: {resolved}')
+                        continue
+                    resolved_versions.append((missing_version, resolved))
+
+            # commits are retrieved by the shared GitHub request scheduler, which processes
+            # compare-requests of the same repository sequentially
+            commits_by_compare_request = github_scheduler.scheduler.map_batched(
+                func=lambda request: commits_for_component_change(
+                    left_commit=request.left_commit,
+                    right_commit=request.right_commit,
+                    github_repo=github_repo_lookup(ci.util.urlparse(request.repo_url)),
+                ),
+                items=(
+                    request
+                    for _, (_, _, updates) in resolved_versions
+                    for dependency_update in updates
+                    if (request := compare_request(dependency_update))
+                ),
+                batch_key=lambda request: request.repo_url,
+            )
+
+            for missing_version, (component_, predecessor_component, updates) in resolved_versions:
+                try:
+                    entry = ledger_entry(
+                        component=component_,
+                        predecessor_component=predecessor_component,
+                        dependency_updates=updates,
+                        commits_by_compare_request=commits_by_compare_request,
+                    )
+                except KeyError as e:
+                    # commits could not be retrieved
+                    logger.warning(
+                        f'failed to update change ledger of {target_component_name}: {e}'
+                    )
+                    add_failed_entry(*missing_version, error=f'commits not retrievable: {e}')
+                    continue
+
+                self.ledger.add(
+                    component_name=target_component_name,
+                    entry=entry,
+                )
+        finally:
+            with self._pending_components_lock:
+                self._pending_components.discard(target_component_name)
 
     def on_get(self, req: falcon.Request, resp: falcon.Response):
         target_component_name: str = req.get_param(
@@ -788,78 +879,37 @@ class DoraMetrics:
                 raise_http_error=True,
             )
 
-        # get all component descriptors of component versions of target component within time span
-        target_descriptors_in_time_span = versions_descriptors_newer_than(
-            component_name=target_component_name,
-            date=datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=time_span_days),
-            component_descriptor_lookup=self._component_descriptor_lookup,
-            version_lookup=self._component_version_lookup,
-            sorting_direction='asc',
+        ledger_entries, missing_versions, retry_versions = self._ledger_entries_in_time_span(
+            target_component_name=target_component_name,
+            time_span_days=time_span_days,
         )
 
-        # Add the next older version, which is not within the time span anymore (if one exists)
-        # at the beginning of the descriptor list to be able to detect changes which were
-        # first introduced within the time span of the target component version.
-
-        if (next_older_descriptor := get_next_older_descriptor(
-            ocm.ComponentIdentity(
-                target_component_name,
-                target_descriptors_in_time_span[0].component.version,
-            ),
-            self._component_descriptor_lookup,
-            self._component_version_lookup,
-        )):
-            target_descriptors_in_time_span.insert(0, next_older_descriptor)
-
-        # calculate the changes which where introduced for every component version
-        target_descriptors_with_updates: list[ComponentWithDependencyChanges] = []
-        for index in range(1, len(target_descriptors_in_time_span)):
-            component_diff = _diff_components(
-                component_vector=components.ComponentVector(
-                    start=target_descriptors_in_time_span[index-1].component,
-                    end=target_descriptors_in_time_span[index].component,
-                ),
-                component_descriptor_lookup=self._component_descriptor_lookup,
-            )
-
-            if component_diff:
-                dependency_changes = dependency_changes_between_versions(
-                    component_diff=component_diff,
-                    dependency_name_filter=filter_component_names,
-                    only_rising_changes=True,
-                )
-            else:
-                dependency_changes = []
-
-            target_descriptors_with_updates.append(
-                ComponentWithDependencyChanges(
-                    component_descriptor=target_descriptors_in_time_span[index],
-                    dependency_changes=dependency_changes,
-                )
-            )
-
-        target_descriptors_with_updates = tuple(target_descriptors_with_updates)
-
-        key = _cache_key_changes_by_dependencies(target_descriptors_with_updates)
-
-        # categorize changes by changed dependency
-        # and add commits to the dependency changes
-        if (updates_by_dependency := changes_by_dependencies_cache.get(key)) is None:
-            if key not in changes_by_dependencies_cache:
-                changes_by_dependencies_cache[key] = None
-                tpe = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-                tpe.submit(
-                    categorize_by_changed_component,
-                    target_descriptors_with_updates,
-                    self.github_api_lookup,
-                )
+        if missing_versions or retry_versions:
+            with self._pending_components_lock:
+                if target_component_name not in self._pending_components:
+                    self._pending_components.add(target_component_name)
+                    self._executor.submit(
+                        self._update_ledger,
+                        target_component_name,
+                        missing_versions + retry_versions,
+                    )
 
+        if missing_versions:
             resp.status = falcon.HTTP_ACCEPTED
             return
 
-        resp.media = create_response_object(
-            target_updates_by_dependency=updates_by_dependency,
-            time_span_days=time_span_days,
+        # categorize changes by changed dependency
+        updates_by_dependency = categorize_by_changed_component(
+            ledger_entries=reversed(ledger_entries),
+            dependency_name_filter=filter_component_names,
+        )
+
+        resp.media = dataclasses.replace(
+            create_response_object(
+                target_updates_by_dependency=updates_by_dependency,
+                time_span_days=time_span_days,
+            ),
+            incomplete_versions=[entry.version for entry in ledger_entries if entry.error],
         )
 
 
@@ -894,7 +944,10 @@ def _diff_components(
         c.component for c
         in cnudie.iter.iter(
             component=component_vector.start,
-            lookup=component_descriptor_lookup,
+            lookup=component_graph.prefetch_component_descriptors(
+                component=component_vector.start,
+                component_descriptor_lookup=component_descriptor_lookup,
+            ),
             node_filter=cnudie.iter.Filter.components,
         )
     )
@@ -903,7 +956,10 @@ def _diff_components(
         c.component
         for c in cnudie.iter.iter(
             component=component_vector.end,
-            lookup=component_descriptor_lookup,
+            lookup=component_graph.prefetch_component_descriptors(
+                component=component_vector.end,
+                component_descriptor_lookup=component_descriptor_lookup,
+            ),
             node_filter=cnudie.iter.Filter.components,
         )
     )
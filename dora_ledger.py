@@ -0,0 +1,180 @@
+'''
+Persisted ledger of the changes deployed with each version of a (target) component, i.e. the
+dependency changes introduced compared to the preceding version, incl. the commits contained in
+these dependency changes. It is the basis for the DORA metrics (see `dora`).
+
+As (release) component versions are immutable, ledger entries only have to be determined once per
+component version. Thus, DORA metrics for an arbitrary time span are derived by aggregating ledger
+entries, whereas only versions which are not yet recorded have to be processed.
+
+The ledger is stored in a SQLite database, hence it survives restarts and is shared among all
+processes using the same path (e.g. uWSGI workers).
+'''
+import dataclasses
+import datetime
+import json
+import os
+import sqlite3
+
+import dacite
+
+import sqlite_util
+
+
+own_dir = os.path.abspath(os.path.dirname(__file__))
+default_ledger_path = os.path.join(own_dir, '.cache', 'dora-ledger.sqlite')
+
+MAX_FAILED_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 15 * 60 # doubled with each failed attempt
+
+_ddl = '''
+    CREATE TABLE IF NOT EXISTS entries (
+        component_name TEXT NOT NULL,
+        version TEXT NOT NULL,
+        entry TEXT NOT NULL,
+        PRIMARY KEY (component_name, version)
+    );
+'''
+
+
+@dataclasses.dataclass(frozen=True)
+class Commit:
+    sha: str
+    date: datetime.datetime
+
+
+@dataclasses.dataclass(frozen=True)
+class DependencyChange:
+    '''
+    version change of a dependency (which is sourced from GitHub) between two versions of the
+    target component
+    '''
+    dependency_name: str
+    start_version: str
+    end_version: str
+    repo_url: str
+    commits: tuple[Commit, ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class LedgerEntry:
+    '''
+    @param predecessor_version:
+        the version the dependency changes were determined against, `None` for the first version
+    @param deployment_date:
+        creation date of the target component version
+    @param error:
+        set if the dependency changes could not be determined (e.g. repository was deleted), the
+        entry does not contain any dependency changes then
+    @param failed_attempts:
+        amount of consecutive failed attempts to determine the dependency changes
+    @param retry_after:
+        earliest time the dependency changes of a failed entry are determined again, `None` if
+        there are no further attempts
+    '''
+    version: str
+    predecessor_version: str | None
+    deployment_date: datetime.datetime
+    dependency_changes: tuple[DependencyChange, ...]
+    error: str | None = None
+    failed_attempts: int = 0
+    retry_after: datetime.datetime | None = None
+
+    @property
+    def retry_due(self) -> bool:
+        return bool(
+            self.error
+            and self.retry_after
+            and self.retry_after <= datetime.datetime.now(datetime.timezone.utc)
+        )
+
+
+def failed_entry(
+    version: str,
+    predecessor_version: str | None,
+    deployment_date: datetime.datetime,
+    error: str,
+    previous_entry: LedgerEntry | None=None,
+) -> LedgerEntry:
+    '''
+    returns an entry recording that the dependency changes could not be determined. Retries are
+    scheduled with exponential backoff, at most `MAX_FAILED_ATTEMPTS` attempts are made.
+    '''
+    if previous_entry and previous_entry.error:
+        failed_attempts = previous_entry.failed_attempts + 1
+    else:
+        failed_attempts = 1
+
+    if failed_attempts < MAX_FAILED_ATTEMPTS:
+        retry_after = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+            seconds=RETRY_BACKOFF_SECONDS * 2 ** (failed_attempts - 1),
+        )
+    else:
+        retry_after = None
+
+    return LedgerEntry(
+        version=version,
+        predecessor_version=predecessor_version,
+        deployment_date=deployment_date,
+        dependency_changes=(),
+        error=error,
+        failed_attempts=failed_attempts,
+        retry_after=retry_after,
+    )
+
+
+def _serialise(entry: LedgerEntry) -> str:
+    return json.dumps(
+        dataclasses.asdict(entry),
+        default=lambda o: o.isoformat(),
+    )
+
+
+def _deserialise(raw: str) -> LedgerEntry:
+    return dacite.from_dict(
+        data_class=LedgerEntry,
+        data=json.loads(raw),
+        config=dacite.Config(
+            type_hooks={datetime.datetime: datetime.datetime.fromisoformat},
+            cast=[tuple],
+        ),
+    )
+
+
+class ChangeLedger:
+    def __init__(
+        self,
+        path: str=default_ledger_path,
+    ):
+        self.path = path
+        self._database = sqlite_util.SQLiteDatabase(path=path, ddl=_ddl)
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._database.connection()
+
+    def entries(
+        self,
+        component_name: str,
+    ) -> dict[str, LedgerEntry]:
+        '''
+        returns the recorded ledger entries of the given component by version
+        '''
+        rows = self._connection().execute(
+            'SELECT version, entry FROM entries WHERE component_name = ?',
+            (component_name,),
+        )
+
+        return {
+            version: _deserialise(raw)
+            for version, raw in rows
+        }
+
+    def add(
+        self,
+        component_name: str,
+        entry: LedgerEntry,
+    ):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO entries VALUES (?, ?, ?)',
+            (component_name, entry.version, _serialise(entry)),
+        )
@@ -23,6 +23,9 @@ import model.protecode
 import ocm
 
 import ctx_util
+import deliverydb
+import deliverydb.replicas
+import github_scheduler
 import k8s.util
 import lookups
 import middleware.auth
@@ -286,6 +289,7 @@ class FeatureAuthentication(FeatureBase):
 class FeatureDeliveryDB(FeatureBase):
     name: str = 'delivery-db'
     db_url: str = None
+    pool_cfg: deliverydb.PoolCfg = deliverydb.PoolCfg()
 
     def get_db_url(self) -> str | None:
         return self.db_url
@@ -546,6 +550,40 @@ class FeatureVersionFilter(FeatureBase):
         return self.version_filter
 
 
+def deserialise_delivery_db_pool_cfg(delivery_db_raw: dict) -> deliverydb.PoolCfg:
+    pool_raw = delivery_db_raw.get('pool', {})
+    default_pool_cfg = deliverydb.PoolCfg()
+
+    return deliverydb.PoolCfg(
+        size=pool_raw.get('size', default_pool_cfg.size),
+        max_overflow=pool_raw.get('maxOverflow', default_pool_cfg.max_overflow),
+        timeout_seconds=pool_raw.get('timeoutSeconds', default_pool_cfg.timeout_seconds),
+        recycle_seconds=pool_raw.get('recycleSeconds', default_pool_cfg.recycle_seconds),
+        pre_ping=pool_raw.get('prePing', default_pool_cfg.pre_ping),
+    )
+
+
+def deserialise_delivery_db_replica_cfg(
+    delivery_db_raw: dict,
+    replica_urls: typing.Iterable[str],
+) -> deliverydb.replicas.ReplicaCfg:
+    replicas_raw = delivery_db_raw.get('replicas', {})
+    default_replica_cfg = deliverydb.replicas.ReplicaCfg()
+
+    return deliverydb.replicas.ReplicaCfg(
+        urls=tuple(replica_urls),
+        max_lag_seconds=replicas_raw.get('maxLagSeconds', default_replica_cfg.max_lag_seconds),
+        lag_check_interval_seconds=replicas_raw.get(
+            'lagCheckIntervalSeconds',
+            default_replica_cfg.lag_check_interval_seconds,
+        ),
+        lag_check_timeout_seconds=replicas_raw.get(
+            'lagCheckTimeoutSeconds',
+            default_replica_cfg.lag_check_timeout_seconds,
+        ),
+    )
+
+
 def get_feature(
     feature_type: type[FeatureBase],
 ) -> FeatureBase | None:
@@ -908,13 +946,30 @@ def init_features(
         except (AttributeError, model.base.ConfigElementNotFoundError):
             logger.warning('Delivery database config not found')
 
+    # connection-pools are only set-up once, hence changes of their cfgs require a restart
+    delivery_db_raw = {}
+    if features_cfg_path := paths.features_cfg_path():
+        features_cfg_raw = ci.util.parse_yaml_file(features_cfg_path) or {}
+        delivery_db_raw = features_cfg_raw.get('deliveryDb', {})
+
+    delivery_db_pool_cfg = deserialise_delivery_db_pool_cfg(delivery_db_raw)
+
     if delivery_db_feature_state == FeatureStates.AVAILABLE:
         middlewares.append(middleware.db_session.DBSessionLifecycle(
             db_url=db_url,
             verify_db_session=False,
+            pool_cfg=delivery_db_pool_cfg,
+            replica_cfg=deserialise_delivery_db_replica_cfg(
+                delivery_db_raw=delivery_db_raw,
+                replica_urls=parsed_arguments.delivery_db_replica_url,
+            ),
         ))
 
-    feature_cfgs.append(FeatureDeliveryDB(delivery_db_feature_state, db_url=db_url))
+    feature_cfgs.append(FeatureDeliveryDB(
+        delivery_db_feature_state,
+        db_url=db_url,
+        pool_cfg=delivery_db_pool_cfg,
+    ))
 
     es_config = None
     try:
@@ -965,6 +1020,59 @@ def init_features(
     return middlewares
 
 
+class DeliveryDBPool:
+    required_features = (FeatureDeliveryDB,)
+
+    def on_get(self, req: falcon.Request, resp: falcon.Response):
+        '''
+        returns metrics of the delivery-db connection-pool of the process serving the request
+
+        **response:**
+
+            pid: <int> \n
+            pool: <str> # status summary \n
+            size: <int> \n
+            max_overflow: <int> \n
+            checked_in: <int> # idle connections \n
+            checked_out: <int> # connections in use \n
+            overflow: <int> # connections in use exceeding `size` \n
+            checkouts_count: <int> \n
+            timeouts_count: <int> \n
+            wait_seconds_total: <float> # time spent obtaining connections \n
+            wait_seconds_max: <float> \n
+            wait_seconds_avg: <float> \n
+        '''
+        delivery_db_feature: FeatureDeliveryDB = get_feature(FeatureDeliveryDB)
+
+        resp.media = deliverydb.pool_metrics(
+            db_url=delivery_db_feature.get_db_url(),
+            pool_cfg=delivery_db_feature.pool_cfg,
+        )
+
+
+class GitHubRequestSchedulerMetrics:
+    def on_get(self, req: falcon.Request, resp: falcon.Response):
+        '''
+        returns metrics of the GitHub request scheduler of the process serving the request
+
+        **response:**
+
+            waiting: <int> # requests waiting for a slot \n
+            queued: <int> # batches waiting for a worker \n
+            throttled_count: <int> \n
+            throttle_seconds_total: <float> \n
+            hosts: \n
+                <host>: \n
+                    in_flight: <int> \n
+                    requests_count: <int> \n
+                    allowed_concurrency: <int> \n
+                    remaining_quota: <int> \n
+                    quota_limit: <int> \n
+                    blocked_seconds: <float> \n
+        '''
+        resp.media = github_scheduler.scheduler.metrics()
+
+
 class Features:
     def on_get(self, req: falcon.Request, resp: falcon.Response):
         self.feature_cfgs = tuple(f.serialize() for f in feature_cfgs)
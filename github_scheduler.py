@@ -0,0 +1,261 @@
+'''
+Scheduling of requests against GitHub (Enterprise) APIs, shared by all consumers within a process.
+
+GitHub limits the amount of requests per hour (primary rate limit) and penalises too many
+concurrent requests (secondary rate limit). Thus, requests are not issued directly but pass the
+scheduler, which limits the amount of concurrent requests per GitHub host. The concurrency is
+adapted to the remaining quota as reported by the `X-RateLimit-*` response headers. Once the quota
+is (almost) exhausted, or if GitHub requests to back off (`Retry-After`), requests are held back
+until the quota is reset.
+
+GitHub api objects are scheduled by instrumenting their (requests) session, see
+`GitHubRequestScheduler.instrument`.
+'''
+import collections.abc
+import concurrent.futures
+import contextlib
+import dataclasses
+import logging
+import math
+import threading
+import time
+import urllib.parse
+
+import github3
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class _HostState:
+    limit: int | None = None
+    remaining: int | None = None
+    reset_at: float | None = None # epoch seconds
+    blocked_until: float = 0 # epoch seconds
+    in_flight: int = 0
+    requests_count: int = 0
+
+
+class GitHubRequestScheduler:
+    '''
+    @param max_concurrency:
+        max. amount of concurrent requests per GitHub host (if quota is sufficient)
+    @param min_remaining_quota:
+        requests are held back until the quota is reset if the remaining quota falls below
+    @param max_throttle_seconds:
+        max. time a single request is held back, requests are issued regardless afterwards (and
+        might be rejected by GitHub)
+    '''
+    def __init__(
+        self,
+        max_concurrency: int=8,
+        min_remaining_quota: int=50,
+        max_throttle_seconds: float=300,
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_remaining_quota = min_remaining_quota
+        self.max_throttle_seconds = max_throttle_seconds
+
+        self._hosts: dict[str, _HostState] = collections.defaultdict(_HostState)
+        self._condition = threading.Condition()
+        self._waiting_count = 0
+        self._queued_batches_count = 0
+        self._throttled_count = 0
+        self._throttle_seconds_total = 0.0
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix='github-scheduler',
+        )
+
+    def _allowed_concurrency(self, state: _HostState, now: float) -> int:
+        if state.remaining is None or not state.limit:
+            return self.max_concurrency
+
+        if state.reset_at and state.reset_at <= now:
+            # quota was reset meanwhile
+            return self.max_concurrency
+
+        # scale down concurrency with decreasing quota, but allow at least one request
+        return max(1, min(
+            self.max_concurrency,
+            math.ceil(self.max_concurrency * state.remaining / state.limit),
+        ))
+
+    @contextlib.contextmanager
+    def slot(self, host: str):
+        '''
+        waits until a request against the given GitHub host may be issued
+        '''
+        started_at = time.monotonic()
+        deadline = started_at + self.max_throttle_seconds
+        throttled = False
+
+        with self._condition:
+            state = self._hosts[host]
+            self._waiting_count += 1
+
+            try:
+                while True:
+                    now = time.time()
+                    if (
+                        state.blocked_until <= now
+                        and state.in_flight < self._allowed_concurrency(state, now)
+                    ):
+                        break
+
+                    if (timeout := deadline - time.monotonic()) <= 0:
+                        logger.warning(f'{host} is still throttled, issuing request regardless')
+                        break
+
+                    if state.blocked_until > now:
+                        timeout = min(timeout, state.blocked_until - now)
+
+                    throttled = True
+                    self._condition.wait(timeout=timeout)
+            finally:
+                self._waiting_count -= 1
+
+            state.in_flight += 1
+            state.requests_count += 1
+
+            if throttled:
+                self._throttled_count += 1
+                self._throttle_seconds_total += time.monotonic() - started_at
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                state.in_flight -= 1
+                self._condition.notify_all()
+
+    def observe(self, host: str, response: requests.Response):
+        '''
+        updates the quota of the given GitHub host from the response headers
+        '''
+        headers = response.headers
+        now = time.time()
+
+        with self._condition:
+            state = self._hosts[host]
+
+            try:
+                if (limit := headers.get('X-RateLimit-Limit')) is not None:
+                    state.limit = int(limit)
+                if (remaining := headers.get('X-RateLimit-Remaining')) is not None:
+                    state.remaining = int(remaining)
+                if (reset_at := headers.get('X-RateLimit-Reset')) is not None:
+                    state.reset_at = float(reset_at)
+            except ValueError:
+                logger.warning(f'unexpected rate-limit headers from {host}')
+
+            if (
+                state.remaining is not None
+                and state.remaining < self.min_remaining_quota
+                and state.reset_at
+                and state.reset_at > now
+            ):
+                state.blocked_until = max(state.blocked_until, state.reset_at)
+
+            if (
+                response.status_code in (403, 429)
+                and (retry_after := headers.get('Retry-After', '')).isdigit()
+            ):
+                # secondary rate limit
+                state.blocked_until = max(state.blocked_until, now + int(retry_after))
+
+            self._condition.notify_all()
+
+    def instrument(self, github_api: github3.GitHub) -> github3.GitHub:
+        '''
+        schedules all requests issued by the passed-in github api object (in-place)
+        '''
+        session = github_api.session
+
+        if getattr(session, '_github_scheduler', None) is self:
+            return github_api
+
+        request = session.request
+
+        def scheduled_request(method, url, *args, **kwargs):
+            host = urllib.parse.urlparse(url).hostname
+
+            with self.slot(host):
+                response = request(method, url, *args, **kwargs)
+
+            self.observe(host, response)
+            return response
+
+        session.request = scheduled_request
+        session._github_scheduler = self
+
+        return github_api
+
+    def map_batched(
+        self,
+        func: collections.abc.Callable,
+        items: collections.abc.Iterable,
+        batch_key: collections.abc.Callable,
+    ) -> dict:
+        '''
+        applies `func` to all (distinct) items using the scheduler's thread pool, whereas items with
+        the same `batch_key` (e.g. the same repository) are processed sequentially within one batch.
+        Returns a mapping of item to result, failed items are omitted (and logged).
+
+        Must not be called from within `func`, as batches might wait for each other otherwise.
+        '''
+        batches = collections.defaultdict(list)
+        for item in items:
+            batch = batches[batch_key(item)]
+            if item not in batch:
+                batch.append(item)
+
+        results = {}
+
+        def process_batch(batch: list):
+            with self._condition:
+                self._queued_batches_count -= 1
+
+            for item in batch:
+                try:
+                    results[item] = func(item)
+                except Exception as e:
+                    logger.warning(f'failed to process {item}: {e}')
+
+        with self._condition:
+            self._queued_batches_count += len(batches)
+
+        futures = [
+            self.executor.submit(process_batch, batch)
+            for batch in batches.values()
+        ]
+        concurrent.futures.wait(futures)
+
+        return results
+
+    def metrics(self) -> dict:
+        now = time.time()
+
+        with self._condition:
+            return {
+                'waiting': self._waiting_count,
+                'queued': self._queued_batches_count,
+                'throttled_count': self._throttled_count,
+                'throttle_seconds_total': self._throttle_seconds_total,
+                'hosts': {
+                    host: {
+                        'in_flight': state.in_flight,
+                        'requests_count': state.requests_count,
+                        'allowed_concurrency': self._allowed_concurrency(state, now),
+                        'remaining_quota': state.remaining,
+                        'quota_limit': state.limit,
+                        'blocked_seconds': max(state.blocked_until - now, 0),
+                    } for host, state in self._hosts.items()
+                },
+            }
+
+
+scheduler = GitHubRequestScheduler()
@@ -1,20 +1,69 @@
+import collections
 import collections.abc
 import dacite
 import functools
+import logging
+import threading
+import time
 import urllib.parse
 
+import cachetools
+
 import ccc.oci
 import ci.util
 import cnudie.retrieve
 import cnudie.util
 import delivery.client
 import oci.client
+import oci.model as om
 import ocm
 
 import ctx_util
 import paths
 
 
+logger = logging.getLogger(__name__)
+
+
+class CacheMetrics:
+    '''
+    thread-safe counters of cache hits and misses, `stale_hits` denotes hits which were served
+    although the cached value is outdated (and thus is revalidated in the background)
+    '''
+    def __init__(self):
+        self._counters = collections.Counter()
+        self._lock = threading.Lock()
+
+    def count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            hits = self._counters['hits']
+            stale_hits = self._counters['stale_hits']
+            misses = self._counters['misses']
+
+        return {
+            'hits': hits,
+            'stale_hits': stale_hits,
+            'misses': misses,
+            'hit_ratio': (hits + stale_hits) / max(hits + stale_hits + misses, 1),
+        }
+
+
+# shared by all lookups of the current process
+component_descriptor_negative_cache_metrics = CacheMetrics()
+version_cache_metrics = CacheMetrics()
+
+
+def _ocm_repo_url(ocm_repo: ocm.OcmRepository | str) -> str:
+    if isinstance(ocm_repo, str):
+        return ocm_repo
+
+    return ocm_repo.oci_ref
+
+
 def semver_sanitised_oci_client(
     cfg_factory=None,
 ) -> oci.client.Client:
@@ -62,13 +111,15 @@ def init_component_descriptor_lookup(
     delivery_client: delivery.client.DeliveryServiceClient=None,
     oci_client: oci.client.Client=None,
     default_absent_ok: bool=False,
+    negative_cache_ttl_seconds: float=60,
 ) -> cnudie.retrieve.ComponentDescriptorLookupById:
     '''
     convenience function to create a composite component descriptor lookup consisting of:
     - in-memory cache lookup
     - file-system cache lookup (if `cache_dir` is specified)
     - delivery-client lookup (if `delivery_client` is specified)
-    - oci-client lookup
+    - oci-client lookup (remembering absent component descriptors per OCM repository for
+      `negative_cache_ttl_seconds`, if set)
     '''
     if not ocm_repository_lookup:
         ocm_repository_lookup = init_ocm_repository_lookup()
@@ -92,10 +143,19 @@ def init_component_descriptor_lookup(
             delivery_client=delivery_client,
         ))
 
-    lookups.append(cnudie.retrieve.oci_component_descriptor_lookup(
+    oci_component_descriptor_lookup = cnudie.retrieve.oci_component_descriptor_lookup(
         ocm_repository_lookup=ocm_repository_lookup,
         oci_client=oci_client,
-    ))
+    )
+
+    if negative_cache_ttl_seconds:
+        oci_component_descriptor_lookup = negative_cache_component_descriptor_lookup(
+            component_descriptor_lookup=oci_component_descriptor_lookup,
+            ocm_repository_lookup=ocm_repository_lookup,
+            ttl_seconds=negative_cache_ttl_seconds,
+        )
+
+    lookups.append(oci_component_descriptor_lookup)
 
     return cnudie.retrieve.composite_component_descriptor_lookup(
         lookups=lookups,
@@ -104,23 +164,193 @@ def init_component_descriptor_lookup(
     )
 
 
+def negative_cache_component_descriptor_lookup(
+    component_descriptor_lookup: cnudie.retrieve.ComponentDescriptorLookupById,
+    ocm_repository_lookup: cnudie.retrieve.OcmRepositoryLookup,
+    ttl_seconds: float=60,
+    maxsize: int=4096,
+    cache_metrics: CacheMetrics=component_descriptor_negative_cache_metrics,
+) -> cnudie.retrieve.ComponentDescriptorLookupById:
+    '''
+    Wraps `component_descriptor_lookup` (which is expected to retrieve component descriptors from
+    OCM repositories, e.g. `cnudie.retrieve.oci_component_descriptor_lookup`) so that the OCM
+    repositories are probed one at a time. If a component descriptor is not found in an OCM
+    repository, this is remembered for `ttl_seconds` and the repository is not probed again for
+    the same component descriptor in the meantime.
+
+    The returned lookup returns `None` for absent component descriptors (i.e. it is suitable to be
+    used as part of a composite lookup).
+    '''
+    absent_component_descriptors = cachetools.TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+    lock = threading.Lock()
+
+    def lookup(
+        component_id: ocm.ComponentIdentity,
+        ctx_repo: ocm.OcmRepository=None,
+        ocm_repository_lookup: cnudie.retrieve.OcmRepositoryLookup=ocm_repository_lookup,
+    ) -> ocm.ComponentDescriptor | None:
+        component_id = cnudie.util.to_component_id(component_id)
+
+        if ctx_repo:
+            ocm_repos = (ctx_repo,)
+        else:
+            ocm_repos = cnudie.retrieve.iter_ocm_repositories(
+                component_id,
+                ocm_repository_lookup,
+            )
+
+        for ocm_repo in ocm_repos:
+            key = (component_id.name, component_id.version, _ocm_repo_url(ocm_repo))
+
+            with lock:
+                absent = key in absent_component_descriptors
+
+            if absent:
+                cache_metrics.count('hits')
+                continue
+
+            cache_metrics.count('misses')
+            if component_descriptor := component_descriptor_lookup(
+                component_id,
+                ctx_repo=ocm_repo,
+                absent_ok=True,
+            ):
+                return component_descriptor
+
+            with lock:
+                absent_component_descriptors[key] = True
+
+        return None
+
+    return lookup
+
+
+def cached_version_lookup(
+    version_lookup: cnudie.retrieve.VersionLookupByComponent,
+    ttl_seconds: float=300,
+    max_stale_seconds: float=3600,
+    maxsize: int=1024,
+    default_absent_ok: bool=False,
+    cache_metrics: CacheMetrics=version_cache_metrics,
+) -> cnudie.retrieve.VersionLookupByComponent:
+    '''
+    Wraps `version_lookup` with a cache. Cached versions are considered up-to-date for
+    `ttl_seconds`. Afterwards, they are still returned for another `max_stale_seconds`, while they
+    are revalidated in the background (stale-while-revalidate). Only if no cached versions are
+    available (or they exceeded `max_stale_seconds`), callers wait for `version_lookup`.
+    '''
+    # component name, ocm repo url -> (versions, retrieval time)
+    cache = cachetools.LRUCache(maxsize=maxsize)
+    revalidating_keys = set()
+    lock = threading.Lock()
+
+    def retrieve_versions(
+        key: tuple[str, str | None],
+        component_name: str,
+        ctx_repo: ocm.OcmRepository | None,
+    ) -> frozenset[str]:
+        versions = frozenset(version_lookup(
+            component_name,
+            ctx_repo=ctx_repo,
+            absent_ok=True,
+        ))
+
+        with lock:
+            cache[key] = (versions, time.monotonic())
+
+        return versions
+
+    def revalidate(
+        key: tuple[str, str | None],
+        component_name: str,
+        ctx_repo: ocm.OcmRepository | None,
+    ):
+        try:
+            retrieve_versions(key, component_name, ctx_repo)
+        except Exception as e:
+            # keep serving stale versions until they exceed `max_stale_seconds`
+            logger.warning(f'failed to revalidate versions of {component_name}: {e}')
+        finally:
+            with lock:
+                revalidating_keys.discard(key)
+
+    def lookup(
+        component_id: cnudie.retrieve.ComponentName,
+        ctx_repo: ocm.OcmRepository=None,
+        absent_ok: bool=default_absent_ok,
+    ) -> set[str]:
+        component_name = cnudie.util.to_component_name(component_id)
+        key = (component_name, _ocm_repo_url(ctx_repo) if ctx_repo else None)
+
+        with lock:
+            cached = cache.get(key)
+
+        if cached and (age_seconds := time.monotonic() - cached[1]) < ttl_seconds:
+            cache_metrics.count('hits')
+            versions = cached[0]
+
+        elif cached and age_seconds < ttl_seconds + max_stale_seconds:
+            cache_metrics.count('stale_hits')
+            versions = cached[0]
+
+            with lock:
+                revalidate_versions = key not in revalidating_keys
+                revalidating_keys.add(key)
+
+            if revalidate_versions:
+                threading.Thread(
+                    target=revalidate,
+                    args=(key, component_name, ctx_repo),
+                    name=f'revalidate-versions-{component_name}',
+                    daemon=True,
+                ).start()
+
+        else:
+            cache_metrics.count('misses')
+            versions = retrieve_versions(key, component_name, ctx_repo)
+
+        if not versions and not absent_ok:
+            raise om.OciImageNotFoundException(component_name)
+
+        # callers must not modify cached versions
+        return set(versions)
+
+    return lookup
+
+
 def init_version_lookup(
     ocm_repository_lookup: cnudie.retrieve.OcmRepositoryLookup=None,
     oci_client: oci.client.Client=None,
     default_absent_ok: bool=False,
+    cache_ttl_seconds: float=300,
+    cache_max_stale_seconds: float=3600,
 ) -> cnudie.retrieve.VersionLookupByComponent:
+    '''
+    creates a version lookup, which caches the versions per component (see `cached_version_lookup`)
+    unless `cache_ttl_seconds` is set to `0`
+    '''
     if not ocm_repository_lookup:
         ocm_repository_lookup = init_ocm_repository_lookup()
 
     if not oci_client:
         oci_client = semver_sanitised_oci_client()
 
-    return cnudie.retrieve.version_lookup(
+    version_lookup = cnudie.retrieve.version_lookup(
         ocm_repository_lookup=ocm_repository_lookup,
         oci_client=oci_client,
         default_absent_ok=default_absent_ok,
     )
 
+    if not cache_ttl_seconds:
+        return version_lookup
+
+    return cached_version_lookup(
+        version_lookup=version_lookup,
+        ttl_seconds=cache_ttl_seconds,
+        max_stale_seconds=cache_max_stale_seconds,
+        default_absent_ok=default_absent_ok,
+    )
+
 
 def github_api_lookup(
     cfg_factory=None,
@@ -142,17 +372,19 @@ def github_api_lookup(
         the passed repository URL
 
         The implementation currently delegates lookup to `ccc.github.github_api`. Consistently using
-        this wrapper will however allow for later decoupling.
+        this wrapper will however allow for later decoupling. Requests issued by the returned
+        apiclient are scheduled by the shared `github_scheduler.scheduler`.
 
         raises ValueError if no configuration (credentials) is found for the given repository url
         unless absent_ok is set to a truthy value, in which case None is returned instead.
         '''
         import ccc.github
+        import github_scheduler
         try:
-            return ccc.github.github_api(
+            return github_scheduler.scheduler.instrument(ccc.github.github_api(
                 repo_url=repo_url,
                 cfg_factory=cfg_factory,
-            )
+            ))
         except:
             if not absent_ok:
                 raise
@@ -29,6 +29,8 @@ import k8s.util
 import lookups
 import malware.clamav
 import malware.scan
+import malware.scheduler
+import malware.verdict_cache
 
 
 logger = logging.getLogger(__name__)
@@ -141,6 +143,8 @@ def scan_resource(
     resource_node: cnudie.iter.ResourceNode,
     oci_client: oci.client.Client,
     s3_client: 'boto3.resources.factory.s3.ServiceResource | None',
+    verdict_cache: malware.verdict_cache.VerdictCache | None=None,
+    scan_scheduler: malware.scheduler.ScanScheduler | None=None,
 ) -> collections.abc.Generator[dso.model.ClamAVMalwareFinding, None, None]:
     resource = resource_node.resource
     resource: ocm.Resource
@@ -149,6 +153,8 @@ def scan_resource(
         results = malware.scan.scan_oci_image(
             image_reference=resource.access.imageReference,
             oci_client=oci_client,
+            verdict_cache=verdict_cache,
+            scan_scheduler=scan_scheduler,
         )
 
     elif isinstance(resource.access, ocm.S3Access):
@@ -167,6 +173,7 @@ def scan_resource(
         results = malware.scan.scan_tarfile(
             tf=tf,
             context=f'{resource.access.bucketName}|{resource.access.objectKey}',
+            verdict_cache=verdict_cache,
         )
 
     else:
@@ -212,6 +219,8 @@ def scan_and_upload(
     oci_client: oci.client.Client,
     s3_client: 'boto3.resources.factory.s3.ServiceResource | None',
     clamav_config: config.ClamAVConfig,
+    verdict_cache_path: str=malware.verdict_cache.default_cache_path,
+    scan_scheduler: malware.scheduler.ScanScheduler | None=None,
 ):
     if backlog_item.artefact.artefact_kind is not dso.model.ArtefactKind.RESOURCE:
         logger.warning(
@@ -232,25 +241,38 @@ def scan_and_upload(
     resource_node_name = f'{comp.name}:{comp.version} - {res.name}:{res.version}'
     logger.info(f'scanning {resource_node_name=}')
 
+    # verdicts are only valid for the signature version they were determined with
+    _, signature_version, _ = malware.clamav.clamscan_version(max_age_seconds=0)
+    verdict_cache = malware.verdict_cache.VerdictCache(
+        signature_version=signature_version,
+        path=verdict_cache_path,
+    )
+
     result = scan_resource(
         resource_node=resource_node,
         oci_client=oci_client,
         s3_client=s3_client,
+        verdict_cache=verdict_cache,
+        scan_scheduler=scan_scheduler,
+    )
+
+    findings = list(
+        _iter_clamav_malware_findings(
+            findings=result,
+            resource_node=resource_node,
+        )
     )
+    logger.info(f'{resource_node_name=} {verdict_cache.statistics()=}')
 
     scan_info = dso.model.artefact_scan_info(
         artefact_node=resource_node,
         datasource=dso.model.Datasource.CLAMAV,
+        data={
+            'verdict_cache': verdict_cache.statistics(),
+        },
     )
 
-    delivery_client.update_metadata(
-        data=list(
-            _iter_clamav_malware_findings(
-                findings=result,
-                resource_node=resource_node,
-            )
-        ) + [scan_info]
-    )
+    delivery_client.update_metadata(data=findings + [scan_info])
 
 
 def main():
@@ -324,6 +346,12 @@ def main():
         delivery_client=delivery_client,
     )
 
+    scan_scheduler = malware.scheduler.ScanScheduler(
+        max_workers=clamav_config.max_scan_workers,
+        max_in_flight_octets=clamav_config.max_in_flight_octets,
+        max_concurrency_per_registry=clamav_config.max_concurrency_per_registry,
+    )
+
     global ready_to_terminate, wants_to_terminate
     while not wants_to_terminate:
         ready_to_terminate = False
@@ -356,7 +384,10 @@ def main():
             oci_client=oci_client,
             s3_client=s3_client,
             clamav_config=clamav_config,
+            verdict_cache_path=os.path.join(parsed_arguments.cache_dir, 'clamav-verdicts.sqlite'),
+            scan_scheduler=scan_scheduler,
         )
+        logger.info(f'{scan_scheduler.metrics()=}')
 
         k8s.util.delete_custom_resource(
             crd=k8s.model.BacklogItemCrd,
@@ -1,4 +1,5 @@
 import collections.abc
+import dataclasses
 import datetime
 import functools
 import hashlib
@@ -53,7 +54,24 @@ def _lookup_clamd_socket(
     raise ValueError('clamd socket not found')
 
 
-def clamscan_version() -> tuple[str]:
+_clamscan_version: tuple[float, tuple[str, int, str]] | None = None # (retrieval time, version)
+_clamscan_version_lock = threading.Lock()
+
+
+def clamscan_version(
+    max_age_seconds: float=60,
+) -> tuple[str, int, str]:
+    '''
+    returns clamav version, signature version and signature date. As determining the version
+    requires a subprocess, the version is re-used for `max_age_seconds` (signatures might be
+    updated meanwhile, though).
+    '''
+    global _clamscan_version
+
+    with _clamscan_version_lock:
+        if _clamscan_version and time.monotonic() - _clamscan_version[0] < max_age_seconds:
+            return _clamscan_version[1]
+
     clamscan_output = subprocess.check_output(
         ['freshclam', '--version'],
     ).decode()
@@ -69,107 +87,253 @@ def clamscan_version() -> tuple[str]:
 
     signature_version = int(signature_version)
 
-    return clamav_version, signature_version, signature_date
+    version = clamav_version, signature_version, signature_date
 
+    with _clamscan_version_lock:
+        _clamscan_version = (time.monotonic(), version)
 
-def scan(
-    data: collections.abc.Iterable[bytes],
-    filename: str,
-    context: str | None=None,
-) -> dso.model.ClamAVMalwareFinding | None:
-    sock = socket.socket(
-        family=socket.AF_UNIX,
-        type=socket.SOCK_STREAM,
-    )
-    clamav_socket_address = _lookup_clamd_socket()
+    return version
 
-    sock.connect(clamav_socket_address)
-    sock.send(b'zINSTREAM\x00')
 
-    total = 0
-    content_hash = hashlib.sha256()
+def _malware_or_none(
+    raw_result: str,
+) -> str | None:
+    '''
+    extract malware name from clamav result
+    "stream: Eicar-Signature FOUND" -> "Eicar-Signature"
 
-    for chunk in data:
-        leng = len(chunk)
-        content_hash.update(chunk)
-        total += leng
+    if result indicates no malware, return None
+    '''
+    result = raw_result \
+        .removeprefix('stream: ') \
+        .removesuffix(' FOUND')
 
-        sock.send(struct.pack(b'!L', leng))
-        sock.send(chunk)
+    if result == 'OK':
+        return None
 
-    sock.send(struct.pack(b'!L', 0))
+    return result
 
-    receive_done_time = time.time()
 
-    result = None
+@dataclasses.dataclass(frozen=True)
+class _InstreamResult:
+    result: str # raw result, e.g. "stream: OK"
+    octets_count: int
+    content_digest: str
+    scan_duration_seconds: float # duration from end of stream until result was received
 
-    def read_result():
-        nonlocal result
-        with sock.makefile('r') as f:
-            result = f.read()
 
-    reader = threading.Thread(target=read_result)
-    reader.start()
+class _Session:
+    '''
+    connection to clamd within an `IDSESSION`, i.e. multiple commands may be sent using the same
+    connection, whereas replies are prefixed with the (sequential) id of the command
+    '''
+    def __init__(self, socket_address: str):
+        self.sock = socket.socket(
+            family=socket.AF_UNIX,
+            type=socket.SOCK_STREAM,
+        )
+        self.sock.connect(socket_address)
+        self.sock.sendall(b'zIDSESSION\x00')
+
+        self.last_command_id = 0
+        self.last_used = time.monotonic()
+
+    def start_instream(self):
+        self.sock.sendall(b'zINSTREAM\x00')
+        self.last_command_id += 1
+
+    def instream(
+        self,
+        data: collections.abc.Iterable[bytes],
+    ) -> _InstreamResult:
+        '''
+        streams the given data to clamd, `start_instream` must have been called before
+        '''
+        octets_count = 0
+        content_hash = hashlib.sha256()
+
+        for chunk in data:
+            if not chunk:
+                continue # an empty chunk would terminate the stream
+            octets_count += len(chunk)
+            content_hash.update(chunk)
+
+            self.sock.sendall(struct.pack(b'!L', len(chunk)))
+            self.sock.sendall(chunk)
+
+        self.sock.sendall(struct.pack(b'!L', 0))
+        stream_done_time = time.monotonic()
+
+        reply = self._read_reply()
+        self.last_used = time.monotonic()
+
+        command_id, _, result = reply.partition(': ')
+        if command_id != str(self.last_command_id):
+            raise RuntimeError(f'unexpected reply from clamd: {reply}')
+
+        return _InstreamResult(
+            result=result,
+            octets_count=octets_count,
+            content_digest=f'sha256:{content_hash.hexdigest()}',
+            scan_duration_seconds=self.last_used - stream_done_time,
+        )
 
-    def responder():
-        nonlocal result
-        nonlocal content_hash
+    def _read_reply(self) -> str:
+        reply = b''
+
+        while not reply.endswith(b'\x00'):
+            if not (received := self.sock.recv(4096)):
+                raise ConnectionError(f'clamd closed connection, {reply=}')
+            reply += received
+
+        return reply.removesuffix(b'\x00').decode()
+
+    def close(self):
+        try:
+            self.sock.sendall(b'zEND\x00')
+        except OSError:
+            pass # connection might have been closed by clamd already
+        finally:
+            self.sock.close()
+
+
+class ClamdClient:
+    '''
+    client for clamd, which re-uses connections (sessions) for subsequent scans. At most
+    `max_connections` scans are run in parallel, further scans wait for a connection to become
+    available.
+
+    @param socket_address:
+        path to the clamd socket, looked up from the clamd configuration if not passed
+    @param idle_timeout_seconds:
+        sessions which were not used for this time are not re-used, as clamd closes idle
+        connections (see `IdleTimeout` clamd configuration)
+    '''
+    def __init__(
+        self,
+        socket_address: str | None=None,
+        max_connections: int=8,
+        idle_timeout_seconds: float=20,
+    ):
+        self.socket_address = socket_address or _lookup_clamd_socket()
+        self.idle_timeout_seconds = idle_timeout_seconds
+
+        self._idle_sessions: list[_Session] = []
+        self._semaphore = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+
+    def _session(self) -> _Session:
+        with self._lock:
+            while self._idle_sessions:
+                session = self._idle_sessions.pop()
+
+                if time.monotonic() - session.last_used < self.idle_timeout_seconds:
+                    return session
+
+                session.close()
+
+        return _Session(socket_address=self.socket_address)
+
+    def _scan(
+        self,
+        data: collections.abc.Iterable[bytes],
+    ) -> _InstreamResult:
+        with self._semaphore:
+            session = self._session()
+
+            try:
+                session.start_instream()
+            except OSError:
+                # session was closed by clamd meanwhile, no data was consumed yet hence retry
+                session.close()
+                session = _Session(socket_address=self.socket_address)
+                session.start_instream()
+
+            try:
+                result = session.instream(data=data)
+            except BaseException:
+                # state of the session is unknown, e.g. the reply might still be pending
+                session.close()
+                raise
+
+            if result.result.endswith('ERROR'):
+                # clamd terminates the session in case of errors; the content was not scanned, thus
+                # the result must neither be reported as malware nor be cached
+                session.close()
+                raise RuntimeError(f'clamd failed to scan content: {result.result}')
+
+            with self._lock:
+                self._idle_sessions.append(session)
 
-        while True:
-            reader.join(timeout=20)
-            if reader.is_alive():
-                # still waiting for result
-                logger.info('sending keep-alive..')
-                continue
-            break
+            return result
 
-        sock.close()
+    def scan(
+        self,
+        data: collections.abc.Iterable[bytes],
+        filename: str,
+        context: str | None=None,
+    ) -> dso.model.ClamAVMalwareFinding | None:
+        result = self._scan(data=data)
 
-        scan_done_time = time.time()
-        scan_duration_seconds = scan_done_time - receive_done_time
+        if not (malware := _malware_or_none(result.result)):
+            return None
 
-        def _malware_or_none(
-            raw_result: str,
-        ) -> str | None:
-            '''
-            extract malware name from clamav result
-            "stream: Eicar-Signature FOUND\x00" -> "Eicar-Signature"
+        return malware_finding(
+            malware=malware,
+            filename=filename,
+            content_digest=result.content_digest,
+            octets_count=result.octets_count,
+            scan_duration_seconds=result.scan_duration_seconds,
+            context=context,
+        )
 
-            if result indicates no malware, return None
-            '''
-            result = raw_result \
-                .removeprefix('stream: ') \
-                .removesuffix('\x00') \
-                .removesuffix(' FOUND') \
-                .removesuffix('\n')
+    def close(self):
+        with self._lock:
+            for session in self._idle_sessions:
+                session.close()
+            self._idle_sessions.clear()
 
-            if result == 'OK':
-                return None
 
-            return result
+@functools.cache
+def clamd_client() -> ClamdClient:
+    return ClamdClient()
 
-        malware_or_none = _malware_or_none(result)
 
-        if not malware_or_none:
-            return
+def scan(
+    data: collections.abc.Iterable[bytes],
+    filename: str,
+    context: str | None=None,
+) -> dso.model.ClamAVMalwareFinding | None:
+    return clamd_client().scan(
+        data=data,
+        filename=filename,
+        context=context,
+    )
 
-        finding = dso.model.MalwareFindingDetails(
-            filename=filename,
-            content_digest=f'sha256:{content_hash.hexdigest()}',
-            malware=malware_or_none,
-            context=context,
-        )
 
-        clamav_version, signature_version, signature_date = clamscan_version()
+def malware_finding(
+    malware: str,
+    filename: str,
+    content_digest: str,
+    octets_count: int,
+    scan_duration_seconds: float,
+    context: str | None=None,
+) -> dso.model.ClamAVMalwareFinding:
+    finding = dso.model.MalwareFindingDetails(
+        filename=filename,
+        content_digest=content_digest,
+        malware=malware,
+        context=context,
+    )
 
-        return dso.model.ClamAVMalwareFinding(
-            finding=finding,
-            octets_count=total,
-            scan_duration_seconds=scan_duration_seconds,
-            severity=github.compliance.model.Severity.BLOCKER.name,
-            clamav_version=clamav_version,
-            signature_version=signature_version,
-            freshclam_timestamp=signature_date,
-        )
+    clamav_version, signature_version, signature_date = clamscan_version()
 
-    return responder()
+    return dso.model.ClamAVMalwareFinding(
+        finding=finding,
+        octets_count=octets_count,
+        scan_duration_seconds=scan_duration_seconds,
+        severity=github.compliance.model.Severity.BLOCKER.name,
+        clamav_version=clamav_version,
+        signature_version=signature_version,
+        freshclam_timestamp=signature_date,
+    )
@@ -1,9 +1,9 @@
 import collections.abc
-import concurrent.futures
 import functools
+import hashlib
+import io
 import logging
 import tarfile
-import tempfile
 
 import ci.log
 import dso.model
@@ -11,31 +11,129 @@ import oci.client
 import oci.model
 
 import malware.clamav
+import malware.scheduler
+import malware.verdict_cache
 
 
 logger = logging.getLogger(__name__)
 ci.log.configure_default_logging()
 
+CHUNK_SIZE = 64 * 1024
+# files up to this size are kept in memory to look up cached verdicts before scanning them
+MAX_BUFFERED_OCTETS = 4 * 1024 * 1024
+
+
+class _ChunkReader(io.RawIOBase):
+    '''
+    non-seekable file-like object reading from the given chunks (e.g. a streamed blob), as expected
+    by `tarfile` in stream mode
+    '''
+    def __init__(self, chunks: collections.abc.Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if (chunk := next(self._chunks, None)) is None:
+                return 0 # EOF
+            self._pending = chunk
+
+        octets_count = min(len(buffer), len(self._pending))
+        buffer[:octets_count] = self._pending[:octets_count]
+        self._pending = self._pending[octets_count:]
+
+        return octets_count
+
+
+def _iter_chunks(
+    fileobj,
+    chunk_size: int=CHUNK_SIZE,
+) -> collections.abc.Generator[bytes, None, None]:
+    while chunk := fileobj.read(chunk_size):
+        yield chunk
+
+
+def _scan_file(
+    fileobj,
+    filename: str,
+    size: int,
+    context: str | None=None,
+    verdict_cache: malware.verdict_cache.VerdictCache | None=None,
+    max_buffered_octets: int=MAX_BUFFERED_OCTETS,
+) -> dso.model.ClamAVMalwareFinding | None:
+    '''
+    scans the given file (which does not have to be seekable) by streaming it to clamd in chunks.
+
+    If a verdict cache is passed, files of up to `max_buffered_octets` are read into memory to
+    determine their content digest, so they are only scanned if no verdict is cached yet. Larger
+    files are always scanned.
+    '''
+    if not verdict_cache or size > max_buffered_octets:
+        return malware.clamav.scan(
+            data=_iter_chunks(fileobj),
+            filename=filename,
+            context=context,
+        )
+
+    content = fileobj.read()
+    content_digest = f'sha256:{hashlib.sha256(content).hexdigest()}'
+
+    if verdict := verdict_cache.verdict(content_digest=content_digest):
+        if not verdict.malware:
+            return None
+
+        return malware.clamav.malware_finding(
+            malware=verdict.malware,
+            filename=filename,
+            content_digest=content_digest,
+            octets_count=len(content),
+            scan_duration_seconds=0,
+            context=context,
+        )
+
+    scan_result = malware.clamav.scan(
+        data=_iter_chunks(io.BytesIO(content)),
+        filename=filename,
+        context=context,
+    )
+
+    verdict_cache.add(
+        content_digest=content_digest,
+        verdict=malware.verdict_cache.Verdict(
+            malware=scan_result.finding.malware if scan_result else None,
+        ),
+        layer_digest=context,
+    )
+
+    return scan_result
+
 
 def scan_tarfile(
     tf: tarfile.TarFile,
     context: str | None=None,
+    verdict_cache: malware.verdict_cache.VerdictCache | None=None,
 ) -> collections.abc.Generator[dso.model.ClamAVMalwareFinding, None, None]:
+    '''
+    scans the regular files of the given tarfile, which may be opened in stream mode (i.e. members
+    are scanned in order and are not spooled)
+    '''
     for tar_info in tf:
         if not tar_info.isfile():
             continue
-        data = tf.extractfile(member=tar_info)
 
-        with tempfile.TemporaryFile() as tmp_file:
-            tmp_file.write(data.read())
-            tmp_file.seek(0)
+        data = tf.extractfile(member=tar_info)
 
-            if (scan_result := malware.clamav.scan(
-                data=tmp_file,
-                filename=tar_info.name,
-                context=context,
-            )):
-                yield scan_result
+        if (scan_result := _scan_file(
+            fileobj=data,
+            filename=tar_info.name,
+            size=tar_info.size,
+            context=context,
+            verdict_cache=verdict_cache,
+        )):
+            yield scan_result
 
 
 def _iter_layers(
@@ -76,7 +174,15 @@ def _iter_layers(
 def scan_oci_image(
     image_reference: str | oci.model.OciImageReference,
     oci_client: oci.client.Client,
+    verdict_cache: malware.verdict_cache.VerdictCache | None=None,
+    scan_scheduler: malware.scheduler.ScanScheduler | None=None,
 ) -> collections.abc.Generator[dso.model.ClamAVMalwareFinding, None, None]:
+    '''
+    scans the layers of the given image in parallel using the passed (or the shared) scan scheduler
+    '''
+    if not scan_scheduler:
+        scan_scheduler = malware.scheduler.scheduler
+
     layer_blobs = tuple(_iter_layers(image_reference=image_reference, oci_client=oci_client))
     logger.info(f'will scan {len(layer_blobs)} layer blobs')
 
@@ -84,36 +190,56 @@ def scan_oci_image(
         scan_oci_blob,
         image_reference=image_reference,
         oci_client=oci_client,
+        verdict_cache=verdict_cache,
     )
 
-    if len(layer_blobs) > 1:
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(layer_blobs))
-
-        for res in executor.map(scan_func, layer_blobs):
-            yield from res
-    else:
-        yield from scan_func(blob_reference=layer_blobs[0])
+    yield from scan_scheduler.scan_layers(
+        scan_func=scan_func,
+        image_reference=image_reference,
+        layer_blobs=layer_blobs,
+    )
 
 
 def scan_oci_blob(
     blob_reference: oci.model.OciBlobRef,
     image_reference: str | oci.model.OciImageReference,
     oci_client: oci.client.Client,
+    verdict_cache: malware.verdict_cache.VerdictCache | None=None,
 ) -> collections.abc.Generator[dso.model.ClamAVMalwareFinding, None, None]:
+    if verdict_cache and (findings := verdict_cache.layer_findings(
+        layer_digest=blob_reference.digest,
+    )) is not None:
+        logger.info(f'{blob_reference.digest=} was already scanned, skipping')
+        yield from findings
+        return
+
     logger.info(f'scanning {blob_reference=}')
+    findings = []
     try:
-        yield from scan_oci_blob_filewise(
+        for finding in scan_oci_blob_filewise(
             blob_reference=blob_reference,
             image_reference=image_reference,
             oci_client=oci_client,
-        )
+            verdict_cache=verdict_cache,
+        ):
+            findings.append(finding)
+            yield finding
     except tarfile.TarError as te:
         logger.warning(f'{image_reference=} {te=} - falling back to layerwise scan')
 
-        yield from scan_oci_blob_layerwise(
+        for finding in scan_oci_blob_layerwise(
             blob_reference=blob_reference,
             image_reference=image_reference,
             oci_client=oci_client,
+        ):
+            findings.append(finding)
+            yield finding
+
+    if verdict_cache:
+        # layer was scanned completely
+        verdict_cache.add_layer(
+            layer_digest=blob_reference.digest,
+            findings=findings,
         )
 
 
@@ -121,36 +247,25 @@ def scan_oci_blob_filewise(
     blob_reference: oci.model.OciBlobRef,
     image_reference: str | oci.model.OciImageReference,
     oci_client: oci.client.Client,
-    chunk_size=8096,
+    chunk_size: int=CHUNK_SIZE,
+    verdict_cache: malware.verdict_cache.VerdictCache | None=None,
 ) -> collections.abc.Generator[dso.model.ClamAVMalwareFinding, None, None]:
     blob = oci_client.blob(
         image_reference=image_reference,
         digest=blob_reference.digest,
     )
 
-    # unfortunately, we need a backing tempfile, because we need a seekable filelike-obj for retry
-    with tempfile.TemporaryFile() as tmpfh:
-        for chunk in blob.iter_content(chunk_size=chunk_size):
-            tmpfh.write(chunk)
-
-        tmpfh.seek(0)
-
-        with tarfile.open(
-            fileobj=tmpfh,
-            mode='r',
-        ) as tf:
-            for tar_info in tf:
-                if not tar_info.isfile():
-                    continue
-
-                data = tf.extractfile(member=tar_info)
-
-                if (scan_result := malware.clamav.scan(
-                    data=data,
-                    filename=tar_info.name,
-                    context=blob_reference.digest,
-                )):
-                    yield scan_result
+    # the blob is read as stream, thus it is neither spooled nor kept in memory; if it cannot be
+    # read as tarfile, callers fall back to scanning the (re-retrieved) blob as a whole
+    with tarfile.open(
+        fileobj=_ChunkReader(blob.iter_content(chunk_size=chunk_size)),
+        mode='r|*',
+    ) as tf:
+        yield from scan_tarfile(
+            tf=tf,
+            context=blob_reference.digest,
+            verdict_cache=verdict_cache,
+        )
 
 
 def scan_oci_blob_layerwise(
@@ -164,7 +279,7 @@ def scan_oci_blob_layerwise(
     )
 
     if (scan_result := malware.clamav.scan(
-        data=blob.iter_content(chunk_size=tarfile.RECORDSIZE),
+        data=blob.iter_content(chunk_size=CHUNK_SIZE),
         filename=blob_reference.digest,
     )):
         yield scan_result
@@ -0,0 +1,186 @@
+'''
+Scheduling of layer scans, shared by all scans within a process.
+
+Layers of OCI images are scanned in parallel, whereas the amount of resources used for scanning is
+bounded for the whole process: at most `max_workers` layers are scanned concurrently, the total size
+of layers being scanned concurrently is limited (`max_in_flight_octets`), and so is the amount of
+concurrent layer downloads from the same registry (`max_concurrency_per_registry`).
+'''
+import collections
+import collections.abc
+import concurrent.futures
+import contextlib
+import dataclasses
+import logging
+import threading
+import time
+
+import oci.model
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class LayerScanMetrics:
+    '''
+    @param wait_seconds:
+        time the layer scan was held back because of exhausted resource budgets (incl. time waiting
+        for a worker)
+    @param scan_seconds:
+        time for retrieving and scanning the layer
+    '''
+    image_reference: str
+    layer_digest: str
+    octets_count: int
+    wait_seconds: float
+    scan_seconds: float
+
+
+class ScanScheduler:
+    '''
+    @param max_workers:
+        max. amount of layers which are scanned concurrently (per process)
+    @param max_in_flight_octets:
+        max. total size of layers which are scanned concurrently, a single layer exceeding the limit
+        is scanned once no other layer is being scanned
+    @param max_concurrency_per_registry:
+        max. amount of layers which are scanned concurrently from the same registry
+    @param recent_metrics_count:
+        amount of layer scan metrics which are kept for reporting
+    '''
+    def __init__(
+        self,
+        max_workers: int=4,
+        max_in_flight_octets: int=4 * 1024 ** 3, # 4 GiB
+        max_concurrency_per_registry: int=4,
+        recent_metrics_count: int=256,
+    ):
+        self.max_workers = max_workers
+        self.max_in_flight_octets = max_in_flight_octets
+        self.max_concurrency_per_registry = max_concurrency_per_registry
+
+        self._condition = threading.Condition()
+        self._in_flight_octets = 0
+        self._in_flight_by_registry = collections.Counter()
+        self._scanned_layers_count = 0
+        self._wait_seconds_total = 0.0
+        self._scan_seconds_total = 0.0
+        self.recent_metrics: collections.deque[LayerScanMetrics] = collections.deque(
+            maxlen=recent_metrics_count,
+        )
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='malware-scan',
+        )
+
+    def _may_start(self, registry: str, octets_count: int) -> bool:
+        if self._in_flight_by_registry[registry] >= self.max_concurrency_per_registry:
+            return False
+
+        if not self._in_flight_octets:
+            # always admit a single layer, even if it exceeds the limit
+            return True
+
+        return self._in_flight_octets + octets_count <= self.max_in_flight_octets
+
+    @contextlib.contextmanager
+    def reservation(self, registry: str, octets_count: int):
+        '''
+        waits until a layer of the given size may be scanned from the given registry
+        '''
+        with self._condition:
+            self._condition.wait_for(lambda: self._may_start(registry, octets_count))
+            self._in_flight_octets += octets_count
+            self._in_flight_by_registry[registry] += 1
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight_octets -= octets_count
+                self._in_flight_by_registry[registry] -= 1
+                if not self._in_flight_by_registry[registry]:
+                    del self._in_flight_by_registry[registry]
+                self._condition.notify_all()
+
+    def _scan_layer(
+        self,
+        scan_func: collections.abc.Callable,
+        image_reference: str,
+        blob_reference: oci.model.OciBlobRef,
+        submitted_at: float,
+    ) -> list:
+        registry = oci.model.OciImageReference.to_image_ref(image_reference).netloc
+
+        with self.reservation(registry=registry, octets_count=blob_reference.size):
+            started_at = time.monotonic()
+            findings = list(scan_func(blob_reference=blob_reference))
+            done_at = time.monotonic()
+
+        metrics = LayerScanMetrics(
+            image_reference=str(image_reference),
+            layer_digest=blob_reference.digest,
+            octets_count=blob_reference.size,
+            wait_seconds=started_at - submitted_at,
+            scan_seconds=done_at - started_at,
+        )
+        logger.info(
+            f'scanned {metrics.layer_digest} ({metrics.octets_count} octets) in '
+            f'{metrics.scan_seconds:.2f}s, waited {metrics.wait_seconds:.2f}s'
+        )
+
+        with self._condition:
+            self._scanned_layers_count += 1
+            self._wait_seconds_total += metrics.wait_seconds
+            self._scan_seconds_total += metrics.scan_seconds
+            self.recent_metrics.append(metrics)
+
+        return findings
+
+    def scan_layers(
+        self,
+        scan_func: collections.abc.Callable,
+        image_reference: str | oci.model.OciImageReference,
+        layer_blobs: collections.abc.Iterable[oci.model.OciBlobRef],
+    ) -> collections.abc.Generator:
+        '''
+        scans the given layers using the scheduler's thread pool and yields the findings in order
+        of the layers. `scan_func` is called with the `blob_reference` of the layer to scan and
+        must return an iterable of findings.
+
+        Must not be called from within `scan_func`, as layer scans might wait for each other
+        otherwise.
+        '''
+        submitted_at = time.monotonic()
+        futures = [
+            self.executor.submit(
+                self._scan_layer,
+                scan_func=scan_func,
+                image_reference=image_reference,
+                blob_reference=blob_reference,
+                submitted_at=submitted_at,
+            ) for blob_reference in layer_blobs
+        ]
+
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            # e.g. if a layer scan failed, pending layers of this image need not be scanned
+            for future in futures:
+                future.cancel()
+
+    def metrics(self) -> dict:
+        with self._condition:
+            return {
+                'in_flight_octets': self._in_flight_octets,
+                'in_flight_by_registry': dict(self._in_flight_by_registry),
+                'scanned_layers_count': self._scanned_layers_count,
+                'wait_seconds_total': self._wait_seconds_total,
+                'scan_seconds_total': self._scan_seconds_total,
+            }
+
+
+scheduler = ScanScheduler()
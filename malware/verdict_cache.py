@@ -0,0 +1,208 @@
+'''
+Persisted cache of ClamAV verdicts, used to skip layers and files which were already scanned (e.g.
+base-image layers which are shared by many OCI images).
+
+The verdict for a file is fully determined by its content and the ClamAV signatures used for the
+scan. Thus, verdicts are stored by content digest (sha256) and signature version, whereas verdicts
+of outdated signature versions are purged. The layer (or archive) the file was scanned within is
+recorded for reference only, so identical files are deduplicated across layers as well.
+
+As layers are content-addressed, the findings of a completely scanned layer are stored by layer
+digest and signature version as well. Hence, layers which did not change (compared to previously
+scanned images) do not even have to be downloaded.
+
+Verdicts are stored in a SQLite database, hence they survive restarts of the scanner.
+'''
+import collections.abc
+import dataclasses
+import json
+import os
+import sqlite3
+import threading
+
+import dacite
+
+import dso.model
+
+import sqlite_util
+
+
+own_dir = os.path.abspath(os.path.dirname(__file__))
+default_cache_path = os.path.join(own_dir, '.cache', 'clamav-verdicts.sqlite')
+
+_ddl = '''
+    CREATE TABLE IF NOT EXISTS verdicts (
+        content_digest TEXT NOT NULL,
+        signature_version INTEGER NOT NULL,
+        layer_digest TEXT,
+        malware TEXT,
+        PRIMARY KEY (content_digest, signature_version)
+    );
+    CREATE TABLE IF NOT EXISTS layers (
+        layer_digest TEXT NOT NULL,
+        signature_version INTEGER NOT NULL,
+        findings TEXT NOT NULL,
+        PRIMARY KEY (layer_digest, signature_version)
+    );
+'''
+
+
+@dataclasses.dataclass(frozen=True)
+class Verdict:
+    '''
+    @param malware:
+        name of the found malware, `None` if the file is clean
+    '''
+    malware: str | None
+
+
+class VerdictCache:
+    '''
+    verdicts of the given signature version, verdicts of older signature versions are purged once
+    the cache is accessed the first time. Also counts cache hits and misses, hence a separate
+    instance should be used per scan.
+    '''
+    def __init__(
+        self,
+        signature_version: int,
+        path: str=default_cache_path,
+    ):
+        self.signature_version = signature_version
+        self.path = path
+
+        self._database = sqlite_util.SQLiteDatabase(path=path, ddl=_ddl)
+        self._lock = threading.Lock()
+        self._purged = False
+        self.hits = 0
+        self.misses = 0
+        self.layer_hits = 0
+        self.layer_misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = self._database.connection()
+
+        if self._purged:
+            return connection
+
+        with self._lock:
+            if not self._purged:
+                # signatures were updated, hence previous verdicts are outdated
+                for table in ('verdicts', 'layers'):
+                    connection.execute(
+                        f'DELETE FROM {table} WHERE signature_version < ?',
+                        (self.signature_version,),
+                    )
+                self._purged = True
+
+        return connection
+
+    def verdict(
+        self,
+        content_digest: str,
+    ) -> Verdict | None:
+        row = self._connection().execute(
+            'SELECT malware FROM verdicts WHERE content_digest = ? AND signature_version = ?',
+            (content_digest, self.signature_version),
+        ).fetchone()
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if not row:
+            return None
+
+        return Verdict(malware=row[0])
+
+    def add(
+        self,
+        content_digest: str,
+        verdict: Verdict,
+        layer_digest: str | None=None,
+    ):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)',
+            (content_digest, self.signature_version, layer_digest, verdict.malware),
+        )
+
+    def layer_findings(
+        self,
+        layer_digest: str,
+    ) -> tuple[dso.model.ClamAVMalwareFinding, ...] | None:
+        '''
+        returns the findings of the given layer if it was already scanned completely, `None`
+        otherwise
+        '''
+        row = self._connection().execute(
+            'SELECT findings FROM layers WHERE layer_digest = ? AND signature_version = ?',
+            (layer_digest, self.signature_version),
+        ).fetchone()
+
+        with self._lock:
+            if row:
+                self.layer_hits += 1
+            else:
+                self.layer_misses += 1
+
+        if not row:
+            return None
+
+        return _deserialise_findings(row[0])
+
+    def add_layer(
+        self,
+        layer_digest: str,
+        findings: collections.abc.Iterable[dso.model.ClamAVMalwareFinding],
+    ):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO layers VALUES (?, ?, ?)',
+            (layer_digest, self.signature_version, _serialise_findings(findings)),
+        )
+
+    @staticmethod
+    def _hit_ratio(hits: int, misses: int) -> float | None:
+        if not (total := hits + misses):
+            return None
+
+        return hits / total
+
+    @property
+    def hit_ratio(self) -> float | None:
+        return self._hit_ratio(self.hits, self.misses)
+
+    @property
+    def layer_hit_ratio(self) -> float | None:
+        return self._hit_ratio(self.layer_hits, self.layer_misses)
+
+    def statistics(self) -> dict:
+        return {
+            'signature_version': self.signature_version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio,
+            'layer_hits': self.layer_hits,
+            'layer_misses': self.layer_misses,
+            'layer_hit_ratio': self.layer_hit_ratio,
+        }
+
+
+def _serialise_findings(
+    findings: collections.abc.Iterable[dso.model.ClamAVMalwareFinding],
+) -> str:
+    return json.dumps(
+        [dataclasses.asdict(finding) for finding in findings],
+        default=lambda o: o.isoformat(),
+    )
+
+
+def _deserialise_findings(raw: str) -> tuple[dso.model.ClamAVMalwareFinding, ...]:
+    return tuple(
+        dacite.from_dict(
+            data_class=dso.model.ClamAVMalwareFinding,
+            data=finding,
+            # restore values as reported by the scan (e.g. `freshclam_timestamp` is a string)
+            config=dacite.Config(check_types=False),
+        ) for finding in json.loads(raw)
+    )
@@ -1,6 +1,6 @@
 import collections.abc
-import dataclasses
 import datetime
+import itertools
 
 import dacite
 import falcon
@@ -8,20 +8,60 @@ import falcon.media.validators.jsonschema
 import sqlalchemy as sa
 import sqlalchemy.orm.session as ss
 
-import ci.util
 import cnudie.retrieve
 import dso.model
-import ocm
 
 import compliance_summary as cs
 import deliverydb.model as dm
 import deliverydb.util as du
 import eol
 import features
+import middleware.json_translator
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 1000
+UPSERT_BATCH_SIZE = 1000
+DELETE_BATCH_SIZE = 1000
+
+
+def iter_batches(
+    objects: collections.abc.Iterable,
+    batch_size: int,
+) -> collections.abc.Generator[list, None, None]:
+    objects_iter = iter(objects)
+    while batch := list(itertools.islice(objects_iter, batch_size)):
+        yield batch
+
+
+def iter_json_chunks(
+    objects: collections.abc.Iterable[dict],
+    ndjson: bool=False,
+    batch_size: int=STREAM_BATCH_SIZE,
+) -> collections.abc.Generator[bytes, None, None]:
+    '''
+    serialises `objects` either as one JSON array or as newline-delimited JSON, yielding one chunk
+    per `batch_size` objects
+    '''
+    dumps = middleware.json_translator.dumps
+
+    if ndjson:
+        for batch in iter_batches(objects, batch_size):
+            yield b''.join(dumps(obj) + b'\n' for obj in batch)
+        return
+
+    separator = b'['
+    for batch in iter_batches(objects, batch_size):
+        yield separator + b','.join(dumps(obj) for obj in batch)
+        separator = b','
+
+    yield b'[]' if separator == b'[' else b']'
 
 
 class ArtefactMetadata:
     required_features = (features.FeatureDeliveryDB,)
+    # `on_post_query` does not write, hence it may be served by a read-replica
+    read_only_methods = ('POST',)
 
     def __init__(
         self,
@@ -48,6 +88,10 @@ class ArtefactMetadata:
               is given, all relevant metadata will be returned. Check \n
               https://github.com/gardener/cc-utils/blob/master/dso/model.py `Datatype` model \n
               class for a list of possible values. \n
+            - stream (optional): If set to `true`, the result is streamed as JSON array while \n
+              reading it from the database, so that memory consumption does not depend on the \n
+              result size. If the client accepts `application/x-ndjson`, the result is streamed \n
+              as newline-delimited JSON instead. \n
 
         **expected body:**
 
@@ -87,67 +131,7 @@ class ArtefactMetadata:
             ) for entry in entries
         ]
 
-        def artefact_queries(artefact_ref: dso.model.ComponentArtefactId):
-            # when filtering for metadata of type `rescorings`, entries without a component
-            # name or version should also be considered a "match" (caused by different rescoring
-            # scopes)
-            none_ok = not type_filter or dso.model.Datatype.RESCORING in type_filter
-
-            yield from du.ArtefactMetadataQueries.component_queries(
-                components=[ocm.ComponentIdentity(
-                    name=artefact_ref.component_name,
-                    version=artefact_ref.component_version,
-                )],
-                none_ok=none_ok,
-                component_descriptor_lookup=self.component_descriptor_lookup,
-            )
-
-            if not artefact_ref.artefact:
-                return
-
-            if artefact_name := artefact_ref.artefact.artefact_name:
-                yield sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.artefact_name == None,
-                    ),
-                    dm.ArtefactMetaData.artefact_name == artefact_name,
-                )
-
-            if artefact_version := artefact_ref.artefact.artefact_version:
-                yield sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.artefact_version == None,
-                    ),
-                    dm.ArtefactMetaData.artefact_version == artefact_version,
-                )
-
-            if artefact_type := artefact_ref.artefact.artefact_type:
-                yield sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.artefact_type == None,
-                    ),
-                    dm.ArtefactMetaData.artefact_type == artefact_type,
-                )
-
-            if artefact_extra_id := artefact_ref.artefact.normalised_artefact_extra_id():
-                yield sa.or_(
-                    sa.and_(
-                        none_ok,
-                        dm.ArtefactMetaData.artefact_extra_id_normalised == None,
-                    ),
-                    dm.ArtefactMetaData.artefact_extra_id_normalised == artefact_extra_id,
-                )
-
-        def artefact_refs_queries(artefact_refs: list[dso.model.ComponentArtefactId]):
-            for artefact_ref in artefact_refs:
-                yield sa.and_(
-                    artefact_queries(artefact_ref=artefact_ref),
-                )
-
-        findings_query = session.query(dm.ArtefactMetaData)
+        findings_query = session.query(*du.artefact_metadata_wire_columns)
 
         if type_filter:
             findings_query = findings_query.filter(
@@ -162,61 +146,63 @@ class ArtefactMetadata:
             )
 
         if artefact_refs:
+            # when filtering for metadata of type `rescorings`, entries without a component
+            # name or version should also be considered a "match" (caused by different rescoring
+            # scopes)
+            none_ok = not type_filter or dso.model.Datatype.RESCORING in type_filter
+
             findings_query = findings_query.filter(
-                sa.or_(
-                    artefact_refs_queries(artefact_refs=artefact_refs),
+                du.ArtefactMetadataQueries.artefact_refs_query(
+                    artefact_refs=artefact_refs,
+                    none_ok=none_ok,
+                    component_descriptor_lookup=self.component_descriptor_lookup,
                 ),
             )
 
-        findings_raw = findings_query.all()
-        findings = [
-            du.db_artefact_metadata_to_dso(raw)
-            for raw in findings_raw
-        ]
-
-        def iter_findings(
-            findings: list[dso.model.ArtefactMetadata],
-            artefact_metadata_cfg_by_type: dict[str, cs.ArtefactMetadataCfg],
-        ) -> collections.abc.Generator[dict, None, None]:
-            def result_dict(
-                finding: dso.model.ArtefactMetadata,
-                meta: dict=None,
-            ) -> dict:
-                finding_dict = dataclasses.asdict(
-                    obj=finding,
-                    dict_factory=ci.util.dict_to_json_factory,
-                )
-
-                if meta:
-                    finding_dict['meta'] = meta
-
-                return finding_dict
-
-            for finding in findings:
-                cfg = artefact_metadata_cfg_by_type.get(finding.meta.type)
-
-                if not cfg:
-                    yield result_dict(finding)
-                    continue
+        ndjson = req.client_accepts(NDJSON_MEDIA_TYPE) and not req.client_accepts_json
+        if ndjson or req.get_param_as_bool('stream', default=False):
+            resp.content_type = NDJSON_MEDIA_TYPE if ndjson else falcon.MEDIA_JSON
+            resp.stream = iter_json_chunks(
+                objects=(
+                    self._artefact_metadata_dict(raw)
+                    for raw in findings_query.yield_per(STREAM_BATCH_SIZE)
+                ),
+                ndjson=ndjson,
+                batch_size=STREAM_BATCH_SIZE,
+            )
+            return
 
-                severity = cs.severity_for_finding(
-                    finding=finding,
-                    artefact_metadata_cfg=cfg,
-                    eol_client=self.eol_client,
-                )
-                if not severity:
-                    yield result_dict(finding)
-                    continue
+        resp.media = [
+            self._artefact_metadata_dict(raw)
+            for raw in findings_query
+        ]
 
-                yield result_dict(
-                    finding=finding,
-                    meta=dict(**dataclasses.asdict(finding.meta), severity=severity),
-                )
+    def _artefact_metadata_dict(
+        self,
+        artefact_metadata: dm.ArtefactMetaData | sa.Row,
+    ) -> dict:
+        '''
+        returns the wire representation of `artefact_metadata` (incl. its severity, if it can be
+        determined), only hydrating it to a `dso.model.ArtefactMetadata` if required to determine
+        its severity
+        '''
+        artefact_metadata_dict = du.db_artefact_metadata_to_dict(artefact_metadata)
+
+        if not (cfg := self.artefact_metadata_cfg_by_type.get(artefact_metadata.type)):
+            return artefact_metadata_dict
+
+        severity = cs.severity_for_finding(
+            finding=dso.model.ArtefactMetadata.from_dict(raw=artefact_metadata_dict),
+            artefact_metadata_cfg=cfg,
+            eol_client=self.eol_client,
+        )
+        if severity:
+            artefact_metadata_dict['meta'] = dict(
+                **artefact_metadata_dict['meta'],
+                severity=severity,
+            )
 
-        resp.media = list(iter_findings(
-            findings=findings,
-            artefact_metadata_cfg_by_type=self.artefact_metadata_cfg_by_type,
-        ))
+        return artefact_metadata_dict
 
     def on_put(self, req: falcon.Request, resp: falcon.Response):
         '''
@@ -244,6 +230,12 @@ class ArtefactMetadata:
                     - datasource: <str> # one of dso.model/Datasource \n
                 - data: <object> # schema depends on meta.type \n
                 - discovery_date: <str of format YYYY-MM-DD> \n
+
+        **response:**
+
+            created: <int> # number of created entries \n
+            updated: <int> # number of existing entries with updated payload \n
+            unchanged: <int> # number of existing entries with unchanged payload \n
         '''
         body = req.context.media
         entries: list[dict] = body.get('entries')
@@ -254,99 +246,138 @@ class ArtefactMetadata:
 
         session: ss.Session = req.context.db_session
 
-        artefact_metadata = [
-            dso.model.ArtefactMetadata.from_dict(_fill_default_values(entry))
-            for entry in entries
-        ]
+        # de-duplicate supplied entries by their identity, subsequent entries with the same
+        # identity update the payload of the first one
+        metadata_entries: dict[tuple, dm.ArtefactMetaData] = {}
+        for entry in entries:
+            metadata_entry = du.to_db_artefact_metadata(
+                artefact_metadata=dso.model.ArtefactMetadata.from_dict(_fill_default_values(entry)),
+            )
+            identity = du.artefact_metadata_identity(metadata_entry)
 
-        # determine all artefact/type combinations to query them at once afterwards
-        artefacts = dict()
-        for artefact_metadatum in artefact_metadata:
-            key = (artefact_metadatum.artefact, artefact_metadatum.meta.type)
-            if key not in artefacts:
-                artefacts[key] = artefact_metadatum
+            if not (first_metadata_entry := metadata_entries.get(identity)):
+                metadata_entries[identity] = metadata_entry
+                continue
 
-        artefacts = artefacts.values()
+            first_metadata_entry.data = metadata_entry.data
+            first_metadata_entry.meta = dict(
+                first_metadata_entry.meta,
+                last_update=metadata_entry.meta['last_update'],
+            )
 
-        def artefact_queries(artefacts: collections.abc.Iterable[dso.model.ArtefactMetadata]):
-            for artefact in artefacts:
-                yield du.ArtefactMetadataFilters.by_name_and_type(
+        # determine all artefact/type combinations to query them at once afterwards
+        artefacts = {
+            (
+                metadata_entry.component_name,
+                metadata_entry.artefact_name,
+                metadata_entry.type,
+                metadata_entry.datasource,
+            )
+            for metadata_entry in metadata_entries.values()
+        }
+
+        existing_entries = session.query(
+            dm.ArtefactMetaData.id,
+            dm.ArtefactMetaData.type,
+            dm.ArtefactMetaData.component_name,
+            dm.ArtefactMetaData.component_version,
+            dm.ArtefactMetaData.artefact_kind,
+            dm.ArtefactMetaData.artefact_name,
+            dm.ArtefactMetaData.artefact_version,
+            dm.ArtefactMetaData.artefact_type,
+            dm.ArtefactMetaData.datasource,
+            dm.ArtefactMetaData.data_key,
+            dm.ArtefactMetaData.meta,
+            dm.ArtefactMetaData.data,
+            dm.ArtefactMetaData.discovery_date,
+        ).filter(
+            sa.or_(*(
+                du.ArtefactMetadataFilters.by_name_and_type(
                     artefact_metadata=dm.ArtefactMetaData(
-                        component_name=artefact.artefact.component_name,
-                        artefact_name=artefact.artefact.artefact.artefact_name,
-                        type=artefact.meta.type,
-                        datasource=artefact.meta.datasource,
+                        component_name=component_name,
+                        artefact_name=artefact_name,
+                        type=type,
+                        datasource=datasource,
                     ),
-                )
-
-        existing_entries = session.query(dm.ArtefactMetaData).filter(
-            sa.or_(artefact_queries(artefacts=artefacts)),
-        ).all()
-
-        created_artefacts: list[dm.ArtefactMetaData] = []
+                ) for component_name, artefact_name, type, datasource in artefacts
+            )),
+        ).yield_per(UPSERT_BATCH_SIZE)
+
+        # hash existing entries by their identity to find matching entries in constant time
+        existing_entries_by_identity = {}
+        discovery_dates = {}
+        for existing_entry in existing_entries:
+            existing_entries_by_identity.setdefault(
+                du.artefact_metadata_identity(existing_entry),
+                existing_entry,
+            )
 
-        try:
-            for artefact_metadatum in artefact_metadata:
-                metadata_entry = du.to_db_artefact_metadata(
-                    artefact_metadata=artefact_metadatum,
+            if (
+                existing_entry.discovery_date
+                and (key := discovery_date_key(existing_entry))
+            ):
+                discovery_dates.setdefault(key, existing_entry.discovery_date)
+
+        created_entries: list[dict] = []
+        updated_entries: list[dict] = []
+        unchanged_count = 0
+
+        for identity, metadata_entry in metadata_entries.items():
+            if existing_entry := existing_entries_by_identity.get(identity):
+                # found database entry that matches the supplied metadata entry -> update payload
+                meta = dict(
+                    existing_entry.meta,
+                    last_update=metadata_entry.meta['last_update'],
                 )
 
-                reusable_discovery_date = None
-                for existing_entry in existing_entries + created_artefacts:
-                    if (
-                        existing_entry.type != metadata_entry.type
-                        or existing_entry.component_name != metadata_entry.component_name
-                        or existing_entry.artefact_kind != metadata_entry.artefact_kind
-                        or existing_entry.artefact_name != metadata_entry.artefact_name
-                        or existing_entry.artefact_type != metadata_entry.artefact_type
-                    ):
-                        continue
-
-                    if not reusable_discovery_date:
-                        reusable_discovery_date = reuse_discovery_date_if_possible(
-                            old_metadata=existing_entry,
-                            new_metadata=metadata_entry,
-                        )
-
-                    if (
-                        existing_entry.component_version != metadata_entry.component_version
-                        or existing_entry.artefact_version != metadata_entry.artefact_version
-                        # do not include extra id (yet) because there is only one entry for
-                        # all ocm resources with different extra ids at the moment
-                        # TODO include extra id as soon as there is one entry for each extra id
-                        # or existing_entry.artefact_extra_id_normalised
-                        #     != metadata_entry.artefact_extra_id_normalised
-                        or existing_entry.data_key != metadata_entry.data_key
-                    ):
-                        continue
-
-                    # found database entry that matches the supplied metadata entry
-                    break
-                else:
-                    # did not find existing database entry that matches the supplied metadata entry
-                    # -> create new entry (and re-use discovery date if possible)
-                    if reusable_discovery_date:
-                        metadata_entry.discovery_date = reusable_discovery_date
-
-                    session.add(metadata_entry)
-                    created_artefacts.append(metadata_entry)
+                if existing_entry.data == metadata_entry.data and existing_entry.meta == meta:
+                    unchanged_count += 1
                     continue
 
-                # update actual payload
-                existing_entry.data = metadata_entry.data
+                updated_entries.append({
+                    'id': existing_entry.id,
+                    'data': metadata_entry.data,
+                    'meta': meta,
+                })
+                continue
+
+            # did not find existing database entry that matches the supplied metadata entry
+            # -> create new entry (and re-use discovery date if possible)
+            if key := discovery_date_key(metadata_entry):
+                if reusable_discovery_date := discovery_dates.get(key):
+                    metadata_entry.discovery_date = reusable_discovery_date
+                elif metadata_entry.discovery_date:
+                    discovery_dates[key] = metadata_entry.discovery_date
+
+            created_entries.append({
+                column.key: getattr(metadata_entry, column.key)
+                for column in dm.ArtefactMetaData.__table__.columns
+                if column.key != 'id'
+            })
+
+        upsert_statement = du.upsert_artefact_metadata_statement(
+            dialect_name=session.get_bind().dialect.name,
+        )
 
-                # create new dict instead of patching it, otherwise it won't be updated in the db
-                del existing_entry.meta['last_update']
-                existing_entry.meta = dict(
-                    **existing_entry.meta,
-                    last_update=metadata_entry.meta['last_update'],
-                )
+        try:
+            for batch in iter_batches(updated_entries, UPSERT_BATCH_SIZE):
+                # bulk update by primary key
+                session.execute(sa.update(dm.ArtefactMetaData), batch)
+
+            for batch in iter_batches(created_entries, UPSERT_BATCH_SIZE):
+                session.execute(upsert_statement, batch)
 
             session.commit()
         except:
             session.rollback()
             raise
 
+        resp.media = {
+            'created': len(created_entries),
+            'updated': len(updated_entries),
+            'unchanged': unchanged_count,
+        }
+
         resp.status = falcon.HTTP_CREATED
 
     def on_delete(self, req: falcon.Request, resp: falcon.Response):
@@ -369,66 +400,75 @@ class ArtefactMetadata:
                     - datasource: <str> \n
                 - data: <object> # schema depends on meta.type \n
                 - discovery_date: <str of format YYYY-MM-DD> \n
+
+        **response:**
+
+            deleted: <int> # number of deleted entries \n
         '''
         body = req.context.media
         entries: list[dict] = body.get('entries')
 
         session: ss.Session = req.context.db_session
 
-        try:
-            for entry in entries:
-                entry = _fill_default_values(entry)
+        artefact_metadata = [
+            du.to_db_artefact_metadata(
+                artefact_metadata=dso.model.ArtefactMetadata.from_dict(_fill_default_values(entry)),
+            ) for entry in entries
+        ]
 
-                artefact_metadata = du.to_db_artefact_metadata(
-                    artefact_metadata=dso.model.ArtefactMetadata.from_dict(entry),
-                )
+        deleted_count = 0
 
-                session.query(dm.ArtefactMetaData).filter(
-                    du.ArtefactMetadataFilters.by_single_scan_result(artefact_metadata)
-                ).delete()
+        try:
+            # delete all entries within one transaction, chunked to limit the statement size
+            for batch in iter_batches(artefact_metadata, DELETE_BATCH_SIZE):
+                deleted_count += session.execute(
+                    sa.delete(dm.ArtefactMetaData).where(
+                        du.ArtefactMetadataFilters.by_single_scan_results(batch),
+                    ),
+                    execution_options={'synchronize_session': False},
+                ).rowcount
 
-                session.commit()
+            session.commit()
         except:
             session.rollback()
             raise
 
-        resp.status = falcon.HTTP_NO_CONTENT
-
-
-def reuse_discovery_date_if_possible(
-    old_metadata: dm.ArtefactMetaData,
-    new_metadata: dm.ArtefactMetaData,
-) -> datetime.date | None:
-    if new_metadata.type == dso.model.Datatype.VULNERABILITY:
-        if (
-            new_metadata.data.get('package_name') == old_metadata.data.get('package_name')
-            and new_metadata.data.get('cve') == old_metadata.data.get('cve')
-        ):
-            # found the same cve in existing entry, independent of the component-/
-            # resource-/package-version, so we must re-use its discovery date
-            return old_metadata.discovery_date
-
-    elif new_metadata.type == dso.model.Datatype.LICENSE:
-        if (
-            new_metadata.data.get('package_name') == old_metadata.data.get('package_name')
-            and new_metadata.data.get('license').get('name')
-                == old_metadata.data.get('license').get('name')
-        ):
-            # found the same license in existing entry, independent of the component-/
-            # resource-/package-version, so we must re-use its discovery date
-            return old_metadata.discovery_date
-
-    elif new_metadata.type == dso.model.Datatype.DIKI_FINDING:
-        if (
-            new_metadata.data.get('provider_id') == old_metadata.data.get('provider_id')
-            and new_metadata.data.get('ruleset_id') == old_metadata.data.get('ruleset_id')
-            and new_metadata.data.get('rule_id') == old_metadata.data.get('rule_id')
-        ):
-            # found the same finding in existing entry, independent of the component-/
-            # resource-/ruleset-version, so we must re-use its discovery date
-            return old_metadata.discovery_date
-
-    return None
+        resp.media = {
+            'deleted': deleted_count,
+        }
+
+
+def discovery_date_key(
+    artefact_metadata: dm.ArtefactMetaData | sa.Row,
+) -> tuple | None:
+    '''
+    returns a key which is shared by all entries of the same finding of an artefact (independent of
+    the component-/resource-/package-version), newly created entries re-use the discovery date of
+    existing entries with the same key; returns `None` if discovery dates are not re-used for the
+    type of `artefact_metadata`
+    '''
+    data = artefact_metadata.data
+
+    if artefact_metadata.type == dso.model.Datatype.VULNERABILITY:
+        finding_id = (data.get('package_name'), data.get('cve'))
+
+    elif artefact_metadata.type == dso.model.Datatype.LICENSE:
+        finding_id = (data.get('package_name'), data.get('license').get('name'))
+
+    elif artefact_metadata.type == dso.model.Datatype.DIKI_FINDING:
+        finding_id = (data.get('provider_id'), data.get('ruleset_id'), data.get('rule_id'))
+
+    else:
+        return None
+
+    return (
+        artefact_metadata.type,
+        artefact_metadata.component_name,
+        artefact_metadata.artefact_kind,
+        artefact_metadata.artefact_name,
+        artefact_metadata.artefact_type,
+        *finding_id,
+    )
 
 
 def _fill_default_values(
@@ -1,7 +1,37 @@
+import collections.abc
+import functools
+
 import falcon
+import sqlalchemy as sa
+import sqlalchemy.orm
 
 import deliverydb
 import deliverydb.model as dm
+import deliverydb.replicas
+
+
+class _ClosingStream:
+    '''
+    Wraps a response stream and invokes `close_callback` once the WSGI server closes the stream
+    (i.e. after the response body was sent or if sending it was aborted).
+    '''
+    def __init__(
+        self,
+        stream: collections.abc.Iterable[bytes],
+        close_callback: collections.abc.Callable[[], None],
+    ):
+        self.stream = stream
+        self.close_callback = close_callback
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def close(self):
+        try:
+            if hasattr(self.stream, 'close'):
+                self.stream.close()
+        finally:
+            self.close_callback()
 
 
 class DBSessionLifecycle:
@@ -9,24 +39,41 @@ class DBSessionLifecycle:
     Used to centrally manage database-session lifecycle.
 
     Create session object stored in request-context after request routing, available for all routes.
-    Close session object at response post-processing.
+    The session is only created once it is actually used (i.e. requests to routes which do not use
+    the database do not create a session). Close session object at response post-processing.
     Optionally test database session.
 
     Using database-session from request-context is the preferred way.
     Consumers must still commit / rollback transactions.
+
+    If read-replicas are configured, sessions of read-only requests are routed to one of them (see
+    `deliverydb.replicas`). Requests are considered read-only if their method is either in
+    `READ_ONLY_METHODS` or in the `read_only_methods` attribute of the resource (i.e. resources
+    declare other methods as read-only if the respective responders do not write, e.g. queries
+    using `POST` because of their request body).
     '''
+    READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
     def __init__(
         self,
         db_url: str,
         verify_db_session: bool = True,
+        pool_cfg: deliverydb.PoolCfg=None,
+        replica_cfg: deliverydb.replicas.ReplicaCfg=None,
     ):
         self.db_url = db_url
+        self.pool_cfg = pool_cfg
+        self.replica_router = deliverydb.replicas.ReplicaRouter(
+            primary_url=db_url,
+            replica_cfg=replica_cfg or deliverydb.replicas.ReplicaCfg(),
+            pool_cfg=pool_cfg,
+        )
 
         def test_db_session():
-            session = deliverydb.sqlalchemy_session(self.db_url)
+            session = deliverydb.sqlalchemy_session(self.db_url, self.pool_cfg)
             # execute query to validate monkey-patched attributes
             session.query(dm.ArtefactMetaData).first()
+            session.close()
 
         if verify_db_session:
             test_db_session()
@@ -38,7 +85,19 @@ class DBSessionLifecycle:
         resource,
         params,
     ):
-        req.context.db_session = deliverydb.sqlalchemy_session(self.db_url)
+        read_only = (
+            req.method in self.READ_ONLY_METHODS
+            or req.method in getattr(resource, 'read_only_methods', ())
+        )
+
+        # proxy which creates the actual session upon first usage, scoped to this request
+        req.context.db_session = sa.orm.scoped_session(
+            session_factory=functools.partial(
+                self.replica_router.session,
+                read_only=read_only,
+            ),
+            scopefunc=lambda: req,
+        )
 
     def process_response(
         self,
@@ -54,4 +113,14 @@ class DBSessionLifecycle:
         if not hasattr(req.context, 'db_session'):
             return
 
-        req.context.db_session.close()
+        if resp.stream is not None and not hasattr(resp.stream, 'read'):
+            # response body might be generated lazily using the database-session (e.g. from a
+            # server-side cursor), hence session must only be closed once the body was sent
+            resp.stream = _ClosingStream(
+                stream=resp.stream,
+                close_callback=req.context.db_session.remove,
+            )
+            return
+
+        # closes the session (if it was created)
+        req.context.db_session.remove()
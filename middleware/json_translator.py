@@ -1,8 +1,17 @@
 import enum
 import dataclasses
 import datetime
+import functools
 import json
 
+import falcon.media
+
+try:
+    import orjson
+except ImportError:
+    # optional, falls back to standard library's `json`
+    orjson = None
+
 
 def json_serializer(obj):
     if isinstance(obj, enum.Enum):
@@ -13,3 +22,37 @@ def json_serializer(obj):
         return obj.isoformat()
 
     return json.JSONEncoder().default(obj)
+
+
+def dumps(obj) -> bytes:
+    '''
+    serialises `obj` to JSON, using `orjson` if available (which natively serialises dataclasses,
+    enums and datetimes in the same way as `json_serializer`)
+    '''
+    if orjson:
+        return orjson.dumps(
+            obj,
+            default=json_serializer,
+            option=orjson.OPT_NON_STR_KEYS,
+        )
+
+    return json.dumps(obj, default=json_serializer).encode('utf-8')
+
+
+def loads(data: bytes | str):
+    if orjson:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def json_handler() -> falcon.media.JSONHandler:
+    if orjson:
+        return falcon.media.JSONHandler(
+            dumps=dumps,
+            loads=loads,
+        )
+
+    return falcon.media.JSONHandler(
+        dumps=functools.partial(json.dumps, default=json_serializer),
+    )
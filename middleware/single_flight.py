@@ -0,0 +1,151 @@
+import dataclasses
+import hashlib
+import logging
+import threading
+import time
+
+import cachetools
+import falcon
+
+import util
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class _Response:
+    status: str
+    headers: dict[str, str]
+    body: bytes
+    etag: str
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: _Response | None = None
+
+
+class SingleFlight:
+    '''
+    Used to collapse concurrent identical `GET` requests into a single computation. Resources opt in
+    by setting the `single_flight` attribute. While a request is processed, identical requests
+    (i.e. same path and query parameters) wait for its response instead of invoking the responder
+    themselves. If the computation fails, waiting requests invoke the responder on their own.
+
+    Resources may additionally set `response_cache_ttl_seconds` to keep successful responses for
+    the given time, serving them to subsequent identical requests as well.
+
+    Successful responses carry an ETag derived from the response body. If the request contains a
+    matching `If-None-Match` header, the response body is omitted (304).
+
+    Must be the last middleware which processes resources, so that requests rejected by preceding
+    middlewares (e.g. authentication) do not receive the response.
+    '''
+    def __init__(
+        self,
+        wait_timeout_seconds: float=300,
+        response_cache_maxsize: int=256,
+    ):
+        self.wait_timeout_seconds = wait_timeout_seconds
+
+        self._flights: dict[tuple, _Flight] = {}
+        # key -> (expiry time, response)
+        self._response_cache = cachetools.LRUCache(maxsize=response_cache_maxsize)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(req: falcon.Request) -> tuple:
+        return (
+            req.path,
+            tuple(sorted((name, str(value)) for name, value in req.params.items())),
+        )
+
+    @staticmethod
+    def _respond(
+        req: falcon.Request,
+        resp: falcon.Response,
+        response: _Response,
+    ):
+        if util.is_not_modified(req, resp, response.etag):
+            return
+
+        resp.status = response.status
+        resp.set_headers(response.headers)
+        resp.text = None
+        resp.media = None
+        resp.data = response.body
+
+    def process_resource(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource,
+        params,
+    ):
+        if req.method != 'GET' or not getattr(resource, 'single_flight', False):
+            return
+
+        key = self._key(req)
+
+        with self._lock:
+            if (cached := self._response_cache.get(key)) and cached[0] > time.monotonic():
+                response = cached[1]
+                flight = None
+
+            elif not (flight := self._flights.get(key)):
+                # this request computes the response
+                self._flights[key] = flight = _Flight()
+                req.context.single_flight = (key, flight)
+                return
+
+        if flight:
+            if not flight.done.wait(timeout=self.wait_timeout_seconds):
+                logger.warning(f'timed out waiting for concurrent request to {req.relative_uri}')
+                return
+
+            if not (response := flight.response):
+                # concurrent request failed, hence try on our own
+                return
+
+        self._respond(req, resp, response)
+        resp.complete = True
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource,
+        req_succeeded: bool,
+    ):
+        if not (single_flight := req.context.get('single_flight')):
+            return
+
+        key, flight = single_flight
+
+        try:
+            if (
+                not req_succeeded
+                or falcon.http_status_to_code(resp.status) != 200
+                or resp.stream is not None
+            ):
+                return
+
+            body = resp.render_body() or b''
+            flight.response = response = _Response(
+                status=resp.status,
+                headers=resp.headers,
+                body=body,
+                etag=hashlib.sha1(body).hexdigest(),
+            )
+
+            if ttl_seconds := getattr(resource, 'response_cache_ttl_seconds', 0):
+                with self._lock:
+                    self._response_cache[key] = (time.monotonic() + ttl_seconds, response)
+
+            self._respond(req, resp, response)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
@@ -168,7 +168,7 @@ def _find_artefact_metadata(
     artefact: dso.model.ComponentArtefactId,
     type_filter: list[str]=[],
 ) -> tuple[dso.model.ArtefactMetadata]:
-    query = session.query(dm.ArtefactMetaData).filter(
+    query = session.query(*du.artefact_metadata_wire_columns).filter(
         sa.and_(
             dm.ArtefactMetaData.component_name == artefact.component_name,
             sa.or_(
@@ -199,7 +199,7 @@ def _find_rescorings(
     artefact: dso.model.ComponentArtefactId,
     type_filter: list[str]=[],
 ) -> tuple[dso.model.ArtefactMetadata]:
-    rescorings_query = session.query(dm.ArtefactMetaData).filter(
+    rescorings_query = session.query(*du.artefact_metadata_wire_columns).filter(
         sa.and_(
             dm.ArtefactMetaData.type == dso.model.Datatype.RESCORING,
             sa.or_(
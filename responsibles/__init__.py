@@ -10,6 +10,7 @@ import github.codeowners
 import ocm
 
 import ctx_util
+import github_scheduler
 import lookups
 import responsibles.github_statistics as rg
 import responsibles.labels
@@ -272,13 +273,13 @@ def user_identifiers_from_responsible(
             cfg_factory = ctx_util.cfg_factory()
 
             import ccc.github
-            github_api = ccc.github.github_api(
+            github_api = github_scheduler.scheduler.instrument(ccc.github.github_api(
                 github_cfg=ccc.github.github_cfg_for_repo_url(
                     repo_url=ci.util.urljoin(gh_hostname, org_name),
                     cfg_factory=cfg_factory,
                 ),
                 cfg_factory=cfg_factory,
-            )
+            ))
 
             team = github.codeowners.Team(responsible.teamname)
 
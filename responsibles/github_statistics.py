@@ -21,6 +21,7 @@ import ccc.github
 import ci.util
 
 import ctx_util
+import github_scheduler
 import paths
 import responsibles.user_model
 import responsibles
@@ -413,10 +414,10 @@ def _negative_list() -> list[str]:
 def repo_contributor_statistics(
     repo_url: str,
 ) -> list | None:
-    gh_api = ccc.github.github_api(
+    gh_api = github_scheduler.scheduler.instrument(ccc.github.github_api(
         repo_url=repo_url,
         cfg_factory=ctx_util.cfg_factory(),
-    )
+    ))
     repo = _repo_from_repo_url(
         gh_api=gh_api,
         repo_url=repo_url,
@@ -434,7 +435,9 @@ def user_identities(
     repo_url: str,
     heuristic_parameters: ResponsiblesDetectionHeuristicsParameters,
 ) -> tuple[responsibles.user_model.UserIdentity]:
-    gh_api = ccc.github.github_api(repo_url=repo_url, cfg_factory=ctx_util.cfg_factory())
+    gh_api = github_scheduler.scheduler.instrument(
+        ccc.github.github_api(repo_url=repo_url, cfg_factory=ctx_util.cfg_factory()),
+    )
     repo = _repo_from_repo_url(
         gh_api=gh_api,
         repo_url=repo_url,
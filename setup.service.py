@@ -25,8 +25,10 @@ def modules():
         'app',
         'artefacts',
         'compliance_tests',
+        'component_graph',
         'components',
         'dora',
+        'dora_ledger',
         'eol',
         'metadata',
         'metric',
@@ -36,6 +38,7 @@ def modules():
         'special_component',
         'sprint',
         'util',
+        'version_index',
         'yp',
     ]
 
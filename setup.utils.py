@@ -24,10 +24,12 @@ def modules():
         'config',
         'config_filter',
         'ctx_util',
+        'github_scheduler',
         'lookups',
         'ocm_util',
         'paths',
         'rescoring_util',
+        'sqlite_util',
     ]
 
 
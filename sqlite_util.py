@@ -0,0 +1,58 @@
+'''
+SQLite databases which are stored on disk (e.g. caches), hence they survive restarts and are shared
+among all processes using the same path (e.g. uWSGI workers).
+'''
+import collections.abc
+import os
+import sqlite3
+import threading
+
+
+class SQLiteDatabase:
+    '''
+    maintains connections to the SQLite database at `path` per process and thread, as SQLite
+    connections must neither be shared among threads nor be inherited by forked processes.
+
+    Connections are in autocommit mode (i.e. transactions must be started explicitly) and use
+    write-ahead logging, so that readers do not block writers.
+
+    @param ddl:
+        either SQL statements or a callable which is passed each new connection, used to create the
+        schema (must hence be idempotent)
+    @param pragmas:
+        additional pragmas set for each new connection, e.g. `synchronous=NORMAL`
+    '''
+    def __init__(
+        self,
+        path: str,
+        ddl: str | collections.abc.Callable[[sqlite3.Connection], None],
+        pragmas: collections.abc.Iterable[str]=(),
+    ):
+        self.path = path
+        self.ddl = ddl
+        self.pragmas = tuple(pragmas)
+
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(name=os.path.dirname(self.path), exist_ok=True)
+
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        for pragma in self.pragmas:
+            connection.execute(f'PRAGMA {pragma}')
+
+        if callable(self.ddl):
+            self.ddl(connection)
+        else:
+            connection.executescript(self.ddl)
+
+        return connection
+
+    def connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.connection = self._connect()
+            self._local.pid = pid
+
+        return self._local.connection
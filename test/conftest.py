@@ -0,0 +1,14 @@
+import pytest
+
+import component_graph
+
+
+@pytest.fixture(autouse=True)
+def graph_cache(tmp_path, monkeypatch) -> component_graph.ComponentGraphCache:
+    # resolved component graphs must neither be shared among tests nor be persisted
+    graph_cache = component_graph.ComponentGraphCache(
+        cache_dir=str(tmp_path / 'component-graphs'),
+    )
+    monkeypatch.setattr(component_graph, 'graph_cache', graph_cache)
+
+    return graph_cache
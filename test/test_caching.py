@@ -0,0 +1,189 @@
+import hashlib
+import os
+import pickle
+import time
+
+import pytest
+
+import caching
+
+
+MiB = 1024 * 1024
+
+
+def _value(size_mib: float) -> bytes:
+    # pickling adds a few bytes of overhead, hence stay slightly below the requested size
+    return b'x' * (int(size_mib * MiB) - 64)
+
+
+def _item_files(cache_dir) -> set[str]:
+    return {
+        filename for filename in os.listdir(cache_dir)
+        if not filename.startswith('.')
+    }
+
+
+def test_filesystem_cache(tmp_path):
+    cache = caching.FilesystemCache()
+    filepath = os.path.join(tmp_path, 'item')
+
+    with pytest.raises(KeyError):
+        cache.__get_item__(filepath)
+
+    cache.__set_item__(filepath, {'foo': 'bar'})
+
+    assert cache.__get_item__(filepath) == {'foo': 'bar'}
+    # no temporary files must remain after writing
+    assert os.listdir(tmp_path) == ['item']
+
+
+def test_lfu_eviction(tmp_path):
+    cache = caching.LFUFilesystemCache(max_total_size_mib=3)
+
+    for name in ('a', 'b', 'c'):
+        cache.__set_item__(os.path.join(tmp_path, name), _value(1))
+
+    for _ in range(2):
+        cache.__get_item__(os.path.join(tmp_path, 'a'))
+    cache.__get_item__(os.path.join(tmp_path, 'c'))
+
+    cache.__set_item__(os.path.join(tmp_path, 'd'), _value(1))
+
+    # `b` is least frequently used
+    assert _item_files(tmp_path) == {'a', 'c', 'd'}
+    with pytest.raises(KeyError):
+        cache.__get_item__(os.path.join(tmp_path, 'b'))
+
+    metrics = cache.metrics()
+    assert metrics['hits'] == 3
+    assert metrics['misses'] == 1
+    assert metrics['evictions'] == 1
+    assert metrics['items_count'] == 3
+    assert metrics['total_size_bytes'] <= 3 * MiB
+
+    with pytest.raises(ValueError):
+        cache.__set_item__(os.path.join(tmp_path, 'e'), _value(4))
+
+
+def test_lfu_replace_item(tmp_path):
+    cache = caching.LFUFilesystemCache(max_total_size_mib=2)
+    filepath = os.path.join(tmp_path, 'a')
+
+    cache.__set_item__(os.path.join(tmp_path, 'b'), _value(1))
+    cache.__set_item__(filepath, _value(1))
+    # the replaced item must not account for the required space
+    cache.__set_item__(filepath, _value(1))
+
+    assert _item_files(tmp_path) == {'a', 'b'}
+    assert cache.metrics()['evictions'] == 0
+
+
+def test_index_survives_restart(tmp_path):
+    cache = caching.LFUFilesystemCache(max_total_size_mib=2)
+    cache.__set_item__(os.path.join(tmp_path, 'a'), _value(1))
+    cache.__set_item__(os.path.join(tmp_path, 'b'), _value(1))
+    cache.__get_item__(os.path.join(tmp_path, 'a'))
+
+    # a new instance (e.g. after a restart or in another process) shares the persisted index
+    cache = caching.LFUFilesystemCache(max_total_size_mib=2)
+    assert cache.metrics()['items_count'] == 0 # index is opened lazily
+    cache.__set_item__(os.path.join(tmp_path, 'c'), _value(1))
+
+    assert _item_files(tmp_path) == {'a', 'c'}
+
+
+def test_adopt_existing_items(tmp_path):
+    legacy_cache = caching.FilesystemCache()
+    for name in ('a', 'b'):
+        legacy_cache.__set_item__(os.path.join(tmp_path, name), _value(1))
+
+    cache = caching.LFUFilesystemCache(max_total_size_mib=2)
+    assert cache.__get_item__(os.path.join(tmp_path, 'a')) == _value(1)
+
+    cache.__set_item__(os.path.join(tmp_path, 'c'), _value(1))
+
+    assert _item_files(tmp_path) == {'a', 'c'}
+
+
+def test_unreadable_item(tmp_path):
+    cache = caching.LFUFilesystemCache(max_total_size_mib=1)
+    filepath = os.path.join(tmp_path, 'a')
+    cache.__set_item__(filepath, 'foo')
+
+    with open(filepath, 'wb') as f:
+        f.write(b'corrupted')
+
+    with pytest.raises(KeyError):
+        cache.__get_item__(filepath)
+    assert not _item_files(tmp_path)
+    assert cache.metrics()['items_count'] == 0
+
+
+def test_ttl_expiration(tmp_path, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now)
+
+    cache = caching.TTLFilesystemCache(ttl=60, max_total_size_mib=2)
+    cache.__set_item__(os.path.join(tmp_path, 'a'), _value(1))
+    cache.__set_item__(os.path.join(tmp_path, 'b'), _value(0.5))
+    for _ in range(2):
+        cache.__get_item__(os.path.join(tmp_path, 'a'))
+
+    now += 30
+    cache.__set_item__(os.path.join(tmp_path, 'c'), _value(0.5))
+
+    now += 45
+    # `a` and `b` are expired, `a` is evicted regardless of its usage
+    cache.__set_item__(os.path.join(tmp_path, 'd'), _value(1))
+    assert _item_files(tmp_path) == {'c', 'd'}
+
+    now += 30
+    with pytest.raises(KeyError):
+        cache.__get_item__(os.path.join(tmp_path, 'c'))
+    assert _item_files(tmp_path) == {'d'}
+
+    metrics = cache.metrics()
+    assert metrics['expirations'] == 3
+    assert metrics['evictions'] == 0
+
+
+def test_cached(tmp_path):
+    calls = []
+
+    @caching.cached(
+        cache=caching.LFUFilesystemCache(max_total_size_mib=1),
+        cache_dir=str(tmp_path),
+    )
+    def square(x: int) -> int:
+        calls.append(x)
+        return x * x
+
+    assert square(3) == 9
+    assert square(3) == 9
+    assert calls == [3]
+
+    # each decorated function uses its own directory, hence size limits do not interfere
+    assert os.listdir(tmp_path) == [f'{__name__}.test_cached.<locals>.square']
+    assert square.cache.metrics()['hits'] == 1
+
+
+def test_cached_purges_legacy_items(tmp_path):
+    # items stored directly in the cache directory by previous versions
+    legacy_filename = hashlib.sha1(b'legacy').hexdigest()
+    with open(os.path.join(tmp_path, legacy_filename), 'wb') as f:
+        f.write(pickle.dumps('legacy'))
+    with open(os.path.join(tmp_path, 'unrelated.txt'), 'w') as f:
+        f.write('unrelated')
+
+    @caching.cached(
+        cache=caching.LFUFilesystemCache(max_total_size_mib=1),
+        cache_dir=str(tmp_path),
+    )
+    def square(x: int) -> int:
+        return x * x
+
+    assert square(3) == 9
+    assert sorted(os.listdir(tmp_path)) == [
+        f'{__name__}.test_cached_purges_legacy_items.<locals>.square',
+        'unrelated.txt',
+    ]
@@ -0,0 +1,205 @@
+'''
+micro-benchmark comparing the previous clamd usage (one connection and reader thread per scanned
+file) with the pooled `malware.clamav.ClamdClient` against a local fake clamd server
+'''
+import concurrent.futures
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import pytest
+
+import malware.clamav
+
+
+logger = logging.getLogger(__name__)
+
+# set to e.g. `2000` to benchmark many scans
+FILES_COUNT = int(os.environ.get('CLAMD_BENCHMARK_FILES_COUNT', 200))
+EICAR = b'malicious-content'
+UNSCANNABLE = b'unscannable-content'
+
+
+class FakeClamdHandler(socketserver.BaseRequestHandler):
+    def _recv_exactly(self, octets_count: int) -> bytes:
+        data = b''
+        while len(data) < octets_count:
+            if not (received := self.request.recv(octets_count - len(data))):
+                raise ConnectionError('client closed connection')
+            data += received
+        return data
+
+    def _recv_command(self) -> bytes:
+        command = b''
+        while not command.endswith(b'\x00'):
+            command += self._recv_exactly(1)
+        return command
+
+    def _instream_result(self) -> bytes:
+        content = b''
+        while (length := struct.unpack(b'!L', self._recv_exactly(4))[0]):
+            content += self._recv_exactly(length)
+
+        if EICAR in content:
+            return b'stream: Eicar-Signature FOUND'
+        if UNSCANNABLE in content:
+            return b'stream: INSTREAM size limit exceeded. ERROR'
+        return b'stream: OK'
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections_count += 1
+
+        try:
+            self._handle()
+        except ConnectionError:
+            pass # client closed connection
+
+    def _handle(self):
+        command = self._recv_command()
+
+        if command == b'zINSTREAM\x00':
+            self.request.sendall(self._instream_result() + b'\x00')
+            return
+
+        assert command == b'zIDSESSION\x00'
+        command_id = 0
+        while (command := self._recv_command()) != b'zEND\x00':
+            assert command == b'zINSTREAM\x00'
+            command_id += 1
+            result = self._instream_result()
+            self.request.sendall(f'{command_id}: '.encode() + result + b'\x00')
+
+            if result.endswith(b'ERROR'):
+                return # clamd terminates the session in case of errors
+
+
+class FakeClamd(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_address: str):
+        super().__init__(socket_address, FakeClamdHandler)
+        self.connections_count = 0
+        self.lock = threading.Lock()
+
+
+@pytest.fixture
+def clamd(tmp_path, monkeypatch) -> FakeClamd:
+    monkeypatch.setattr(
+        malware.clamav,
+        'clamscan_version',
+        lambda: ('1.2.2', 27315, '2024-06-23T08:23:58'),
+    )
+
+    socket_address = str(tmp_path / 'clamd.sock')
+    server = FakeClamd(socket_address)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _files() -> list[tuple[str, bytes]]:
+    return [
+        (f'file-{idx}', EICAR if idx % 50 == 0 else f'content-{idx}'.encode() * 10)
+        for idx in range(FILES_COUNT)
+    ]
+
+
+def _scan_per_connection(
+    socket_address: str,
+    data: bytes,
+) -> str:
+    # previous implementation: one connection and one reader thread per file
+    sock = socket.socket(family=socket.AF_UNIX, type=socket.SOCK_STREAM)
+    sock.connect(socket_address)
+    sock.send(b'zINSTREAM\x00')
+    sock.send(struct.pack(b'!L', len(data)))
+    sock.send(data)
+    sock.send(struct.pack(b'!L', 0))
+
+    result = None
+
+    def read_result():
+        nonlocal result
+        with sock.makefile('r') as f:
+            result = f.read()
+
+    reader = threading.Thread(target=read_result)
+    reader.start()
+    reader.join()
+    sock.close()
+
+    return result.removesuffix('\x00')
+
+
+def test_pooled_clamd_client(clamd):
+    files = _files()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+    start = time.perf_counter()
+    previous_results = list(executor.map(
+        lambda file: _scan_per_connection(socket_address=clamd.server_address, data=file[1]),
+        files,
+    ))
+    previous_duration = time.perf_counter() - start
+
+    assert clamd.connections_count == FILES_COUNT
+    clamd.connections_count = 0
+
+    client = malware.clamav.ClamdClient(socket_address=clamd.server_address, max_connections=4)
+
+    start = time.perf_counter()
+    current_results = list(executor.map(
+        lambda file: client.scan(data=(file[1],), filename=file[0]),
+        files,
+    ))
+    current_duration = time.perf_counter() - start
+
+    logger.info(f'clamd scans: {previous_duration=:.3f}s, {current_duration=:.3f}s')
+
+    assert [
+        filename for (filename, _), result in zip(files, previous_results)
+        if result.endswith('FOUND')
+    ] == [
+        result.finding.filename for result in current_results
+        if result
+    ] == [f'file-{idx}' for idx in range(0, FILES_COUNT, 50)]
+    assert current_results[0].finding.malware == 'Eicar-Signature'
+    assert current_results[0].octets_count == len(EICAR)
+
+    # sessions are re-used
+    assert clamd.connections_count <= 4
+    client.close()
+
+
+def test_stale_session(clamd):
+    client = malware.clamav.ClamdClient(socket_address=clamd.server_address)
+
+    assert client.scan(data=(b'clean',), filename='clean') is None
+    session = client._idle_sessions[0]
+
+    # clamd closed idle session meanwhile
+    session.sock.shutdown(socket.SHUT_RDWR)
+
+    assert client.scan(data=(EICAR,), filename='malware').finding.malware == 'Eicar-Signature'
+    assert client._idle_sessions[0] is not session
+
+
+def test_error_reply(clamd):
+    client = malware.clamav.ClamdClient(socket_address=clamd.server_address)
+
+    # errors must not be reported as (or cached as) scan results
+    with pytest.raises(RuntimeError):
+        client.scan(data=(UNSCANNABLE,), filename='unscannable')
+    assert not client._idle_sessions
+
+    assert client.scan(data=(EICAR,), filename='malware').finding.malware == 'Eicar-Signature'
+    assert clamd.connections_count == 2
+    client.close()
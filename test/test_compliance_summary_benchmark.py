@@ -0,0 +1,378 @@
+import datetime
+import logging
+import os
+import time
+
+import pytest
+
+import dso.model
+import ocm
+
+import compliance_summary as cs
+import ocm_util
+
+
+logger = logging.getLogger(__name__)
+
+# set to e.g. `100` (-> 10k artefacts in total) to benchmark large landscapes, timings are only
+# compared if explicitly benchmarking
+BENCHMARK_COMPONENTS_COUNT = os.environ.get('COMPLIANCE_SUMMARY_BENCHMARK_COMPONENTS_COUNT')
+COMPONENTS_COUNT = int(BENCHMARK_COMPONENTS_COUNT or 10)
+RESOURCES_PER_COMPONENT = 80
+SOURCES_PER_COMPONENT = 20
+
+SEVERITIES = ('NONE', 'LOW', 'MEDIUM', 'HIGH', 'CRITICAL', 'BLOCKER')
+
+
+def _component(idx: int) -> ocm.Component:
+    return ocm.Component(
+        name=f'example.org/component-{idx}',
+        version=f'1.{idx}.0',
+        repositoryContexts=[],
+        provider='example.org',
+        sources=[
+            ocm.Source(
+                name=f'source-{source_idx}',
+                version=f'1.{idx}.0',
+                access=None,
+            )
+            for source_idx in range(SOURCES_PER_COMPONENT)
+        ],
+        componentReferences=[],
+        resources=[
+            ocm.Resource(
+                name=f'resource-{resource_idx % (RESOURCES_PER_COMPONENT // 2)}',
+                version=f'2.{idx}.0',
+                type=ocm.ArtefactType.OCI_IMAGE,
+                access=None,
+                # every resource name occurs twice, distinguished by its extra identity
+                extraIdentity={'platform': 'linux/amd64' if resource_idx % 2 else 'linux/arm64'},
+            )
+            for resource_idx in range(RESOURCES_PER_COMPONENT)
+        ],
+    )
+
+
+def _finding(
+    component: ocm.Component,
+    artefact: ocm.Resource | ocm.Source,
+    datatype: str,
+    datasource: str,
+    data,
+    omit_artefact_version: bool=False,
+) -> dso.model.ArtefactMetadata:
+    artefact_id = dso.model.ComponentArtefactId(
+        component_name=component.name,
+        component_version=component.version,
+        artefact_kind='resource' if isinstance(artefact, ocm.Resource) else 'source',
+        artefact=dso.model.LocalArtefactId(
+            artefact_name=artefact.name,
+            artefact_version=None if omit_artefact_version else artefact.version,
+            artefact_type=str(artefact.type),
+            artefact_extra_id=artefact.extraIdentity,
+        ),
+    )
+
+    return dso.model.ArtefactMetadata(
+        artefact=artefact_id,
+        meta=dso.model.Metadata(
+            datasource=datasource,
+            type=datatype,
+            creation_date=datetime.datetime(2024, 1, 1),
+        ),
+        data=data,
+    )
+
+
+def _vulnerability(severity: str, cve: str) -> dso.model.VulnerabilityFinding:
+    return dso.model.VulnerabilityFinding(
+        package_name='package',
+        package_version='1.0.0',
+        base_url=None,
+        report_url=None,
+        product_id=-1,
+        group_id=-1,
+        severity=severity,
+        cve=cve,
+        cvss_v3_score=-1,
+        cvss=dict(),
+        summary=None,
+    )
+
+
+def _license(severity: str) -> dso.model.LicenseFinding:
+    return dso.model.LicenseFinding(
+        package_name='package',
+        package_version='1.0.0',
+        base_url=None,
+        report_url=None,
+        product_id=-1,
+        group_id=-1,
+        severity=severity,
+        license=dso.model.License(name='GPL-3.0'),
+    )
+
+
+def _malware(severity: str) -> dso.model.ClamAVMalwareFinding:
+    return dso.model.ClamAVMalwareFinding(
+        finding=dso.model.MalwareFindingDetails(
+            filename='sha256:xxx|foo/bar',
+            content_digest='sha256:foo',
+            malware='very-bad-virus',
+            context=None,
+        ),
+        octets_count=1024,
+        scan_duration_seconds=1.0,
+        severity=severity,
+        clamav_version=None,
+        signature_version=None,
+        freshclam_timestamp=None,
+    )
+
+
+def _rescoring(
+    component: ocm.Component | None,
+    artefact: ocm.Resource,
+    severity: str,
+    cve: str,
+    creation_date: datetime.datetime,
+) -> dso.model.ArtefactMetadata:
+    return dso.model.ArtefactMetadata(
+        artefact=dso.model.ComponentArtefactId(
+            component_name=component.name if component else None,
+            component_version=None,
+            artefact_kind=dso.model.ArtefactKind.RESOURCE,
+            artefact=dso.model.LocalArtefactId(
+                artefact_name=artefact.name if component else None,
+                artefact_version=None,
+                artefact_type=str(artefact.type),
+                artefact_extra_id=dict(),
+            ),
+        ),
+        meta=dso.model.Metadata(
+            datasource='delivery-dashboard',
+            type=dso.model.Datatype.RESCORING,
+            creation_date=creation_date,
+        ),
+        data=dso.model.CustomRescoring(
+            finding=dso.model.RescoringVulnerabilityFinding(
+                package_name='package',
+                cve=cve,
+            ),
+            referenced_type=dso.model.Datatype.VULNERABILITY,
+            severity=severity,
+            user=dso.model.User(username='user'),
+        ),
+    )
+
+
+@pytest.fixture(scope='module')
+def landscape():
+    components = tuple(_component(idx) for idx in range(COMPONENTS_COUNT))
+
+    findings = []
+    rescorings = []
+    for component_idx, component in enumerate(components):
+        for artefact_idx, artefact in enumerate(component.resources + component.sources):
+            seed = component_idx + artefact_idx
+
+            if seed % 7 == 0:
+                # not scanned at all
+                continue
+
+            if isinstance(artefact, ocm.Source):
+                findings.append(_finding(
+                    component=component,
+                    artefact=artefact,
+                    datatype=dso.model.Datatype.ARTEFACT_SCAN_INFO,
+                    datasource=dso.model.Datasource.CLAMAV,
+                    data=dict(),
+                ))
+                continue
+
+            findings.append(_finding(
+                component=component,
+                artefact=artefact,
+                datatype=dso.model.Datatype.ARTEFACT_SCAN_INFO,
+                datasource=dso.model.Datasource.BDBA,
+                data=dict(),
+            ))
+
+            for finding_idx in range(seed % 4):
+                findings.append(_finding(
+                    component=component,
+                    artefact=artefact,
+                    datatype=dso.model.Datatype.VULNERABILITY,
+                    datasource=dso.model.Datasource.BDBA,
+                    data=_vulnerability(
+                        severity=SEVERITIES[(seed + finding_idx) % len(SEVERITIES)],
+                        cve=f'CVE-{finding_idx}',
+                    ),
+                    # partial artefact ids must be considered for component summaries only
+                    omit_artefact_version=finding_idx == 2,
+                ))
+
+            if seed % 3 == 0:
+                findings.append(_finding(
+                    component=component,
+                    artefact=artefact,
+                    datatype=dso.model.Datatype.LICENSE,
+                    datasource=dso.model.Datasource.BDBA,
+                    data=_license(severity=SEVERITIES[seed % len(SEVERITIES)]),
+                ))
+
+            if seed % 11 == 0:
+                findings.append(_finding(
+                    component=component,
+                    artefact=artefact,
+                    datatype=dso.model.Datatype.MALWARE_FINDING,
+                    datasource=dso.model.Datasource.CLAMAV,
+                    data=_malware(severity=SEVERITIES[seed % len(SEVERITIES)]),
+                ))
+
+        resource = component.resources[0]
+        rescorings.append(_rescoring(
+            component=component,
+            artefact=resource,
+            severity='LOW',
+            cve='CVE-1',
+            creation_date=datetime.datetime(2024, 1, 2),
+        ))
+        rescorings.append(_rescoring(
+            component=None,
+            artefact=resource,
+            severity='MEDIUM',
+            cve='CVE-2',
+            creation_date=datetime.datetime(2024, 1, 2, component_idx % 24),
+        ))
+
+    return components, tuple(findings), tuple(rescorings)
+
+
+def _linear_component_summaries(
+    findings: tuple[dso.model.ArtefactMetadata],
+    rescorings: tuple[dso.model.ArtefactMetadata],
+    components: tuple[ocm.Component],
+    defaults: dict[str, cs.ComplianceSummaryEntry],
+) -> list[cs.ComponentComplianceSummary]:
+    '''
+    reference implementation which re-filters findings per component, artefact and datatype
+    '''
+    summaries = []
+    for component in components:
+        filtered_findings = tuple(
+            finding for finding in findings
+            if ocm_util.find_artefact_of_component_or_none(
+                component=component,
+                artefact=finding.artefact,
+            )
+        )
+        filtered_rescorings = tuple(
+            rescoring for rescoring in rescorings
+            if (
+                not rescoring.artefact.component_name or
+                rescoring.artefact.component_name == component.name
+            ) and (
+                not rescoring.artefact.component_version or
+                rescoring.artefact.component_version == component.version
+            )
+        )
+
+        summaries.append(cs.ComponentComplianceSummary(
+            componentId=ocm.ComponentIdentity(
+                name=component.name,
+                version=component.version,
+            ),
+            entries=list(cs.calculate_summary(
+                artefact_metadata_cfg_by_type={},
+                findings=filtered_findings,
+                rescorings=filtered_rescorings,
+                defaults=defaults,
+                types=tuple(defaults.keys()),
+                eol_client=None,
+            )),
+            artefacts=[
+                cs.calculate_artefact_summary(
+                    component=component,
+                    artefact=artefact,
+                    findings=filtered_findings,
+                    rescorings=filtered_rescorings,
+                    defaults=defaults,
+                    eol_client=None,
+                    artefact_metadata_cfg_by_type={},
+                ) for artefact in component.resources + component.sources
+            ],
+        ))
+
+    return summaries
+
+
+def test_indexed_summaries_equal_linear_summaries(landscape):
+    components, findings, rescorings = landscape
+    defaults = cs.component_summaries.__defaults__[0].default_entries
+
+    start = time.perf_counter()
+    indexed_summaries = list(cs.component_summaries(
+        findings=findings,
+        rescorings=rescorings,
+        components=components,
+        eol_client=None,
+        artefact_metadata_cfg_by_type={},
+    ))
+    indexed_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    linear_summaries = _linear_component_summaries(
+        findings=findings,
+        rescorings=rescorings,
+        components=components,
+        defaults=defaults,
+    )
+    linear_duration = time.perf_counter() - start
+
+    logger.info(
+        f'compliance summary of {len(components)} components, {len(findings)} findings: '
+        f'{indexed_duration=:.2f}s, {linear_duration=:.2f}s'
+    )
+
+    assert indexed_summaries == linear_summaries
+
+    severities = {
+        entry.severity
+        for summary in indexed_summaries
+        for artefact_summary in summary.artefacts
+        for entry in artefact_summary.entries
+    }
+    # sanity check that synthetic findings cover all branches of the summary calculation
+    assert cs.ComplianceEntrySeverity.UNKNOWN in severities
+    assert cs.ComplianceEntrySeverity.CLEAN in severities
+    assert cs.ComplianceEntrySeverity.BLOCKER in severities
+
+    if BENCHMARK_COMPONENTS_COUNT:
+        assert indexed_duration < linear_duration
+
+
+def test_single_component_uses_all_findings(landscape):
+    components, findings, rescorings = landscape
+    component = components[1]
+    defaults = cs.component_summaries.__defaults__[0].default_entries
+
+    component_findings = tuple(
+        finding for finding in findings
+        if finding.artefact.component_name == component.name
+    )
+
+    summary, = cs.component_summaries(
+        findings=component_findings,
+        rescorings=rescorings,
+        components=(component,),
+        eol_client=None,
+        artefact_metadata_cfg_by_type={},
+    )
+
+    assert [summary] == _linear_component_summaries(
+        findings=component_findings,
+        rescorings=rescorings,
+        components=(component,),
+        defaults=defaults,
+    )
@@ -0,0 +1,209 @@
+import collections
+import dataclasses
+import threading
+import time
+
+import pytest
+
+import cnudie.iter
+import ocm
+
+import component_graph
+import components
+
+
+LOOKUP_LATENCY_SECONDS = 0.01
+
+
+def _component(
+    name: str,
+    references: tuple[str, ...]=(),
+) -> ocm.Component:
+    return ocm.Component(
+        name=f'example.org/{name}',
+        version='1.0.0',
+        repositoryContexts=[],
+        provider='example.org',
+        sources=[],
+        resources=[],
+        componentReferences=[
+            ocm.ComponentReference(
+                name=reference,
+                componentName=f'example.org/{reference}',
+                version='1.0.0',
+            )
+            for reference in references
+        ],
+    )
+
+
+class ComponentDescriptorLookup:
+    '''
+    component tree with shared sub-trees (i.e. `d` and `e` are referenced multiple times), which
+    simulates the latency of a registry round trip per lookup
+    '''
+    def __init__(self):
+        self.lookups_count = collections.Counter()
+        self._lock = threading.Lock()
+        self.components = {
+            component.name: component
+            for component in (
+                _component('root', references=('a', 'b', 'c')),
+                _component('a', references=('d', 'e')),
+                _component('b', references=('d',)),
+                _component('c', references=('b', 'e')),
+                _component('d', references=('e',)),
+                _component('e'),
+            )
+        }
+
+    def __call__(
+        self,
+        component_id: ocm.ComponentIdentity,
+        ctx_repo: ocm.OcmRepository=None,
+    ) -> ocm.ComponentDescriptor:
+        time.sleep(LOOKUP_LATENCY_SECONDS)
+
+        with self._lock:
+            self.lookups_count[component_id.name] += 1
+
+        return ocm.ComponentDescriptor(
+            meta=ocm.Metadata(),
+            component=self.components[component_id.name],
+        )
+
+
+def _node_paths(
+    nodes: collections.abc.Iterable[cnudie.iter.ComponentNode],
+) -> list[tuple[str, ...]]:
+    return [
+        tuple(path_entry.component.name for path_entry in node.path)
+        for node in nodes
+    ]
+
+
+@pytest.mark.parametrize('recursion_depth', [-1, 0, 1, 2])
+def test_components_order(recursion_depth):
+    component_descriptor_lookup = ComponentDescriptorLookup()
+
+    expected_nodes = cnudie.iter.iter(
+        component=component_descriptor_lookup.components['example.org/root'],
+        lookup=component_descriptor_lookup,
+        recursion_depth=recursion_depth,
+        prune_unique=False,
+        node_filter=cnudie.iter.Filter.components,
+    )
+
+    nodes = components._components(
+        component_name='example.org/root',
+        component_version='1.0.0',
+        component_descriptor_lookup=ComponentDescriptorLookup(),
+        recursion_depth=recursion_depth,
+    )
+
+    assert _node_paths(nodes) == _node_paths(expected_nodes)
+
+
+def test_prefetch_component_descriptors():
+    component_descriptor_lookup = ComponentDescriptorLookup()
+
+    lookup = component_graph.prefetch_component_descriptors(
+        component=component_descriptor_lookup.components['example.org/root'],
+        component_descriptor_lookup=component_descriptor_lookup,
+    )
+
+    # each referenced component is looked up exactly once
+    assert component_descriptor_lookup.lookups_count == {
+        f'example.org/{name}': 1
+        for name in ('a', 'b', 'c', 'd', 'e')
+    }
+
+    nodes = tuple(cnudie.iter.iter(
+        component=component_descriptor_lookup.components['example.org/root'],
+        lookup=lookup,
+        prune_unique=False,
+    ))
+
+    assert len(nodes) == 13
+    # all lookups were served from memory
+    assert sum(component_descriptor_lookup.lookups_count.values()) == 5
+
+
+def test_component_graph_cache(graph_cache):
+    component_descriptor_lookup = ComponentDescriptorLookup()
+    root = component_descriptor_lookup.components['example.org/root']
+
+    nodes = component_graph.component_nodes(
+        component=root,
+        component_descriptor_lookup=component_descriptor_lookup,
+    )
+    assert sum(component_descriptor_lookup.lookups_count.values()) == 5
+
+    # served from memory
+    assert component_graph.component_nodes(
+        component=root,
+        component_descriptor_lookup=component_descriptor_lookup,
+    ) is nodes
+    assert graph_cache.metrics()['memory_hits'] == 1
+
+    # served from disk (e.g. by another process or after a restart)
+    cached_nodes = component_graph.component_nodes(
+        component=root,
+        component_descriptor_lookup=component_descriptor_lookup,
+        cache=component_graph.ComponentGraphCache(cache_dir=graph_cache.cache_dir),
+    )
+    assert _node_paths(cached_nodes) == _node_paths(nodes)
+
+    assert sum(component_descriptor_lookup.lookups_count.values()) == 5
+
+    # the recursion depth is part of the cache key
+    assert len(component_graph.component_nodes(
+        component=root,
+        component_descriptor_lookup=component_descriptor_lookup,
+        recursion_depth=0,
+    )) == 1
+
+
+def test_component_graph_cache_mutable_versions(graph_cache):
+    component_descriptor_lookup = ComponentDescriptorLookup()
+    root = dataclasses.replace(
+        component_descriptor_lookup.components['example.org/root'],
+        version='1.1.0-dev',
+    )
+
+    for _ in range(2):
+        component_graph.component_nodes(
+            component=root,
+            component_descriptor_lookup=component_descriptor_lookup,
+        )
+
+    assert sum(component_descriptor_lookup.lookups_count.values()) == 10
+    assert graph_cache.metrics()['filesystem_items_count'] == 0
+
+
+def test_iter_artefact_nodes():
+    component_descriptor_lookup = ComponentDescriptorLookup()
+    component_descriptor_lookup.components['example.org/d'].resources.append(ocm.Resource(
+        name='image',
+        version='1.0.0',
+        type=ocm.ArtefactType.OCI_IMAGE,
+        access=None,
+    ))
+    root = component_descriptor_lookup.components['example.org/root']
+
+    expected_nodes = cnudie.iter.iter(
+        component=root,
+        lookup=component_descriptor_lookup,
+        node_filter=cnudie.iter.Filter.artefacts,
+    )
+
+    nodes = component_graph.iter_artefact_nodes(component_graph.component_nodes(
+        component=root,
+        component_descriptor_lookup=component_descriptor_lookup,
+    ))
+
+    assert [
+        (node.artefact.name, _node_paths((node,))[0]) for node in nodes
+    ] == [
+        (node.artefact.name, _node_paths((node,))[0]) for node in expected_nodes
+    ]
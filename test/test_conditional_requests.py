@@ -0,0 +1,283 @@
+import gzip
+
+import falcon
+import falcon.testing
+import pytest
+
+import ocm
+
+import artefacts
+import components
+import features
+import middleware.json_translator
+
+
+BLOB = b'blob-content'
+BLOB_DIGEST = 'sha256:0123456789abcdef'
+RAW_BLOB = bytes(range(256)) * 16
+RAW_BLOB_DIGEST = 'sha256:fedcba9876543210'
+
+
+def _component_descriptor(component_id: ocm.ComponentIdentity | str) -> ocm.ComponentDescriptor:
+    if isinstance(component_id, str):
+        name, version = component_id.split(':')
+    else:
+        name, version = component_id.name, component_id.version
+
+    return ocm.ComponentDescriptor(
+        meta=ocm.Metadata(),
+        component=ocm.Component(
+            name=name,
+            version=version,
+            repositoryContexts=[ocm.OciOcmRepository(baseUrl='registry.example.org/ocm')],
+            provider='example.org',
+            sources=[],
+            componentReferences=[],
+            resources=[
+                ocm.Resource(
+                    name='blob',
+                    version=version,
+                    type='application/octet-stream',
+                    access=ocm.LocalBlobAccess(
+                        localReference=BLOB_DIGEST,
+                        size=len(BLOB),
+                        mediaType='application/gzip',
+                    ),
+                    extraIdentity={},
+                    labels=[],
+                    srcRefs=[],
+                ),
+                ocm.Resource(
+                    name='raw',
+                    version=version,
+                    type='application/octet-stream',
+                    access=ocm.LocalBlobAccess(
+                        localReference=RAW_BLOB_DIGEST,
+                        size=len(RAW_BLOB),
+                        mediaType='application/octet-stream',
+                    ),
+                    extraIdentity={},
+                    labels=[],
+                    srcRefs=[],
+                ),
+            ],
+        ),
+    )
+
+
+class Blob:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.read_octets = 0
+
+    def iter_content(self, chunk_size: int):
+        for idx in range(0, len(self.content), chunk_size):
+            self.read_octets = min(idx + chunk_size, len(self.content))
+            yield self.content[idx:idx + chunk_size]
+
+
+class OciClient:
+    def __init__(self):
+        self.blob_requests = 0
+        self.blobs = []
+
+    def blob(
+        self,
+        image_reference: str,
+        digest: str,
+        stream: bool=True,
+        absent_ok: bool=False,
+    ) -> Blob:
+        self.blob_requests += 1
+        if digest == BLOB_DIGEST:
+            blob = Blob(gzip.compress(BLOB))
+        else:
+            blob = Blob(RAW_BLOB)
+
+        self.blobs.append(blob)
+        return blob
+
+
+@pytest.fixture
+def oci_client() -> OciClient:
+    return OciClient()
+
+
+@pytest.fixture
+def client(oci_client) -> falcon.testing.TestClient:
+    app = falcon.App()
+    json_handler = middleware.json_translator.json_handler()
+    app.resp_options.media_handlers[falcon.MEDIA_JSON] = json_handler
+    app.add_route('/components/component', components.Component(
+        component_descriptor_lookup=lambda component_id, ctx_repo=None: _component_descriptor(
+            component_id,
+        ),
+        version_lookup=lambda component_id, ctx_repo=None: ['1.0.0', '1.1.0'],
+        version_filter_callback=lambda: features.VersionFilter.RELEASES_ONLY,
+    ))
+    app.add_route('/ocm/artefacts/blob', artefacts.ArtefactBlob(
+        component_descriptor_lookup=lambda component_id, ocm_repository: _component_descriptor(
+            component_id,
+        ),
+        oci_client=oci_client,
+        chunk_size=100,
+    ))
+
+    return falcon.testing.TestClient(app)
+
+
+def test_component_descriptor_etag(client):
+    params = {
+        'component_name': 'example.org/component',
+        'version': '1.0.0',
+    }
+
+    result = client.simulate_get('/components/component', params=params)
+    assert result.status_code == 200
+    assert result.json['component']['version'] == '1.0.0'
+    assert 'immutable' in result.headers['cache-control']
+    etag = result.headers['etag']
+
+    result = client.simulate_get(
+        '/components/component',
+        params=params,
+        headers={'If-None-Match': etag},
+    )
+    assert result.status_code == 304
+    assert not result.content
+    assert result.headers['etag'] == etag
+
+    # different version -> different etag
+    result = client.simulate_get(
+        '/components/component',
+        params=params | {'version': '1.1.0'},
+        headers={'If-None-Match': etag},
+    )
+    assert result.status_code == 200
+    assert result.headers['etag'] != etag
+
+    # greatest version might change and must be revalidated
+    result = client.simulate_get(
+        '/components/component',
+        params={'component_name': 'example.org/component'},
+    )
+    assert result.json['component']['version'] == '1.1.0'
+    assert result.headers['cache-control'] == 'no-cache'
+
+    # non-final versions might be overwritten and must be revalidated as well
+    result = client.simulate_get(
+        '/components/component',
+        params=params | {'version': '1.2.0-dev'},
+    )
+    assert result.json['component']['version'] == '1.2.0-dev'
+    assert result.headers['cache-control'] == 'no-cache'
+
+
+def test_artefact_blob_etag(client, oci_client):
+    params = {
+        'component': 'example.org/component:1.0.0',
+        'artefact': 'blob',
+    }
+
+    result = client.simulate_get('/ocm/artefacts/blob', params=params)
+    assert result.status_code == 200
+    assert result.content == BLOB
+    etag = result.headers['etag']
+    assert BLOB_DIGEST in etag
+    assert oci_client.blob_requests == 1
+
+    # the blob is not retrieved for conditional requests
+    result = client.simulate_get(
+        '/ocm/artefacts/blob',
+        params=params,
+        headers={'If-None-Match': etag},
+    )
+    assert result.status_code == 304
+    assert not result.content
+    assert oci_client.blob_requests == 1
+
+    # the compressed representation has a separate etag
+    result = client.simulate_get(
+        '/ocm/artefacts/blob',
+        params=params | {'unzip': 'false'},
+        headers={'If-None-Match': etag},
+    )
+    assert result.status_code == 200
+    assert gzip.decompress(result.content) == BLOB
+    assert result.headers['etag'] == f'"{BLOB_DIGEST}"'
+
+
+def test_artefact_blob_range(client, oci_client):
+    params = {
+        'component': 'example.org/component:1.0.0',
+        'artefact': 'raw',
+    }
+
+    result = client.simulate_get('/ocm/artefacts/blob', params=params)
+    assert result.status_code == 200
+    assert result.content == RAW_BLOB
+    assert result.headers['accept-ranges'] == 'bytes'
+    assert result.headers['content-length'] == str(len(RAW_BLOB))
+    etag = result.headers['etag']
+
+    result = client.simulate_get(
+        '/ocm/artefacts/blob',
+        params=params,
+        headers={'Range': 'bytes=1000-1999'},
+    )
+    assert result.status_code == 206
+    assert result.content == RAW_BLOB[1000:2000]
+    assert result.headers['content-length'] == '1000'
+    assert result.headers['content-range'] == f'bytes 1000-1999/{len(RAW_BLOB)}'
+    # the blob is not read beyond the requested range
+    assert oci_client.blobs[-1].read_octets < len(RAW_BLOB)
+
+    # open and suffix ranges
+    result = client.simulate_get(
+        '/ocm/artefacts/blob',
+        params=params,
+        headers={'Range': 'bytes=4000-', 'If-Range': etag},
+    )
+    assert result.status_code == 206
+    assert result.content == RAW_BLOB[4000:]
+
+    result = client.simulate_get(
+        '/ocm/artefacts/blob',
+        params=params,
+        headers={'Range': 'bytes=-10'},
+    )
+    assert result.status_code == 206
+    assert result.content == RAW_BLOB[-10:]
+
+    # complete content is returned if representation changed
+    result = client.simulate_get(
+        '/ocm/artefacts/blob',
+        params=params,
+        headers={'Range': 'bytes=10-19', 'If-Range': '"sha256:outdated"'},
+    )
+    assert result.status_code == 200
+    assert result.content == RAW_BLOB
+
+    result = client.simulate_get(
+        '/ocm/artefacts/blob',
+        params=params,
+        headers={'Range': f'bytes={len(RAW_BLOB)}-'},
+    )
+    assert result.status_code == 416
+    assert result.headers['content-range'] == f'bytes */{len(RAW_BLOB)}'
+
+
+def test_artefact_blob_unzipped_range(client):
+    result = client.simulate_get(
+        '/ocm/artefacts/blob',
+        params={
+            'component': 'example.org/component:1.0.0',
+            'artefact': 'blob',
+        },
+        headers={'Range': 'bytes=0-3'},
+    )
+
+    # ranges of unzipped content are not supported
+    assert result.status_code == 200
+    assert result.content == BLOB
+    assert result.headers['accept-ranges'] == 'none'
@@ -0,0 +1,264 @@
+import threading
+import time
+
+import falcon
+import falcon.testing
+import pytest
+import sqlalchemy as sa
+
+import deliverydb
+import deliverydb.replicas
+import features
+import middleware.db_session
+
+
+class DBResource:
+    def on_get(self, req: falcon.Request, resp: falcon.Response):
+        resp.media = req.context.db_session.execute(sa.text('SELECT 1')).scalar()
+
+
+class DBNameResource:
+    read_only_methods = ('POST',)
+
+    def _db_name(self, req: falcon.Request) -> str:
+        return req.context.db_session.execute(sa.text('SELECT name FROM db_name')).scalar()
+
+    def on_get(self, req: falcon.Request, resp: falcon.Response):
+        resp.media = self._db_name(req)
+
+    def on_post(self, req: falcon.Request, resp: falcon.Response):
+        resp.media = self._db_name(req)
+
+    def on_put(self, req: falcon.Request, resp: falcon.Response):
+        resp.media = self._db_name(req)
+
+
+class NoDBResource:
+    def on_get(self, req: falcon.Request, resp: falcon.Response):
+        resp.media = 1
+
+
+@pytest.fixture
+def db_url(tmp_path) -> str:
+    return f'sqlite:///{tmp_path}/delivery-db.sqlite'
+
+
+@pytest.fixture
+def pool_cfg() -> deliverydb.PoolCfg:
+    return deliverydb.PoolCfg(
+        size=2,
+        max_overflow=1,
+        pre_ping=False,
+    )
+
+
+@pytest.fixture
+def client(db_url, pool_cfg) -> falcon.testing.TestClient:
+    app = falcon.App(
+        middleware=[
+            middleware.db_session.DBSessionLifecycle(
+                db_url=db_url,
+                verify_db_session=False,
+                pool_cfg=pool_cfg,
+            ),
+        ],
+    )
+    app.add_route('/db', DBResource())
+    app.add_route('/no-db', NoDBResource())
+
+    return falcon.testing.TestClient(app)
+
+
+def test_lazy_session_creation(client, monkeypatch):
+    sessions = []
+    sqlalchemy_session = deliverydb.sqlalchemy_session
+
+    def sqlalchemy_session_spy(*args, **kwargs):
+        sessions.append(session := sqlalchemy_session(*args, **kwargs))
+        return session
+
+    monkeypatch.setattr(deliverydb, 'sqlalchemy_session', sqlalchemy_session_spy)
+
+    assert client.simulate_get('/no-db').json == 1
+    assert not sessions
+
+    assert client.simulate_get('/db').json == 1
+    assert len(sessions) == 1
+
+
+def test_pool_metrics(client, db_url, pool_cfg):
+    for _ in range(3):
+        client.simulate_get('/db')
+
+    pool_metrics = deliverydb.pool_metrics(db_url=db_url, pool_cfg=pool_cfg)
+
+    assert pool_metrics['size'] == 2
+    assert pool_metrics['max_overflow'] == 1
+    # connections must be returned to the pool once the request was processed
+    assert pool_metrics['checked_out'] == 0
+    assert pool_metrics['overflow'] == 0
+    # one checkout for the schema migrations
+    assert pool_metrics['checkouts_count'] == 3 + 1
+
+
+def test_dispose_engines_after_fork(client, db_url, pool_cfg):
+    client.simulate_get('/db')
+    pool = deliverydb.engine(db_url, pool_cfg).pool
+
+    deliverydb._dispose_engines()
+
+    assert deliverydb.engine(db_url, pool_cfg).pool is not pool
+    assert deliverydb.pool_metrics(db_url=db_url, pool_cfg=pool_cfg)['checkouts_count'] == 0
+
+
+def test_deserialise_delivery_db_pool_cfg():
+    assert features.deserialise_delivery_db_pool_cfg({}) == deliverydb.PoolCfg()
+    assert features.deserialise_delivery_db_pool_cfg({
+        'pool': {
+            'size': 8,
+            'maxOverflow': 0,
+            'recycleSeconds': 1800,
+            'prePing': False,
+        },
+    }) == deliverydb.PoolCfg(
+        size=8,
+        max_overflow=0,
+        recycle_seconds=1800,
+        pre_ping=False,
+    )
+
+
+def _create_db_name_table(db_url: str, name: str):
+    engine = sa.create_engine(db_url)
+    with engine.begin() as connection:
+        connection.execute(sa.text('CREATE TABLE db_name (name TEXT)'))
+        connection.execute(sa.text('INSERT INTO db_name VALUES (:name)'), {'name': name})
+    engine.dispose()
+
+
+@pytest.fixture
+def replica_url(tmp_path, db_url) -> str:
+    replica_url = f'sqlite:///{tmp_path}/delivery-db-replica.sqlite'
+
+    _create_db_name_table(db_url, 'primary')
+    _create_db_name_table(replica_url, 'replica')
+
+    return replica_url
+
+
+def _replica_client(
+    db_url: str,
+    pool_cfg: deliverydb.PoolCfg,
+    replica_cfg: deliverydb.replicas.ReplicaCfg,
+) -> tuple[falcon.testing.TestClient, deliverydb.replicas.ReplicaRouter]:
+    db_session_lifecycle = middleware.db_session.DBSessionLifecycle(
+        db_url=db_url,
+        verify_db_session=False,
+        pool_cfg=pool_cfg,
+        replica_cfg=replica_cfg,
+    )
+    app = falcon.App(middleware=[db_session_lifecycle])
+    app.add_route('/db-name', DBNameResource())
+
+    # replicas are checked in the background, wait for the initial check
+    db_session_lifecycle.replica_router.check_replicas()
+
+    return falcon.testing.TestClient(app), db_session_lifecycle.replica_router
+
+
+def test_read_replica_routing(db_url, replica_url, pool_cfg):
+    client, _ = _replica_client(
+        db_url=db_url,
+        pool_cfg=pool_cfg,
+        replica_cfg=deliverydb.replicas.ReplicaCfg(urls=(replica_url,)),
+    )
+
+    assert client.simulate_get('/db-name').json == 'replica'
+    # resource declares `POST` as read-only
+    assert client.simulate_post('/db-name').json == 'replica'
+    assert client.simulate_put('/db-name').json == 'primary'
+
+
+def test_read_replica_fallback(db_url, replica_url, tmp_path, pool_cfg, monkeypatch):
+    lag_seconds = 60
+    monkeypatch.setattr(
+        deliverydb.replicas,
+        'replication_lag_seconds',
+        lambda engine: lag_seconds,
+    )
+
+    client, replica_router = _replica_client(
+        db_url=db_url,
+        pool_cfg=pool_cfg,
+        replica_cfg=deliverydb.replicas.ReplicaCfg(
+            urls=(replica_url,),
+            max_lag_seconds=30,
+            lag_check_interval_seconds=0,
+        ),
+    )
+
+    # replica is lagging behind too far
+    assert client.simulate_get('/db-name').json == 'primary'
+
+    lag_seconds = 1
+    replica_router.check_replicas()
+    assert client.simulate_get('/db-name').json == 'replica'
+
+    # replica is not reachable
+    monkeypatch.undo()
+    client, _ = _replica_client(
+        db_url=db_url,
+        pool_cfg=pool_cfg,
+        replica_cfg=deliverydb.replicas.ReplicaCfg(
+            urls=(f'sqlite:///{tmp_path}/missing-dir/delivery-db-replica.sqlite',),
+        ),
+    )
+
+    assert client.simulate_get('/db-name').json == 'primary'
+
+
+def test_deserialise_delivery_db_replica_cfg():
+    assert features.deserialise_delivery_db_replica_cfg(
+        delivery_db_raw={},
+        replica_urls=[],
+    ) == deliverydb.replicas.ReplicaCfg()
+    assert features.deserialise_delivery_db_replica_cfg(
+        delivery_db_raw={
+            'replicas': {
+                'maxLagSeconds': 5,
+            },
+        },
+        replica_urls=['postgresql://replica'],
+    ) == deliverydb.replicas.ReplicaCfg(
+        urls=('postgresql://replica',),
+        max_lag_seconds=5,
+    )
+
+
+def test_slow_replica_check(db_url, replica_url, pool_cfg, monkeypatch):
+    check_started = threading.Event()
+    check_released = threading.Event()
+
+    def replication_lag_seconds(engine) -> float:
+        check_started.set()
+        check_released.wait(timeout=10)
+        return 0
+
+    monkeypatch.setattr(deliverydb.replicas, 'replication_lag_seconds', replication_lag_seconds)
+
+    app = falcon.App(middleware=[middleware.db_session.DBSessionLifecycle(
+        db_url=db_url,
+        verify_db_session=False,
+        pool_cfg=pool_cfg,
+        replica_cfg=deliverydb.replicas.ReplicaCfg(urls=(replica_url,)),
+    )])
+    app.add_route('/db-name', DBNameResource())
+    client = falcon.testing.TestClient(app)
+
+    # requests are not blocked by pending checks but fall back to the primary
+    assert check_started.wait(timeout=10)
+    started_at = time.monotonic()
+    assert client.simulate_get('/db-name').json == 'primary'
+    assert time.monotonic() - started_at < 5
+
+    check_released.set()
@@ -0,0 +1,249 @@
+import datetime
+import os
+
+import pytest
+import sqlalchemy as sa
+import sqlalchemy.orm
+
+import dso.model
+
+import components
+import deliverydb.migrations
+import deliverydb.model as dm
+import deliverydb.util as du
+
+
+def _index_names(engine: sa.Engine) -> set[str]:
+    # reflection skips expression-based indexes for sqlite
+    with engine.connect() as connection:
+        return set(connection.execute(
+            sa.text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table_name"
+            ),
+            {'table_name': dm.ArtefactMetaData.__tablename__},
+        ).scalars())
+
+
+def test_migrate_fresh_database():
+    engine = sa.create_engine('sqlite://')
+
+    deliverydb.migrations.migrate(engine)
+
+    with engine.connect() as connection:
+        assert deliverydb.migrations.schema_version(connection) == 3
+
+    assert _index_names(engine) == {
+        index.name for index in dm.ArtefactMetaData.__table__.indexes
+    }
+    assert {
+        column['name']
+        for column in sa.inspect(engine).get_columns(dm.ArtefactMetaData.__tablename__)
+    } == {
+        column.name for column in dm.ArtefactMetaData.__table__.columns
+    }
+
+
+def test_baseline_migration():
+    engine = sa.create_engine('sqlite://')
+
+    # later migrations must be able to add their objects to fresh databases as well
+    deliverydb.migrations.migrate(
+        engine=engine,
+        migrations=deliverydb.migrations.MIGRATIONS[:1],
+    )
+
+    assert _index_names(engine) == {'ix_artefact_metadata_component_name'}
+
+
+def test_migrate_legacy_database():
+    engine = sa.create_engine('sqlite://')
+
+    # schema as created by `create_all` prior to schema migrations
+    legacy_metadata = sa.MetaData()
+    dm.ArtefactMetaData.__table__.to_metadata(legacy_metadata).indexes.clear()
+    legacy_metadata.create_all(engine)
+
+    with engine.connect() as connection:
+        assert deliverydb.migrations.schema_version(connection) == 0
+
+    deliverydb.migrations.migrate(engine)
+    # migrations must not be re-applied
+    deliverydb.migrations.migrate(engine)
+
+    with engine.connect() as connection:
+        assert deliverydb.migrations.schema_version(connection) == 3
+
+    assert 'ix_artefact_metadata_rescorings' in _index_names(engine)
+    assert 'ux_artefact_metadata_identity' in _index_names(engine)
+
+
+def test_migrate_duplicate_entries():
+    engine = sa.create_engine('sqlite://')
+    legacy_metadata = sa.MetaData()
+    dm.ArtefactMetaData.__table__.to_metadata(legacy_metadata).indexes.clear()
+    legacy_metadata.create_all(engine)
+    deliverydb.migrations.migrate(
+        engine=engine,
+        migrations=deliverydb.migrations.MIGRATIONS[:2],
+    )
+
+    with sqlalchemy.orm.Session(engine) as session:
+        session.add_all((
+            _artefact_metadata(
+                meta={'last_update': '2024-01-01T00:00:00'},
+                data={'severity': 'HIGH'},
+                discovery_date=datetime.date(2024, 1, 2),
+            ),
+            _artefact_metadata(
+                meta={'last_update': '2024-02-01T00:00:00'},
+                data={'severity': 'LOW'},
+                discovery_date=datetime.date(2024, 1, 1),
+            ),
+            _artefact_metadata(
+                meta={'last_update': '2023-12-01T00:00:00'},
+                data={'severity': 'CRITICAL'},
+                discovery_date=datetime.date(2024, 1, 3),
+            ),
+            dm.ArtefactMetaData(
+                type=dso.model.Datatype.RESCORING,
+                component_name='example.org/a',
+            ),
+            dm.ArtefactMetaData(
+                type=dso.model.Datatype.RESCORING,
+                component_name='example.org/a',
+            ),
+        ))
+        session.commit()
+
+    # duplicates must not be removed implicitly
+    with pytest.raises(RuntimeError, match='example.org/a'):
+        deliverydb.migrations.migrate(engine)
+
+    with engine.connect() as connection:
+        assert deliverydb.migrations.schema_version(connection) == 2
+
+    with engine.begin() as connection:
+        assert deliverydb.migrations.deduplicate_artefact_metadata(connection) == 2
+
+    deliverydb.migrations.migrate(engine)
+
+    with sqlalchemy.orm.Session(engine) as session:
+        # duplicate rescorings are not affected by the unique index
+        assert [
+            (row.id, row.type) for row in session.query(dm.ArtefactMetaData).order_by('id')
+        ] == [
+            (1, dso.model.Datatype.VULNERABILITY),
+            (4, dso.model.Datatype.RESCORING),
+            (5, dso.model.Datatype.RESCORING),
+        ]
+
+        # duplicates are merged into the newest payload and the earliest discovery date
+        entry = session.get(dm.ArtefactMetaData, 1)
+        assert entry.meta == {'last_update': '2024-02-01T00:00:00'}
+        assert entry.data == {'severity': 'LOW'}
+        assert entry.discovery_date == datetime.date(2024, 1, 1)
+
+
+def test_refuse_newer_schema():
+    engine = sa.create_engine('sqlite://')
+    deliverydb.migrations.migrate(engine)
+
+    with pytest.raises(RuntimeError):
+        deliverydb.migrations.migrate(
+            engine=engine,
+            migrations=deliverydb.migrations.MIGRATIONS[:1],
+        )
+
+
+def _engines() -> list[str]:
+    db_urls = ['sqlite://']
+
+    # optionally, check query plans against a local PostgreSQL instance as well
+    if db_url := os.environ.get('DELIVERY_DB_TEST_URL'):
+        db_urls.append(db_url)
+
+    return db_urls
+
+
+@pytest.fixture(params=_engines())
+def session(request) -> sqlalchemy.orm.Session:
+    engine = sa.create_engine(request.param)
+    deliverydb.migrations.migrate(engine)
+
+    with sqlalchemy.orm.Session(engine) as session:
+        if engine.dialect.name == 'postgresql':
+            # tables are (almost) empty, hence discourage sequential scans to reveal index usage
+            session.execute(sa.text('SET enable_seqscan = off'))
+
+        yield session
+        session.rollback()
+
+
+def _query_plan(
+    session: sqlalchemy.orm.Session,
+    statement: sa.Select,
+) -> str:
+    # render literals to obtain the plan for concrete values (similar to postgresql "custom plans")
+    statement = str(statement.compile(
+        dialect=session.bind.dialect,
+        compile_kwargs={'literal_binds': True},
+    ))
+
+    if session.bind.dialect.name == 'sqlite':
+        explain = 'EXPLAIN QUERY PLAN'
+    else:
+        explain = 'EXPLAIN'
+
+    return '\n'.join(
+        str(row)
+        for row in session.execute(sa.text(f'{explain} {statement}')).all()
+    )
+
+
+def _artefact_metadata(**kwargs) -> dm.ArtefactMetaData:
+    return dm.ArtefactMetaData(
+        type=dso.model.Datatype.VULNERABILITY,
+        component_name='example.org/a',
+        component_version='1.0.0',
+        artefact_kind=dso.model.ArtefactKind.RESOURCE,
+        artefact_name='image',
+        artefact_version='1.0.0',
+        artefact_type='ociImage',
+        artefact_extra_id_normalised='',
+        datasource=dso.model.Datasource.BDBA,
+        data_key='0' * 40,
+        **kwargs,
+    )
+
+
+def test_single_scan_result_query_plan(session):
+    statement = sa.select(dm.ArtefactMetaData).where(
+        du.ArtefactMetadataFilters.by_single_scan_result(_artefact_metadata()),
+    )
+
+    assert 'ix_artefact_metadata_artefact_id ' in _query_plan(session, statement) + ' '
+
+
+def test_rescorings_query_plan(session):
+    statement = session.query(dm.ArtefactMetaData).filter(
+        dm.ArtefactMetaData.type == dso.model.Datatype.RESCORING,
+        dm.ArtefactMetaData.artefact_kind == dso.model.ArtefactKind.RESOURCE,
+        dm.ArtefactMetaData.artefact_type == 'ociImage',
+        du.ArtefactMetadataFilters.filter_for_rescoring_type([dso.model.Datatype.VULNERABILITY]),
+    ).statement
+
+    assert 'ix_artefact_metadata_rescorings' in _query_plan(session, statement)
+
+
+def test_latest_metadata_query_plan(session):
+    statement = components.ComponentMetadata(
+        version_lookup=None,
+        version_filter_callback=None,
+    )._latest_metadata_query(
+        session=session,
+        metadata_types=[dso.model.Datatype.VULNERABILITY],
+        component_version=None,
+        component_name='example.org/a',
+    ).statement
+
+    assert 'ix_artefact_metadata_latest' in _query_plan(session, statement)
@@ -0,0 +1,284 @@
+import itertools
+
+import pytest
+import sqlalchemy as sa
+import sqlalchemy.orm
+
+import dso.model
+import ocm
+
+import deliverydb.model as dm
+import deliverydb.util as du
+
+
+def _component(
+    name: str,
+    version: str,
+) -> ocm.Component:
+    return ocm.Component(
+        name=name,
+        version=version,
+        repositoryContexts=[],
+        provider='example.org',
+        sources=[],
+        componentReferences=[],
+        resources=[
+            ocm.Resource(
+                name='image',
+                version=version,
+                type=ocm.ArtefactType.OCI_IMAGE,
+                access=None,
+                extraIdentity={'platform': 'linux/amd64'},
+            ),
+        ],
+    )
+
+
+COMPONENTS = (
+    _component(name='example.org/a', version='1.0.0'),
+    _component(name='example.org/a', version='2.0.0'),
+    _component(name='example.org/b', version='1.0.0'),
+)
+
+
+def component_descriptor_lookup(
+    component_id: ocm.ComponentIdentity,
+    ocm_repo: ocm.OcmRepository=None,
+) -> ocm.ComponentDescriptor:
+    for component in COMPONENTS:
+        if component.name == component_id.name and component.version == component_id.version:
+            return ocm.ComponentDescriptor(
+                meta=ocm.Metadata(),
+                component=component,
+            )
+
+
+def _artefact_metadata(
+    component_name: str | None,
+    component_version: str | None,
+    artefact_name: str | None,
+    artefact_version: str | None,
+    artefact_extra_id: dict,
+) -> dm.ArtefactMetaData:
+    return dm.ArtefactMetaData(
+        type=dso.model.Datatype.VULNERABILITY,
+        component_name=component_name,
+        component_version=component_version,
+        artefact_kind=dso.model.ArtefactKind.RESOURCE,
+        artefact_name=artefact_name,
+        artefact_version=artefact_version,
+        artefact_type=ocm.ArtefactType.OCI_IMAGE,
+        artefact_extra_id=artefact_extra_id,
+        artefact_extra_id_normalised=dso.model.normalise_artefact_extra_id(artefact_extra_id),
+        data={},
+        meta={},
+        datasource=dso.model.Datasource.BDBA,
+        # the artefact-extra-id is not part of the identity of entries
+        data_key=dso.model.normalise_artefact_extra_id(artefact_extra_id),
+    )
+
+
+@pytest.fixture
+def session() -> sqlalchemy.orm.Session:
+    engine = sa.create_engine('sqlite://')
+    dm.Base.metadata.create_all(engine)
+
+    with sqlalchemy.orm.Session(engine) as session:
+        for (
+            component_name,
+            component_version,
+            artefact_name,
+            artefact_version,
+            artefact_extra_id,
+        ) in itertools.product(
+            ('example.org/a', 'example.org/b', 'example.org/c', None),
+            ('1.0.0', '2.0.0', None),
+            ('image', 'other-image', None),
+            ('1.0.0', '2.0.0', None),
+            ({'platform': 'linux/amd64'}, {'platform': 'linux/arm64'}),
+        ):
+            session.add(_artefact_metadata(
+                component_name=component_name,
+                component_version=component_version,
+                artefact_name=artefact_name,
+                artefact_version=artefact_version,
+                artefact_extra_id=artefact_extra_id,
+            ))
+        session.commit()
+
+        yield session
+
+
+def _matches(
+    value,
+    expected,
+    none_ok: bool,
+) -> bool:
+    return value == expected or (none_ok and value is None)
+
+
+def _is_artefact_of_component(
+    artefact_metadata: dm.ArtefactMetaData,
+    component_name: str,
+    component_version: str,
+) -> bool:
+    for component in COMPONENTS:
+        if component.name != component_name or component.version != component_version:
+            continue
+
+        for artefact in component.resources:
+            if (
+                artefact_metadata.artefact_name == artefact.name
+                and artefact_metadata.artefact_version == artefact.version
+                and artefact_metadata.artefact_type == artefact.type
+                and artefact_metadata.artefact_extra_id_normalised
+                    == dso.model.normalise_artefact_extra_id(artefact.extraIdentity)
+            ):
+                return True
+
+    return False
+
+
+def _expected_ids(
+    session: sqlalchemy.orm.Session,
+    artefact_refs: tuple[dso.model.ComponentArtefactId],
+    none_ok: bool,
+) -> set[int]:
+    '''
+    reference implementation of the predicates previously generated per artefact ref
+    '''
+    def matches(
+        artefact_metadata: dm.ArtefactMetaData,
+        artefact_ref: dso.model.ComponentArtefactId,
+    ) -> bool:
+        if not _matches(artefact_metadata.component_name, artefact_ref.component_name, none_ok):
+            return False
+
+        if not (
+            artefact_metadata.component_version == artefact_ref.component_version
+            or (none_ok and artefact_metadata.component_version is None)
+            or (
+                artefact_metadata.component_version is None
+                and (
+                    not artefact_ref.component_version
+                    or _is_artefact_of_component(
+                        artefact_metadata=artefact_metadata,
+                        component_name=artefact_ref.component_name,
+                        component_version=artefact_ref.component_version,
+                    )
+                )
+            )
+        ):
+            return False
+
+        if not (local_artefact := artefact_ref.artefact):
+            return True
+
+        for value, expected in (
+            (artefact_metadata.artefact_name, local_artefact.artefact_name),
+            (artefact_metadata.artefact_version, local_artefact.artefact_version),
+            (artefact_metadata.artefact_type, local_artefact.artefact_type),
+            (
+                artefact_metadata.artefact_extra_id_normalised,
+                local_artefact.normalised_artefact_extra_id(),
+            ),
+        ):
+            if expected and not _matches(value, expected, none_ok):
+                return False
+
+        return True
+
+    return {
+        artefact_metadata.id
+        for artefact_metadata in session.query(dm.ArtefactMetaData)
+        if any(matches(artefact_metadata, artefact_ref) for artefact_ref in artefact_refs)
+    }
+
+
+@pytest.mark.parametrize('none_ok', (False, True))
+def test_component_query(session, none_ok):
+    components = COMPONENTS[:2] + (ocm.ComponentIdentity(name='example.org/c', version=None),)
+
+    ids = {
+        artefact_metadata.id
+        for artefact_metadata in session.query(dm.ArtefactMetaData).filter(
+            du.ArtefactMetadataQueries.component_query(
+                components=components,
+                none_ok=none_ok,
+                component_descriptor_lookup=component_descriptor_lookup,
+            ),
+        )
+    }
+
+    assert ids
+    assert ids == _expected_ids(
+        session=session,
+        artefact_refs=tuple(
+            dso.model.ComponentArtefactId(
+                component_name=component.name,
+                component_version=component.version,
+                artefact=None,
+            ) for component in components
+        ),
+        none_ok=none_ok,
+    )
+
+
+@pytest.mark.parametrize('none_ok', (False, True))
+def test_artefact_refs_query(session, none_ok):
+    artefact_refs = (
+        dso.model.ComponentArtefactId(
+            component_name='example.org/a',
+            component_version='2.0.0',
+            artefact=dso.model.LocalArtefactId(
+                artefact_name='image',
+                artefact_version=None,
+                artefact_type=None,
+                artefact_extra_id={'platform': 'linux/amd64'},
+            ),
+        ),
+        dso.model.ComponentArtefactId(
+            component_name='example.org/b',
+            component_version='1.0.0',
+            artefact=dso.model.LocalArtefactId(
+                artefact_name='other-image',
+                artefact_version='1.0.0',
+                artefact_type=ocm.ArtefactType.OCI_IMAGE,
+                artefact_extra_id={},
+            ),
+        ),
+        dso.model.ComponentArtefactId(
+            component_name=None,
+            component_version=None,
+            artefact=dso.model.LocalArtefactId(
+                artefact_name='image',
+                artefact_version='1.0.0',
+                artefact_type=None,
+                artefact_extra_id={},
+            ),
+        ),
+    )
+
+    query = session.query(dm.ArtefactMetaData).filter(
+        du.ArtefactMetadataQueries.artefact_refs_query(
+            artefact_refs=artefact_refs,
+            none_ok=none_ok,
+            component_descriptor_lookup=component_descriptor_lookup,
+        ),
+    )
+
+    assert {artefact_metadata.id for artefact_metadata in query} == _expected_ids(
+        session=session,
+        artefact_refs=artefact_refs,
+        none_ok=none_ok,
+    )
+
+    # statement size must not depend on the number of artefact refs
+    statement = str(query.statement.compile(compile_kwargs={'literal_binds': True}))
+    assert statement.count('EXISTS') == 1 if none_ok else 2
+
+
+def test_empty_artefact_refs_query(session):
+    assert not session.query(dm.ArtefactMetaData).filter(
+        du.ArtefactMetadataQueries.artefact_refs_query(artefact_refs=()),
+    ).all()
@@ -0,0 +1,250 @@
+import collections.abc
+import dataclasses
+import datetime
+import types
+
+import falcon
+import falcon.testing
+import pytest
+
+import components
+import dora
+import dora_ledger
+import middleware.json_translator
+
+
+TARGET_COMPONENT_NAME = 'example.org/dora-target'
+now = datetime.datetime.now(datetime.UTC)
+
+
+@dataclasses.dataclass
+class Component:
+    name: str
+    version: str
+    creationTime: str
+
+
+@dataclasses.dataclass
+class ComponentDescriptor:
+    component: Component
+
+
+def _ledger_entry(
+    version: str,
+    predecessor_version: str | None,
+    deployment_date: datetime.datetime,
+) -> dora_ledger.LedgerEntry:
+    return dora_ledger.LedgerEntry(
+        version=version,
+        predecessor_version=predecessor_version,
+        deployment_date=deployment_date,
+        dependency_changes=(
+            dora_ledger.DependencyChange(
+                dependency_name='example.org/dependency',
+                start_version=f'{predecessor_version}-dep',
+                end_version=f'{version}-dep',
+                repo_url='github.com/example/dependency',
+                commits=(
+                    dora_ledger.Commit(
+                        sha=f'sha-{version}',
+                        date=deployment_date - datetime.timedelta(days=2),
+                    ),
+                ),
+            ),
+        ),
+    )
+
+
+def test_change_ledger(tmp_path):
+    ledger = dora_ledger.ChangeLedger(path=str(tmp_path / 'ledger.sqlite'))
+    entry = _ledger_entry('1.1.0', '1.0.0', now)
+
+    assert ledger.entries(TARGET_COMPONENT_NAME) == {}
+
+    ledger.add(TARGET_COMPONENT_NAME, entry)
+
+    # entries are persisted
+    ledger = dora_ledger.ChangeLedger(path=str(tmp_path / 'ledger.sqlite'))
+    assert ledger.entries(TARGET_COMPONENT_NAME) == {'1.1.0': entry}
+    assert ledger.entries('example.org/other') == {}
+
+
+@pytest.fixture
+def creation_dates() -> dict[str, datetime.datetime]:
+    return {
+        '1.0.0': now - datetime.timedelta(days=200),
+        '1.1.0': now - datetime.timedelta(days=100),
+        '1.2.0': now - datetime.timedelta(days=50),
+        '1.3.0': now - datetime.timedelta(days=10),
+    }
+
+
+@pytest.fixture
+def processed_versions(monkeypatch, creation_dates) -> list[tuple[str, str | None]]:
+    processed_versions = []
+
+    def dependency_updates(
+        component,
+        predecessor_component,
+        component_descriptor_lookup,
+    ) -> list[components.ComponentVector]:
+        processed_versions.append((component.version, predecessor_component.version))
+
+        return [components.ComponentVector(
+            start=Component('example.org/dependency', predecessor_component.version, None),
+            end=Component('example.org/dependency', component.version, None),
+        )]
+
+    def compare_request(dependency_update) -> dora.CompareRequest:
+        return dora.CompareRequest(
+            repo_url='github.com/example/dependency',
+            left_commit=dependency_update.start.version,
+            right_commit=dependency_update.end.version,
+        )
+
+    def commits_for_component_change(left_commit, right_commit, github_repo) -> tuple:
+        commit_date = creation_dates[right_commit] - datetime.timedelta(days=2)
+
+        return (
+            types.SimpleNamespace(
+                sha=f'sha-{right_commit}',
+                commit=types.SimpleNamespace(author={'date': commit_date.isoformat()}),
+            ),
+        )
+
+    monkeypatch.setattr(dora, 'dependency_updates', dependency_updates)
+    monkeypatch.setattr(dora, 'compare_request', compare_request)
+    monkeypatch.setattr(dora, 'commits_for_component_change', commits_for_component_change)
+
+    return processed_versions
+
+
+@pytest.fixture
+def dora_metrics(tmp_path, creation_dates) -> dora.DoraMetrics:
+    def component_descriptor_lookup(component_id):
+        return ComponentDescriptor(component=Component(
+            name=component_id.name,
+            version=component_id.version,
+            creationTime=creation_dates[component_id.version].isoformat(),
+        ))
+
+    def version_lookup(component_id, ctx_repo=None):
+        return list(creation_dates)
+
+    return dora.DoraMetrics(
+        component_descriptor_lookup=component_descriptor_lookup,
+        component_version_lookup=version_lookup,
+        github_api_lookup=lambda repo_url: types.SimpleNamespace(repository=lambda org, repo: None),
+        ledger=dora_ledger.ChangeLedger(path=str(tmp_path / 'ledger.sqlite')),
+        max_workers=1,
+    )
+
+
+@pytest.fixture
+def dora_metrics_result(dora_metrics) -> collections.abc.Callable[[], falcon.testing.Result]:
+    app = falcon.App()
+    app.resp_options.media_handlers[falcon.MEDIA_JSON] = middleware.json_translator.json_handler()
+    app.add_route('/dora', dora_metrics)
+    client = falcon.testing.TestClient(app)
+
+    def dora_metrics_result() -> falcon.testing.Result:
+        result = client.simulate_get('/dora', params={
+            'target_component_name': TARGET_COMPONENT_NAME,
+            'time_span_days': 90,
+        })
+        # wait for (potential) ledger update (single worker)
+        dora_metrics._executor.submit(lambda: None).result()
+        return result
+
+    return dora_metrics_result
+
+
+def test_incremental_dora_metrics(creation_dates, processed_versions, dora_metrics_result):
+    assert dora_metrics_result().status_code == 202
+    # only versions within the time span are processed (against their predecessors)
+    assert sorted(processed_versions) == [('1.2.0', '1.1.0'), ('1.3.0', '1.2.0')]
+
+    result = dora_metrics_result()
+    assert result.status_code == 200
+    dependency = result.json['dependencies']['example.org/dependency']
+    assert [
+        deployment['target_deployment_version'] for deployment in dependency['deployments']
+    ] == ['1.2.0', '1.3.0']
+    assert result.json['change_lead_time_median'] == 2
+
+    # only new versions are processed
+    creation_dates['1.4.0'] = now - datetime.timedelta(days=1)
+    assert dora_metrics_result().status_code == 202
+    assert processed_versions[2:] == [('1.4.0', '1.3.0')]
+
+    result = dora_metrics_result()
+    assert result.status_code == 200
+    dependency = result.json['dependencies']['example.org/dependency']
+    assert len(dependency['deployments']) == 3
+    assert len(processed_versions) == 3
+
+
+def test_failed_compare_request(
+    monkeypatch,
+    creation_dates,
+    processed_versions,
+    dora_metrics,
+    dora_metrics_result,
+):
+    commits_for_component_change = dora.commits_for_component_change
+    compare_requests = []
+
+    def failing_commits_for_component_change(left_commit, right_commit, github_repo) -> tuple:
+        compare_requests.append(right_commit)
+        if right_commit == '1.3.0':
+            raise RuntimeError('repository not found')
+
+        return commits_for_component_change(left_commit, right_commit, github_repo)
+
+    monkeypatch.setattr(dora, 'commits_for_component_change', failing_commits_for_component_change)
+
+    assert dora_metrics_result().status_code == 202
+
+    # failed versions are recorded, hence metrics are served from the remaining versions
+    result = dora_metrics_result()
+    assert result.status_code == 200
+    assert result.json['incomplete_versions'] == ['1.3.0']
+    dependency = result.json['dependencies']['example.org/dependency']
+    assert [
+        deployment['target_deployment_version'] for deployment in dependency['deployments']
+    ] == ['1.2.0']
+
+    entry = dora_metrics.ledger.entries(TARGET_COMPONENT_NAME)['1.3.0']
+    assert entry.error
+    assert entry.failed_attempts == 1
+    assert not entry.retry_due
+
+    # failed versions are only retried after backoff, while metrics are still served
+    assert dora_metrics_result().status_code == 200
+    assert compare_requests.count('1.3.0') == 1
+
+    dora_metrics.ledger.add(TARGET_COMPONENT_NAME, dataclasses.replace(
+        entry,
+        retry_after=now - datetime.timedelta(seconds=1),
+    ))
+    assert dora_metrics_result().status_code == 200
+    assert compare_requests.count('1.3.0') == 2
+    assert dora_metrics.ledger.entries(TARGET_COMPONENT_NAME)['1.3.0'].failed_attempts == 2
+
+
+def test_failed_entry_backoff():
+    entry = None
+    for _ in range(dora_ledger.MAX_FAILED_ATTEMPTS):
+        entry = dora_ledger.failed_entry(
+            version='1.1.0',
+            predecessor_version='1.0.0',
+            deployment_date=now,
+            error='repository not found',
+            previous_entry=entry,
+        )
+
+    assert entry.failed_attempts == dora_ledger.MAX_FAILED_ATTEMPTS
+    assert entry.dependency_changes == ()
+    # no further attempts
+    assert entry.retry_after is None
+    assert not entry.retry_due
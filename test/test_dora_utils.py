@@ -1,6 +1,7 @@
 import datetime
 
 import dora
+import dora_ledger
 
 
 def test_next_older_month():
@@ -13,3 +14,65 @@ def test_next_older_month():
         datetime.datetime(1999, 12, 1, tzinfo=datetime.UTC)
         == dora.next_older_month(datetime.datetime(2000, 1, 10))
     )
+
+
+def test_create_response_object():
+    now = datetime.datetime.now(datetime.UTC)
+
+    def dependency_change(
+        target_component_version: str,
+        deployment_days_ago: int,
+        lead_times_days: list[int],
+    ) -> dora.ComponentDependencyChangeWithCommits:
+        deployment_date = now - datetime.timedelta(days=deployment_days_ago)
+
+        return dora.ComponentDependencyChangeWithCommits(
+            target_component_version=target_component_version,
+            deployment_date=deployment_date,
+            dependency_change=dora_ledger.DependencyChange(
+                dependency_name='example.org/dependency',
+                start_version='1.0.0',
+                end_version='2.0.0',
+                repo_url='github.com/example/dependency',
+                commits=tuple(
+                    dora_ledger.Commit(
+                        sha=f'{target_component_version}-{idx}',
+                        date=deployment_date - datetime.timedelta(days=lead_time_days),
+                    ) for idx, lead_time_days in enumerate(lead_times_days)
+                ),
+            ),
+        )
+
+    response = dora.create_response_object(
+        target_updates_by_dependency={
+            'example.org/dependency': [
+                dependency_change('1.1.0', 5, [1, 2, 3, 4]),
+                dependency_change('1.2.0', 1, [5, 6, 7, 8, 9, 10]),
+                # commits outside of time span are ignored for lead times
+                dependency_change('1.0.0', 100, [1]),
+                dependency_change('1.3.0', 0, []),
+            ],
+        },
+        time_span_days=90,
+    )
+
+    assert response.change_lead_time_median == 5
+    assert response.change_lead_time_average == 5
+    assert response.change_lead_time_p50 == 5
+    assert response.change_lead_time_p90 == 9
+
+    dependency = response.dependencies['example.org/dependency']
+    assert dependency.change_lead_time_p90 == 9
+    assert len(dependency.all_changes) == 10
+    assert [
+        (deployment.target_deployment_version, deployment.median_change_lead_time)
+        for deployment in dependency.deployments
+    ] == [('1.1.0', 2), ('1.2.0', 7), ('1.0.0', 1), ('1.3.0', 0)]
+    assert sum(
+        len(monthly.changes) for monthly in dependency.changes_monthly
+    ) == 10
+
+    # months (incl. empty ones) are reported once, in chronological order
+    months = [(monthly.year, monthly.month) for monthly in dependency.changes_monthly]
+    assert months == sorted(set(months))
+    assert len(months) >= 3
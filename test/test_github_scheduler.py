@@ -0,0 +1,129 @@
+import collections
+import threading
+import time
+
+import requests
+
+import github_scheduler
+
+
+class Session:
+    def __init__(self, headers: dict):
+        self.headers = headers
+        self.concurrency = 0
+        self.max_concurrency = 0
+        self.lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        with self.lock:
+            self.concurrency += 1
+            self.max_concurrency = max(self.max_concurrency, self.concurrency)
+
+        time.sleep(0.01)
+
+        with self.lock:
+            self.concurrency -= 1
+
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update(self.headers)
+        return response
+
+
+class GitHubApi:
+    def __init__(self, session: Session):
+        self.session = session
+
+
+def _issue_requests(github_api: GitHubApi, requests_count: int=16):
+    threads = [
+        threading.Thread(
+            target=github_api.session.request,
+            args=('GET', 'https://api.github.example.org/repos/org/repo'),
+        ) for _ in range(requests_count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrency_adapts_to_quota():
+    scheduler = github_scheduler.GitHubRequestScheduler(max_concurrency=4, min_remaining_quota=10)
+    session = Session(headers={
+        'X-RateLimit-Limit': '5000',
+        'X-RateLimit-Remaining': '5000',
+        'X-RateLimit-Reset': str(int(time.time()) + 3600),
+    })
+    github_api = scheduler.instrument(GitHubApi(session))
+    # instrumenting is idempotent
+    assert scheduler.instrument(github_api) is github_api
+
+    _issue_requests(github_api)
+    assert 1 < session.max_concurrency <= 4
+
+    # low quota -> requests are issued sequentially
+    session.headers['X-RateLimit-Remaining'] = '100'
+    github_api.session.request('GET', 'https://api.github.example.org/rate_limit')
+    session.max_concurrency = 0
+
+    _issue_requests(github_api)
+    assert session.max_concurrency == 1
+
+    metrics = scheduler.metrics()
+    host_metrics = metrics['hosts']['api.github.example.org']
+    assert host_metrics['requests_count'] == 33
+    assert host_metrics['allowed_concurrency'] == 1
+    assert host_metrics['remaining_quota'] == 100
+    assert metrics['throttled_count'] > 0
+
+
+def test_exhausted_quota():
+    scheduler = github_scheduler.GitHubRequestScheduler(
+        min_remaining_quota=10,
+        max_throttle_seconds=0.2,
+    )
+    session = Session(headers={
+        'X-RateLimit-Limit': '5000',
+        'X-RateLimit-Remaining': '5',
+        'X-RateLimit-Reset': str(int(time.time()) + 3600),
+    })
+    github_api = scheduler.instrument(GitHubApi(session))
+
+    github_api.session.request('GET', 'https://api.github.example.org/rate_limit')
+    assert scheduler.metrics()['hosts']['api.github.example.org']['blocked_seconds'] > 3500
+
+    # requests are held back until the quota is reset (or the max. throttle time is exceeded)
+    started_at = time.monotonic()
+    github_api.session.request('GET', 'https://api.github.example.org/rate_limit')
+    assert time.monotonic() - started_at >= 0.2
+    assert scheduler.metrics()['throttle_seconds_total'] >= 0.2
+
+
+def test_map_batched():
+    scheduler = github_scheduler.GitHubRequestScheduler(max_concurrency=4)
+    running_by_repo = collections.Counter()
+    lock = threading.Lock()
+
+    def compare(item: tuple[str, int]) -> int:
+        repo, idx = item
+        with lock:
+            running_by_repo[repo] += 1
+            assert running_by_repo[repo] == 1
+        time.sleep(0.01)
+        with lock:
+            running_by_repo[repo] -= 1
+
+        if idx == 3:
+            raise RuntimeError('compare failed')
+        return idx
+
+    items = [(repo, idx) for repo in ('a', 'b', 'c') for idx in range(5)]
+    results = scheduler.map_batched(
+        func=compare,
+        items=items + items, # duplicates are processed once
+        batch_key=lambda item: item[0],
+    )
+
+    assert results == {item: item[1] for item in items if item[1] != 3}
+    assert scheduler.metrics()['queued'] == 0
@@ -0,0 +1,144 @@
+import collections
+import threading
+import time
+
+import pytest
+
+import oci.model as om
+
+import lookups
+
+
+OCM_REPOS = ('registry.example.org/first', 'registry.example.org/second')
+
+
+def ocm_repository_lookup(component, /):
+    yield from OCM_REPOS
+
+
+class ComponentDescriptorLookup:
+    '''
+    component descriptors are only present in the second OCM repository
+    '''
+    def __init__(self):
+        self.probes = collections.Counter()
+
+    def __call__(
+        self,
+        component_id,
+        ctx_repo=None,
+        absent_ok=False,
+    ):
+        self.probes[(component_id.name, ctx_repo)] += 1
+
+        if ctx_repo == OCM_REPOS[1] and component_id.name == 'example.org/present':
+            return component_id
+
+        if absent_ok:
+            return None
+        raise om.OciImageNotFoundException(component_id)
+
+
+def test_negative_cache_component_descriptor_lookup():
+    component_descriptor_lookup = ComponentDescriptorLookup()
+    cache_metrics = lookups.CacheMetrics()
+    lookup = lookups.negative_cache_component_descriptor_lookup(
+        component_descriptor_lookup=component_descriptor_lookup,
+        ocm_repository_lookup=ocm_repository_lookup,
+        ttl_seconds=60,
+        cache_metrics=cache_metrics,
+    )
+
+    for _ in range(3):
+        assert lookup('example.org/present:1.0.0').name == 'example.org/present'
+        assert lookup('example.org/absent:1.0.0') is None
+
+    # each OCM repository is only probed once for absent component descriptors
+    assert component_descriptor_lookup.probes == {
+        ('example.org/present', OCM_REPOS[0]): 1,
+        ('example.org/present', OCM_REPOS[1]): 3,
+        ('example.org/absent', OCM_REPOS[0]): 1,
+        ('example.org/absent', OCM_REPOS[1]): 1,
+    }
+
+    metrics = cache_metrics.metrics()
+    assert metrics['hits'] == 2 + 2 + 2
+    assert metrics['misses'] == 4 + 2
+    assert metrics['hit_ratio'] == 0.5
+
+    # explicitly passed OCM repositories are cached as well
+    assert lookup('example.org/absent:1.0.0', ctx_repo=OCM_REPOS[0]) is None
+    assert component_descriptor_lookup.probes[('example.org/absent', OCM_REPOS[0])] == 1
+
+
+class VersionLookup:
+    def __init__(self):
+        self.calls = 0
+        self.versions = {'1.0.0'}
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(
+        self,
+        component_id,
+        ctx_repo=None,
+        absent_ok=False,
+    ):
+        self.release.wait()
+        self.calls += 1
+        if component_id == 'example.org/absent':
+            return set()
+        return set(self.versions)
+
+
+def test_cached_version_lookup(monkeypatch):
+    now = 1000
+    monkeypatch.setattr(time, 'monotonic', lambda: now)
+
+    version_lookup = VersionLookup()
+    cache_metrics = lookups.CacheMetrics()
+    lookup = lookups.cached_version_lookup(
+        version_lookup=version_lookup,
+        ttl_seconds=60,
+        max_stale_seconds=600,
+        cache_metrics=cache_metrics,
+    )
+
+    assert lookup('example.org/component') == {'1.0.0'}
+    assert lookup('example.org/component') == {'1.0.0'}
+    assert version_lookup.calls == 1
+
+    # outdated versions are served while being revalidated in the background
+    version_lookup.versions.add('1.1.0')
+    version_lookup.release.clear()
+    now += 120
+
+    assert lookup('example.org/component') == {'1.0.0'}
+    # only one revalidation per component
+    assert lookup('example.org/component') == {'1.0.0'}
+
+    version_lookup.release.set()
+    for thread in threading.enumerate():
+        if thread.name.startswith('revalidate-versions-'):
+            thread.join()
+    assert version_lookup.calls == 2
+
+    assert lookup('example.org/component') == {'1.0.0', '1.1.0'}
+
+    # versions exceeding the max staleness are not served anymore
+    version_lookup.versions.add('1.2.0')
+    now += 60 + 600
+    assert lookup('example.org/component') == {'1.0.0', '1.1.0', '1.2.0'}
+    assert version_lookup.calls == 3
+
+    metrics = cache_metrics.metrics()
+    assert metrics == {
+        'hits': 2,
+        'stale_hits': 2,
+        'misses': 2,
+        'hit_ratio': 4 / 6,
+    }
+
+    assert lookup('example.org/absent', absent_ok=True) == set()
+    with pytest.raises(om.OciImageNotFoundException):
+        lookup('example.org/absent')
@@ -0,0 +1,285 @@
+import gzip
+import hashlib
+import io
+import tarfile
+
+import pytest
+
+import oci.model
+
+import malware.clamav
+import malware.scan
+import malware.verdict_cache
+
+
+EICAR = b'malicious-content'
+EICAR_DIGEST = f'sha256:{hashlib.sha256(EICAR).hexdigest()}'
+UNSCANNABLE = b'unscannable-content'
+
+
+def _tar(files: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w') as tf:
+        for name, content in files.items():
+            tar_info = tarfile.TarInfo(name=name)
+            tar_info.size = len(content)
+            tf.addfile(tar_info, io.BytesIO(content))
+
+    return buf.getvalue()
+
+
+def _tarfile(files: dict[str, bytes]) -> tarfile.TarFile:
+    return tarfile.open(fileobj=io.BytesIO(_tar(files)), mode='r')
+
+
+def _blob_ref(digest: str) -> oci.model.OciBlobRef:
+    return oci.model.OciBlobRef(
+        digest=digest,
+        mediaType='application/vnd.oci.image.layer.v1.tar',
+        size=0,
+    )
+
+
+class Blob:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def iter_content(self, chunk_size: int):
+        for idx in range(0, len(self.content), chunk_size):
+            yield self.content[idx:idx + chunk_size]
+
+
+class OciClient:
+    def __init__(self, images: dict[str, tuple[str, ...]], layers: dict[str, bytes]):
+        self.images = images
+        self.layers = layers
+        self.blob_requests = []
+
+    def manifest(self, image_reference: str, accept=None) -> oci.model.OciImageManifest:
+        return oci.model.OciImageManifest(
+            config=_blob_ref('sha256:config'),
+            layers=[_blob_ref(digest) for digest in self.images[image_reference]],
+        )
+
+    def blob(self, image_reference: str, digest: str) -> Blob:
+        self.blob_requests.append(digest)
+        return Blob(self.layers[digest])
+
+
+@pytest.fixture
+def scanned_files(monkeypatch) -> list[str]:
+    scanned_files = []
+
+    def scan(data, filename: str, context: str | None=None):
+        scanned_files.append(filename)
+        chunks = list(data)
+        # files are streamed to clamd in bounded chunks
+        assert all(len(chunk) <= malware.scan.CHUNK_SIZE for chunk in chunks)
+        content = b''.join(chunks)
+
+        if content == UNSCANNABLE:
+            raise RuntimeError('clamd failed to scan content')
+
+        if content != EICAR:
+            return None
+
+        return malware.clamav.malware_finding(
+            malware='Eicar-Signature',
+            filename=filename,
+            content_digest=EICAR_DIGEST,
+            octets_count=len(content),
+            scan_duration_seconds=1,
+            context=context,
+        )
+
+    monkeypatch.setattr(malware.clamav, 'scan', scan)
+    monkeypatch.setattr(
+        malware.clamav,
+        'clamscan_version',
+        lambda: ('1.2.2', 27315, '2024-06-23T08:23:58'),
+    )
+
+    return scanned_files
+
+
+def test_verdict_cache(tmp_path, scanned_files):
+    path = str(tmp_path / 'verdicts.sqlite')
+    files = {
+        'clean': b'clean-content',
+        'copy-of-clean': b'clean-content',
+        'malware': EICAR,
+    }
+
+    verdict_cache = malware.verdict_cache.VerdictCache(signature_version=1, path=path)
+    findings = list(malware.scan.scan_tarfile(
+        tf=_tarfile(files),
+        context='layer-1',
+        verdict_cache=verdict_cache,
+    ))
+
+    # identical files are only scanned once
+    assert scanned_files == ['clean', 'malware']
+    assert [finding.finding.filename for finding in findings] == ['malware']
+    assert verdict_cache.statistics() == {
+        'signature_version': 1,
+        'hits': 1,
+        'misses': 2,
+        'hit_ratio': 1 / 3,
+        'layer_hits': 0,
+        'layer_misses': 0,
+        'layer_hit_ratio': None,
+    }
+
+    # verdicts are shared among layers and survive restarts
+    scanned_files.clear()
+    verdict_cache = malware.verdict_cache.VerdictCache(signature_version=1, path=path)
+    findings = list(malware.scan.scan_tarfile(
+        tf=_tarfile(files),
+        context='layer-2',
+        verdict_cache=verdict_cache,
+    ))
+
+    assert scanned_files == []
+    assert verdict_cache.hit_ratio == 1
+    assert len(findings) == 1
+    assert findings[0].finding.malware == 'Eicar-Signature'
+    assert findings[0].finding.context == 'layer-2'
+    assert findings[0].octets_count == len(EICAR)
+
+    # verdicts are invalidated by signature updates
+    verdict_cache = malware.verdict_cache.VerdictCache(signature_version=2, path=path)
+    findings = list(malware.scan.scan_tarfile(
+        tf=_tarfile(files),
+        context='layer-1',
+        verdict_cache=verdict_cache,
+    ))
+
+    assert scanned_files == ['clean', 'malware']
+    assert len(findings) == 1
+    assert verdict_cache.verdict(content_digest=EICAR_DIGEST).malware == 'Eicar-Signature'
+
+    verdict_cache = malware.verdict_cache.VerdictCache(signature_version=1, path=path)
+    assert verdict_cache.verdict(content_digest=EICAR_DIGEST) is None
+
+
+def test_layer_findings(tmp_path, scanned_files):
+    path = str(tmp_path / 'verdicts.sqlite')
+    oci_client = OciClient(
+        images={
+            'example.org/image:1.0.0': ('sha256:base', 'sha256:app-1'),
+            'example.org/image:1.1.0': ('sha256:base', 'sha256:app-2'),
+        },
+        layers={
+            'sha256:base': _tar({'base': b'base-content', 'malware': EICAR}),
+            'sha256:app-1': _tar({'app': b'app-content-1'}),
+            'sha256:app-2': _tar({'app': b'app-content-2'}),
+        },
+    )
+
+    verdict_cache = malware.verdict_cache.VerdictCache(signature_version=1, path=path)
+    findings = list(malware.scan.scan_oci_image(
+        image_reference='example.org/image:1.0.0',
+        oci_client=oci_client,
+        verdict_cache=verdict_cache,
+    ))
+    assert len(findings) == 1
+    assert sorted(oci_client.blob_requests) == ['sha256:app-1', 'sha256:base']
+    assert verdict_cache.layer_hit_ratio == 0
+
+    # unchanged layers are neither downloaded nor scanned, but their findings are reported
+    oci_client.blob_requests.clear()
+    scanned_files.clear()
+    verdict_cache = malware.verdict_cache.VerdictCache(signature_version=1, path=path)
+    new_findings = list(malware.scan.scan_oci_image(
+        image_reference='example.org/image:1.1.0',
+        oci_client=oci_client,
+        verdict_cache=verdict_cache,
+    ))
+    assert new_findings == findings
+    assert oci_client.blob_requests == ['sha256:app-2']
+    assert scanned_files == ['app']
+    assert verdict_cache.layer_hit_ratio == 0.5
+
+    # layers are rescanned after signature updates
+    oci_client.blob_requests.clear()
+    verdict_cache = malware.verdict_cache.VerdictCache(signature_version=2, path=path)
+    list(malware.scan.scan_oci_image(
+        image_reference='example.org/image:1.1.0',
+        oci_client=oci_client,
+        verdict_cache=verdict_cache,
+    ))
+    assert sorted(oci_client.blob_requests) == ['sha256:app-2', 'sha256:base']
+
+
+def test_scan_error(tmp_path, scanned_files):
+    oci_client = OciClient(
+        images={},
+        layers={
+            'sha256:layer': _tar({'clean': b'clean-content', 'unscannable': UNSCANNABLE}),
+        },
+    )
+    verdict_cache = malware.verdict_cache.VerdictCache(
+        signature_version=1,
+        path=str(tmp_path / 'verdicts.sqlite'),
+    )
+
+    with pytest.raises(RuntimeError):
+        list(malware.scan.scan_oci_blob(
+            blob_reference=_blob_ref('sha256:layer'),
+            image_reference='example.org/image:1.0.0',
+            oci_client=oci_client,
+            verdict_cache=verdict_cache,
+        ))
+
+    # neither the unscanned file nor the incompletely scanned layer are cached
+    unscannable_digest = f'sha256:{hashlib.sha256(UNSCANNABLE).hexdigest()}'
+    assert verdict_cache.verdict(content_digest=unscannable_digest) is None
+    assert verdict_cache.layer_findings(layer_digest='sha256:layer') is None
+
+
+def test_scan_streamed_layer(tmp_path, scanned_files):
+    large_content = b'x' * (malware.scan.MAX_BUFFERED_OCTETS + 1)
+    oci_client = OciClient(
+        images={},
+        layers={
+            'sha256:layer': gzip.compress(_tar({
+                'large': large_content,
+                'malware': EICAR,
+            })),
+            'sha256:no-tar': EICAR,
+        },
+    )
+
+    findings = list(malware.scan.scan_oci_blob(
+        blob_reference=_blob_ref('sha256:layer'),
+        image_reference='example.org/image:1.0.0',
+        oci_client=oci_client,
+    ))
+    assert scanned_files == ['large', 'malware']
+    assert [finding.finding.filename for finding in findings] == ['malware']
+    assert findings[0].finding.context == 'sha256:layer'
+
+    # blobs which are no tarfiles are scanned as a whole
+    scanned_files.clear()
+    findings = list(malware.scan.scan_oci_blob(
+        blob_reference=_blob_ref('sha256:no-tar'),
+        image_reference='example.org/image:1.0.0',
+        oci_client=oci_client,
+    ))
+    assert scanned_files == ['sha256:no-tar']
+    assert len(findings) == 1
+    assert oci_client.blob_requests == ['sha256:layer', 'sha256:no-tar', 'sha256:no-tar']
+
+    # large files are not buffered, hence they are scanned regardless of cached verdicts
+    for _ in range(2):
+        scanned_files.clear()
+        list(malware.scan.scan_oci_blob_filewise(
+            blob_reference=_blob_ref('sha256:layer'),
+            image_reference='example.org/image:1.0.0',
+            oci_client=oci_client,
+            verdict_cache=malware.verdict_cache.VerdictCache(
+                signature_version=1,
+                path=str(tmp_path / 'verdicts.sqlite'),
+            ),
+        ))
+    assert scanned_files == ['large']
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import oci.model
+
+import malware.scheduler
+
+
+def _blob_ref(digest: str, size: int) -> oci.model.OciBlobRef:
+    return oci.model.OciBlobRef(
+        digest=digest,
+        mediaType='application/vnd.oci.image.layer.v1.tar',
+        size=size,
+    )
+
+
+class ConcurrencyTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def scan(self, blob_reference: oci.model.OciBlobRef) -> list[str]:
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        time.sleep(0.02)
+
+        with self.lock:
+            self.running -= 1
+
+        return [f'{blob_reference.digest}-finding']
+
+
+def test_scan_layers_per_registry_concurrency():
+    scheduler = malware.scheduler.ScanScheduler(
+        max_workers=8,
+        max_concurrency_per_registry=2,
+    )
+    tracker = ConcurrencyTracker()
+    layer_blobs = [_blob_ref(f'sha256:{idx}', size=1) for idx in range(8)]
+
+    findings = list(scheduler.scan_layers(
+        scan_func=tracker.scan,
+        image_reference='registry.example.org/image:1.0.0',
+        layer_blobs=layer_blobs,
+    ))
+
+    # findings are yielded in order of the layers
+    assert findings == [f'sha256:{idx}-finding' for idx in range(8)]
+    assert tracker.max_running == 2
+
+    metrics = scheduler.metrics()
+    assert metrics['scanned_layers_count'] == 8
+    assert metrics['in_flight_octets'] == 0
+    assert metrics['in_flight_by_registry'] == {}
+    assert sorted(
+        layer_metrics.layer_digest for layer_metrics in scheduler.recent_metrics
+    ) == [f'sha256:{idx}' for idx in range(8)]
+
+
+def test_scan_layers_in_flight_octets():
+    scheduler = malware.scheduler.ScanScheduler(
+        max_workers=8,
+        max_in_flight_octets=100,
+    )
+    tracker = ConcurrencyTracker()
+
+    findings = list(scheduler.scan_layers(
+        scan_func=tracker.scan,
+        image_reference='registry.example.org/image:1.0.0',
+        # a single layer exceeding the limit is scanned nevertheless
+        layer_blobs=[_blob_ref(f'sha256:{idx}', size=60) for idx in range(4)] + [
+            _blob_ref('sha256:large', size=200),
+        ],
+    ))
+
+    assert len(findings) == 5
+    assert tracker.max_running == 1
@@ -0,0 +1,155 @@
+import datetime
+import json
+
+import falcon
+import falcon.testing
+import pytest
+
+import dso.model
+import ocm
+
+import deliverydb
+import deliverydb.util as du
+import metadata
+import middleware.db_session
+import middleware.decompressor
+
+
+def _vulnerability(
+    component_version: str,
+    cve: str,
+) -> dso.model.ArtefactMetadata:
+    return dso.model.ArtefactMetadata(
+        artefact=dso.model.ComponentArtefactId(
+            component_name='example.org/a',
+            component_version=component_version,
+            artefact_kind=dso.model.ArtefactKind.RESOURCE,
+            artefact=dso.model.LocalArtefactId(
+                artefact_name='image',
+                artefact_version=component_version,
+                artefact_type='ociImage',
+                artefact_extra_id={},
+            ),
+        ),
+        meta=dso.model.Metadata(
+            datasource=dso.model.Datasource.BDBA,
+            type=dso.model.Datatype.VULNERABILITY,
+            creation_date=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+            last_update=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+        ),
+        data=dso.model.VulnerabilityFinding(
+            package_name='package',
+            package_version='1.0.0',
+            base_url='https://bdba.example.org',
+            report_url=None,
+            product_id=1,
+            group_id=1,
+            severity='HIGH',
+            cve=cve,
+            cvss_v3_score=7.5,
+            cvss=dict(),
+            summary=None,
+        ),
+    )
+
+
+def component_descriptor_lookup(
+    component_id: ocm.ComponentIdentity,
+    ocm_repo: ocm.OcmRepository=None,
+) -> ocm.ComponentDescriptor:
+    return ocm.ComponentDescriptor(
+        meta=ocm.Metadata(),
+        component=ocm.Component(
+            name=component_id.name,
+            version=component_id.version,
+            repositoryContexts=[],
+            provider='example.org',
+            sources=[],
+            componentReferences=[],
+            resources=[],
+        ),
+    )
+
+
+@pytest.fixture
+def client(tmp_path) -> falcon.testing.TestClient:
+    db_url = f'sqlite:///{tmp_path}/delivery-db.sqlite'
+
+    session = deliverydb.sqlalchemy_session(db_url)
+    for idx in range(25):
+        session.add(du.to_db_artefact_metadata(_vulnerability(
+            component_version=f'1.{idx % 2}.0',
+            cve=f'CVE-{idx}',
+        )))
+    session.commit()
+    session.close()
+
+    app = falcon.App(
+        middleware=[
+            middleware.decompressor.DecompressorMiddleware(),
+            middleware.db_session.DBSessionLifecycle(db_url=db_url),
+        ],
+    )
+    app.add_route(
+        '/artefacts/metadata/query',
+        metadata.ArtefactMetadata(
+            eol_client=None,
+            artefact_metadata_cfg_by_type={},
+            component_descriptor_lookup=component_descriptor_lookup,
+        ),
+        suffix='query',
+    )
+
+    return falcon.testing.TestClient(app)
+
+
+def _query(
+    client: falcon.testing.TestClient,
+    stream: bool=False,
+    headers: dict=None,
+) -> falcon.testing.Result:
+    return client.simulate_post(
+        '/artefacts/metadata/query',
+        json={
+            'entries': [{
+                'component_name': 'example.org/a',
+                'component_version': '1.0.0',
+            }],
+        },
+        params={
+            'type': dso.model.Datatype.VULNERABILITY,
+            'stream': stream,
+        },
+        headers=headers,
+    )
+
+
+def test_stream_equals_regular_response(client, monkeypatch):
+    # ensure multiple chunks are streamed
+    monkeypatch.setattr(metadata, 'STREAM_BATCH_SIZE', 5)
+
+    expected = _query(client).json
+    assert len(expected) == 13
+
+    streamed = _query(client, stream=True)
+    assert streamed.headers['content-type'] == falcon.MEDIA_JSON
+    assert streamed.json == expected
+
+    ndjson = _query(client, headers={'Accept': metadata.NDJSON_MEDIA_TYPE})
+    assert ndjson.headers['content-type'] == metadata.NDJSON_MEDIA_TYPE
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == expected
+
+
+@pytest.mark.parametrize('ndjson', (False, True))
+def test_iter_json_chunks(ndjson):
+    objects = [{'idx': idx} for idx in range(7)]
+
+    chunks = list(metadata.iter_json_chunks(objects, ndjson=ndjson, batch_size=3))
+    text = b''.join(chunks).decode('utf-8')
+
+    if ndjson:
+        assert [json.loads(line) for line in text.splitlines()] == objects
+    else:
+        assert json.loads(text) == objects
+
+    assert b''.join(metadata.iter_json_chunks((), ndjson=ndjson)) == (b'' if ndjson else b'[]')
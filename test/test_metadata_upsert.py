@@ -0,0 +1,367 @@
+'''
+compares the bulk upsert of `PUT /artefacts/metadata` with the previous implementation (which
+linearly searched existing entries for each supplied entry) and benchmarks large uploads, as well
+as the bulk deletion of `DELETE /artefacts/metadata` with the previous (per-entry) deletion
+'''
+import datetime
+import logging
+import os
+import time
+import types
+
+import falcon
+import pytest
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql
+import sqlalchemy.dialects.sqlite
+import sqlalchemy.orm
+
+import dso.model
+
+import deliverydb.migrations
+import deliverydb.model as dm
+import deliverydb.util as du
+import metadata
+
+
+logger = logging.getLogger(__name__)
+
+# the previous implementation scales quadratically, hence compare both for small uploads only
+ENTRIES_COUNT = 200
+# set to e.g. `50000` to benchmark large uploads (skipped otherwise)
+BENCHMARK_ENTRIES_COUNT = int(os.environ.get('UPSERT_BENCHMARK_ENTRIES_COUNT', 0))
+
+
+def _entry(
+    idx: int,
+    component_version: str='1.0.0',
+    last_update: str='2024-01-01T00:00:00',
+    severity: str='HIGH',
+    datatype: str=dso.model.Datatype.VULNERABILITY,
+) -> dict:
+    artefact = {
+        'component_name': 'example.org/a',
+        'component_version': component_version,
+        'artefact_kind': dso.model.ArtefactKind.RESOURCE,
+        'artefact': {
+            'artefact_name': f'image-{idx % 10}',
+            'artefact_version': component_version,
+            'artefact_type': 'ociImage',
+            'artefact_extra_id': {},
+        },
+    }
+    meta = {
+        'datasource': dso.model.Datasource.BDBA,
+        'type': datatype,
+        'creation_date': '2024-01-01T00:00:00',
+        'last_update': last_update,
+    }
+
+    if datatype == dso.model.Datatype.STRUCTURE_INFO:
+        data = {
+            'package_name': f'package-{idx}',
+            'package_version': '1.0.0',
+            'base_url': 'https://bdba.example.org',
+            'report_url': 'https://bdba.example.org/products/1',
+            'product_id': 1,
+            'group_id': 1,
+            'licenses': [],
+            'filesystem_paths': [],
+        }
+    else:
+        data = {
+            'package_name': f'package-{idx % 100}',
+            'package_version': '1.0.0',
+            'base_url': 'https://bdba.example.org',
+            'report_url': 'https://bdba.example.org/products/1',
+            'product_id': 1,
+            'group_id': 1,
+            'severity': severity,
+            'cve': f'CVE-2024-{idx}',
+            'cvss_v3_score': 7.5,
+            'cvss': {},
+            'summary': None,
+        }
+
+    return {
+        'artefact': artefact,
+        'meta': meta,
+        'data': data,
+        'discovery_date': (
+            datetime.date(2024, 1, 1) + datetime.timedelta(days=idx % 30)
+        ).isoformat(),
+    }
+
+
+def _legacy_put(
+    session: sqlalchemy.orm.Session,
+    entries: list[dict],
+):
+    '''
+    previous implementation of `metadata.ArtefactMetadata.on_put`
+    '''
+    artefact_metadata = [
+        dso.model.ArtefactMetadata.from_dict(metadata._fill_default_values(entry))
+        for entry in entries
+    ]
+
+    artefacts = dict()
+    for artefact_metadatum in artefact_metadata:
+        key = (artefact_metadatum.artefact, artefact_metadatum.meta.type)
+        if key not in artefacts:
+            artefacts[key] = artefact_metadatum
+
+    existing_entries = session.query(dm.ArtefactMetaData).filter(
+        sa.or_(*(
+            du.ArtefactMetadataFilters.by_name_and_type(
+                artefact_metadata=dm.ArtefactMetaData(
+                    component_name=artefact.artefact.component_name,
+                    artefact_name=artefact.artefact.artefact.artefact_name,
+                    type=artefact.meta.type,
+                    datasource=artefact.meta.datasource,
+                ),
+            ) for artefact in artefacts.values()
+        )),
+    ).all()
+
+    created_artefacts: list[dm.ArtefactMetaData] = []
+
+    for artefact_metadatum in artefact_metadata:
+        metadata_entry = du.to_db_artefact_metadata(
+            artefact_metadata=artefact_metadatum,
+        )
+
+        reusable_discovery_date = None
+        for existing_entry in existing_entries + created_artefacts:
+            if (
+                existing_entry.type != metadata_entry.type
+                or existing_entry.component_name != metadata_entry.component_name
+                or existing_entry.artefact_kind != metadata_entry.artefact_kind
+                or existing_entry.artefact_name != metadata_entry.artefact_name
+                or existing_entry.artefact_type != metadata_entry.artefact_type
+            ):
+                continue
+
+            if not reusable_discovery_date and (key := metadata.discovery_date_key(
+                metadata_entry,
+            )) and key == metadata.discovery_date_key(existing_entry):
+                reusable_discovery_date = existing_entry.discovery_date
+
+            if (
+                existing_entry.component_version != metadata_entry.component_version
+                or existing_entry.artefact_version != metadata_entry.artefact_version
+                or existing_entry.data_key != metadata_entry.data_key
+            ):
+                continue
+
+            break
+        else:
+            if reusable_discovery_date:
+                metadata_entry.discovery_date = reusable_discovery_date
+
+            session.add(metadata_entry)
+            created_artefacts.append(metadata_entry)
+            continue
+
+        existing_entry.data = metadata_entry.data
+
+        del existing_entry.meta['last_update']
+        existing_entry.meta = dict(
+            **existing_entry.meta,
+            last_update=metadata_entry.meta['last_update'],
+        )
+
+    session.commit()
+
+
+def _put(
+    session: sqlalchemy.orm.Session,
+    entries: list[dict],
+) -> falcon.Response:
+    req = types.SimpleNamespace(
+        context=types.SimpleNamespace(
+            media={'entries': entries},
+            db_session=session,
+        ),
+    )
+    resp = falcon.Response()
+
+    metadata.ArtefactMetadata(
+        eol_client=None,
+        artefact_metadata_cfg_by_type={},
+        component_descriptor_lookup=None,
+    ).on_put(req=req, resp=resp)
+
+    return resp
+
+
+def _session() -> sqlalchemy.orm.Session:
+    engine = sa.create_engine('sqlite://')
+    deliverydb.migrations.migrate(engine)
+
+    return sqlalchemy.orm.Session(engine)
+
+
+def _rows(session: sqlalchemy.orm.Session) -> list[tuple]:
+    columns = [
+        column for column in dm.ArtefactMetaData.__table__.columns
+        if column.key != 'id'
+    ]
+
+    return sorted(
+        (
+            tuple(str(value) for value in row)
+            for row in session.execute(sa.select(*columns))
+        ),
+    )
+
+
+def _uploads(entries_count: int) -> tuple[list[dict], list[dict]]:
+    initial_entries = [
+        _entry(idx=idx)
+        for idx in range(entries_count)
+    ]
+
+    entries = [
+        # unchanged
+        *(_entry(idx=idx) for idx in range(0, entries_count // 4)),
+        # updated
+        *(
+            _entry(idx=idx, last_update='2024-02-01T00:00:00', severity='LOW')
+            for idx in range(entries_count // 4, entries_count // 2)
+        ),
+        # new component version, discovery date is re-used
+        *(
+            _entry(idx=idx, component_version='2.0.0')
+            for idx in range(entries_count // 2, entries_count)
+        ),
+        # newly discovered
+        *(_entry(idx=idx) for idx in range(entries_count, entries_count + entries_count // 4)),
+        *(
+            _entry(idx=idx, datatype=dso.model.Datatype.STRUCTURE_INFO)
+            for idx in range(entries_count // 4)
+        ),
+    ]
+
+    # subsequent duplicates update the payload of the first entry
+    entries.append(_entry(idx=0, last_update='2024-03-01T00:00:00', severity='LOW'))
+
+    # discovery dates must be re-used independent of the supplied ones
+    for entry in entries:
+        entry['discovery_date'] = '2024-06-01'
+
+    return initial_entries, entries
+
+
+def test_put_equals_legacy_put():
+    initial_entries, entries = _uploads(entries_count=ENTRIES_COUNT)
+
+    with _session() as legacy_session, _session() as session:
+        _legacy_put(legacy_session, initial_entries)
+        _put(session, initial_entries)
+        assert _rows(session) == _rows(legacy_session)
+
+        start = time.perf_counter()
+        _legacy_put(legacy_session, entries)
+        legacy_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        resp = _put(session, entries)
+        duration = time.perf_counter() - start
+
+        logger.info(f'{ENTRIES_COUNT=}: {legacy_duration=:.3f}s, {duration=:.3f}s')
+
+        assert _rows(session) == _rows(legacy_session)
+        assert resp.status == falcon.HTTP_CREATED
+        assert resp.media == {
+            'created': ENTRIES_COUNT // 2 + ENTRIES_COUNT // 4 + ENTRIES_COUNT // 4,
+            'updated': ENTRIES_COUNT // 4 + 1,
+            'unchanged': ENTRIES_COUNT // 4 - 1,
+        }
+
+
+@pytest.mark.parametrize('dialect_name', ('sqlite', 'postgresql'))
+def test_upsert_statement(dialect_name):
+    statement = du.upsert_artefact_metadata_statement(dialect_name=dialect_name)
+    dialect = getattr(sa.dialects, dialect_name).dialect()
+
+    # conflict target must be rendered literally to match the unique index
+    assert "ON CONFLICT (type, component_name, coalesce(component_version, '')" in str(
+        statement.compile(dialect=dialect),
+    )
+    assert "WHERE type != 'rescorings' DO UPDATE" in str(statement.compile(dialect=dialect))
+
+
+@pytest.mark.skipif(not BENCHMARK_ENTRIES_COUNT, reason='UPSERT_BENCHMARK_ENTRIES_COUNT not set')
+def test_put_benchmark():
+    initial_entries, entries = _uploads(entries_count=BENCHMARK_ENTRIES_COUNT)
+
+    with _session() as session:
+        start = time.perf_counter()
+        _put(session, initial_entries)
+        initial_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        resp = _put(session, entries)
+        duration = time.perf_counter() - start
+
+        logger.info(f'{BENCHMARK_ENTRIES_COUNT=}: {initial_duration=:.3f}s, {duration=:.3f}s')
+
+        assert resp.media['unchanged'] == BENCHMARK_ENTRIES_COUNT // 4 - 1
+        assert session.query(dm.ArtefactMetaData).count() == BENCHMARK_ENTRIES_COUNT * 2
+
+
+def _delete(
+    session: sqlalchemy.orm.Session,
+    entries: list[dict],
+) -> falcon.Response:
+    req = types.SimpleNamespace(
+        context=types.SimpleNamespace(
+            media={'entries': entries},
+            db_session=session,
+        ),
+    )
+    resp = falcon.Response()
+
+    metadata.ArtefactMetadata(
+        eol_client=None,
+        artefact_metadata_cfg_by_type={},
+        component_descriptor_lookup=None,
+    ).on_delete(req=req, resp=resp)
+
+    return resp
+
+
+def test_delete_equals_legacy_delete(monkeypatch):
+    # ensure multiple batches are deleted
+    monkeypatch.setattr(metadata, 'DELETE_BATCH_SIZE', 7)
+
+    initial_entries = [
+        *(_entry(idx=idx) for idx in range(50)),
+        *(_entry(idx=idx, component_version=None) for idx in range(50)),
+        *(_entry(idx=idx, datatype=dso.model.Datatype.STRUCTURE_INFO) for idx in range(50)),
+    ]
+    entries = [
+        *(_entry(idx=idx) for idx in range(0, 50, 2)),
+        *(_entry(idx=idx, component_version=None) for idx in range(0, 50, 3)),
+        *(_entry(idx=idx, datatype=dso.model.Datatype.STRUCTURE_INFO) for idx in range(0, 50, 4)),
+        # not existing
+        _entry(idx=100),
+    ]
+
+    with _session() as legacy_session, _session() as session:
+        _put(legacy_session, initial_entries)
+        _put(session, initial_entries)
+
+        for entry in entries:
+            legacy_session.query(dm.ArtefactMetaData).filter(
+                du.ArtefactMetadataFilters.by_single_scan_result(du.to_db_artefact_metadata(
+                    artefact_metadata=dso.model.ArtefactMetadata.from_dict(entry),
+                )),
+            ).delete()
+        legacy_session.commit()
+
+        resp = _delete(session, entries)
+
+        assert resp.media == {'deleted': 25 + 17 + 13}
+        assert _rows(session) == _rows(legacy_session)
@@ -0,0 +1,234 @@
+'''
+micro-benchmarks comparing the previous (dataclass round trip + `json`) serialisation with the
+direct serialisation from database columns (+ `orjson` if available) for the endpoints
+`/artefacts/metadata/query`, `/components/compliance-summary` and `/rescore`
+'''
+import dataclasses
+import datetime
+import json
+import logging
+import os
+import time
+
+import dacite
+import pytest
+import sqlalchemy as sa
+import sqlalchemy.orm
+
+import ci.util
+import dso.model
+
+import compliance_summary as cs
+import deliverydb.migrations
+import deliverydb.model as dm
+import deliverydb.util as du
+import metadata
+import middleware.json_translator
+import rescore
+import util
+
+
+logger = logging.getLogger(__name__)
+
+# set to e.g. `5000` to benchmark large responses
+ENTRIES_COUNT = int(os.environ.get('SERIALISATION_BENCHMARK_ENTRIES_COUNT', 200))
+
+
+def _vulnerability(idx: int) -> dso.model.ArtefactMetadata:
+    return dso.model.ArtefactMetadata(
+        artefact=dso.model.ComponentArtefactId(
+            component_name='example.org/a',
+            component_version='1.0.0',
+            artefact_kind=dso.model.ArtefactKind.RESOURCE,
+            artefact=dso.model.LocalArtefactId(
+                artefact_name=f'image-{idx % 50}',
+                artefact_version='1.0.0',
+                artefact_type='ociImage',
+                artefact_extra_id={'platform': 'linux/amd64'},
+            ),
+        ),
+        meta=dso.model.Metadata(
+            datasource=dso.model.Datasource.BDBA,
+            type=dso.model.Datatype.VULNERABILITY,
+            creation_date=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+            last_update=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+        ),
+        data=dso.model.VulnerabilityFinding(
+            package_name=f'package-{idx % 100}',
+            package_version='1.0.0',
+            base_url='https://bdba.example.org',
+            report_url='https://bdba.example.org/products/1',
+            product_id=1,
+            group_id=1,
+            severity='HIGH',
+            cve=f'CVE-2024-{idx}',
+            cvss_v3_score=7.5,
+            cvss=dict(),
+            summary='a vulnerability',
+        ),
+        discovery_date=datetime.date(2024, 1, 1),
+    )
+
+
+def _benchmark(
+    name: str,
+    previous: callable,
+    current: callable,
+) -> tuple[bytes, bytes]:
+    start = time.perf_counter()
+    previous_result = previous()
+    previous_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current_result = current()
+    current_duration = time.perf_counter() - start
+
+    logger.info(f'{name}: {previous_duration=:.3f}s, {current_duration=:.3f}s')
+
+    return previous_result, current_result
+
+
+@pytest.fixture(scope='module')
+def session() -> sqlalchemy.orm.Session:
+    engine = sa.create_engine('sqlite://')
+    deliverydb.migrations.migrate(engine)
+
+    with sqlalchemy.orm.Session(engine) as session:
+        session.add_all(
+            du.to_db_artefact_metadata(_vulnerability(idx))
+            for idx in range(ENTRIES_COUNT)
+        )
+        session.commit()
+
+        yield session
+
+
+def test_artefact_metadata_query(session):
+    def previous() -> bytes:
+        findings = [
+            du.db_artefact_metadata_to_dso(raw)
+            for raw in session.query(dm.ArtefactMetaData).all()
+        ]
+        return json.dumps(
+            [
+                dataclasses.asdict(
+                    obj=finding,
+                    dict_factory=ci.util.dict_to_json_factory,
+                ) for finding in findings
+            ],
+            default=middleware.json_translator.json_serializer,
+        ).encode('utf-8')
+
+    resource = metadata.ArtefactMetadata(
+        eol_client=None,
+        artefact_metadata_cfg_by_type={},
+        component_descriptor_lookup=None,
+    )
+
+    def current() -> bytes:
+        return middleware.json_translator.dumps([
+            resource._artefact_metadata_dict(raw)
+            for raw in session.query(*du.artefact_metadata_wire_columns)
+        ])
+
+    previous_result, current_result = _benchmark(
+        name='artefact-metadata query',
+        previous=previous,
+        current=current,
+    )
+
+    # the wire representation does not contain default values which are not stored in the
+    # database, hence hydrate it for comparison
+    assert json.loads(previous_result) == [
+        json.loads(middleware.json_translator.dumps(dataclasses.asdict(
+            obj=dso.model.ArtefactMetadata.from_dict(entry),
+            dict_factory=ci.util.dict_to_json_factory,
+        )))
+        for entry in json.loads(current_result)
+    ]
+
+
+def test_compliance_summary(session):
+    def summaries(query) -> list[dict]:
+        findings = [
+            du.db_artefact_metadata_to_dso(raw)
+            for raw in query
+        ]
+
+        return [
+            dataclasses.asdict(
+                obj=summary,
+                dict_factory=util.dict_factory_enum_name_serialisiation,
+            )
+            for summary in cs.component_summaries(
+                findings=findings,
+                rescorings=(),
+                components=(),
+                eol_client=None,
+                artefact_metadata_cfg_by_type={},
+            )
+        ] + [
+            {'severity': cs.severity_for_finding(finding)}
+            for finding in findings
+        ]
+
+    def previous() -> bytes:
+        return json.dumps(
+            {'complianceSummary': summaries(session.query(dm.ArtefactMetaData).all())},
+            default=middleware.json_translator.json_serializer,
+        ).encode('utf-8')
+
+    def current() -> bytes:
+        return middleware.json_translator.dumps(
+            {'complianceSummary': summaries(session.query(*du.artefact_metadata_wire_columns))},
+        )
+
+    previous_result, current_result = _benchmark(
+        name='compliance summary',
+        previous=previous,
+        current=current,
+    )
+
+    assert json.loads(previous_result) == json.loads(current_result)
+
+
+def test_rescoring_proposals(session):
+    findings = [
+        du.db_artefact_metadata_to_dso(raw)
+        for raw in session.query(*du.artefact_metadata_wire_columns)
+    ]
+    rescoring_proposals = tuple(
+        dacite.from_dict(
+            data_class=rescore.RescoringProposal,
+            data={
+                'finding': {
+                    'package_name': finding.data.package_name,
+                    'package_versions': (finding.data.package_version,),
+                    'severity': finding.data.severity,
+                    'cve': finding.data.cve,
+                    'cvss_v3_score': finding.data.cvss_v3_score,
+                    'cvss': 'AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H',
+                    'summary': finding.data.summary,
+                    'urls': [f'https://nvd.nist.gov/vuln/detail/{finding.data.cve}'],
+                    'filesystem_paths': [],
+                },
+                'finding_type': dso.model.Datatype.VULNERABILITY,
+                'severity': finding.data.severity,
+                'matching_rules': [dso.model.MetaRescoringRules.ORIGINAL_SEVERITY],
+                'applicable_rescorings': (),
+                'discovery_date': finding.discovery_date.isoformat(),
+                'sprint': None,
+            },
+        ) for finding in findings
+    )
+
+    previous_result, current_result = _benchmark(
+        name='rescoring proposals',
+        previous=lambda: json.dumps(
+            rescoring_proposals,
+            default=middleware.json_translator.json_serializer,
+        ).encode('utf-8'),
+        current=lambda: middleware.json_translator.dumps(rescoring_proposals),
+    )
+
+    assert json.loads(previous_result) == json.loads(current_result)
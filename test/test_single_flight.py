@@ -0,0 +1,129 @@
+import concurrent.futures
+import threading
+import time
+
+import falcon
+import falcon.testing
+import pytest
+
+import middleware.single_flight
+
+
+class ExpensiveResource:
+    single_flight = True
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = False
+
+    def on_get(self, req: falcon.Request, resp: falcon.Response):
+        self.calls += 1
+        self.release.wait()
+
+        if self.fail:
+            self.fail = False
+            raise falcon.HTTPInternalServerError()
+
+        resp.media = {
+            'name': req.get_param('name'),
+            'calls': self.calls,
+        }
+
+
+class CachedResource(ExpensiveResource):
+    response_cache_ttl_seconds = 30
+
+
+@pytest.fixture
+def resources() -> tuple[ExpensiveResource, CachedResource]:
+    return ExpensiveResource(), CachedResource()
+
+
+@pytest.fixture
+def client(resources) -> falcon.testing.TestClient:
+    expensive_resource, cached_resource = resources
+
+    app = falcon.App(
+        middleware=[middleware.single_flight.SingleFlight()],
+    )
+    app.add_route('/expensive', expensive_resource)
+    app.add_route('/cached', cached_resource)
+
+    return falcon.testing.TestClient(app)
+
+
+def _concurrent_gets(
+    client: falcon.testing.TestClient,
+    resource: ExpensiveResource,
+    path: str,
+    params: dict,
+    requests_count: int=8,
+) -> list[falcon.testing.Result]:
+    resource.release.clear()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=requests_count) as tpe:
+        futures = [
+            tpe.submit(client.simulate_get, path, params=params)
+            for _ in range(requests_count)
+        ]
+        # let all requests arrive before the first one completes
+        time.sleep(0.2)
+        resource.release.set()
+
+        return [future.result() for future in futures]
+
+
+def test_coalesce_concurrent_requests(client, resources):
+    expensive_resource, _ = resources
+
+    results = _concurrent_gets(client, expensive_resource, '/expensive', {'name': 'foo'})
+
+    assert expensive_resource.calls == 1
+    assert all(result.status_code == 200 for result in results)
+    assert all(result.json == {'name': 'foo', 'calls': 1} for result in results)
+    assert len({result.headers['etag'] for result in results}) == 1
+
+    # responses are not cached unless the resource specifies a ttl
+    assert client.simulate_get('/expensive', params={'name': 'foo'}).json['calls'] == 2
+    # different query parameters result in separate computations
+    assert client.simulate_get('/expensive', params={'name': 'bar'}).json['calls'] == 3
+
+
+def test_failed_computation(client, resources):
+    expensive_resource, _ = resources
+    expensive_resource.fail = True
+
+    results = _concurrent_gets(
+        client,
+        expensive_resource,
+        '/expensive',
+        {'name': 'foo'},
+        requests_count=4,
+    )
+
+    # requests which waited for the failed computation compute the response on their own
+    assert sorted(result.status_code for result in results) == [200, 200, 200, 500]
+
+
+def test_response_cache_and_etag(client, resources):
+    _, cached_resource = resources
+
+    result = client.simulate_get('/cached', params={'name': 'foo'})
+    assert result.json == {'name': 'foo', 'calls': 1}
+    etag = result.headers['etag']
+
+    result = client.simulate_get('/cached', params={'name': 'foo'})
+    assert result.json == {'name': 'foo', 'calls': 1}
+    assert result.headers['etag'] == etag
+
+    result = client.simulate_get(
+        '/cached',
+        params={'name': 'foo'},
+        headers={'If-None-Match': etag},
+    )
+    assert result.status_code == 304
+    assert not result.content
+
+    assert cached_resource.calls == 1
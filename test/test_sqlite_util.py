@@ -0,0 +1,26 @@
+import concurrent.futures
+
+import sqlite_util
+
+
+def test_connection_per_thread(tmp_path):
+    database = sqlite_util.SQLiteDatabase(
+        path=str(tmp_path / 'db' / 'test.sqlite'),
+        ddl='CREATE TABLE IF NOT EXISTS items (name TEXT PRIMARY KEY);',
+    )
+
+    connection = database.connection()
+    assert database.connection() is connection
+    assert connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+
+    connection.execute('INSERT INTO items VALUES (\'item\')')
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        other_connection, rows = executor.submit(lambda: (
+            database.connection(),
+            database.connection().execute('SELECT name FROM items').fetchall(),
+        )).result()
+
+    # connections must not be shared among threads, but the database is
+    assert other_connection is not connection
+    assert rows == [('item',)]
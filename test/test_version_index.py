@@ -0,0 +1,55 @@
+import pytest
+
+import version_index
+
+
+def test_version_index():
+    index = version_index.VersionIndex()
+    index.update(('1.10.0', '1.2.0', 'v1.9.0', '1.11.0-dev', '1.0.0+build', '0.1'))
+
+    assert index.versions() == ['0.1', '1.2.0', 'v1.9.0', '1.10.0']
+    assert index.versions(only_releases=False) == [
+        '0.1', '1.0.0+build', '1.2.0', 'v1.9.0', '1.10.0', '1.11.0-dev',
+    ]
+
+    assert index.greatest_version() == '1.10.0'
+    assert index.greatest_version(only_releases=False) == '1.11.0-dev'
+    assert index.greatest_version(max_version='1.9.5') == 'v1.9.0'
+    assert index.greatest_version(max_version='0.0.1') is None
+
+    assert index.greatest_versions(max_versions=2) == ['v1.9.0', '1.10.0']
+    assert index.greatest_versions(max_versions=2, max_version='v1.9.0') == ['1.2.0', 'v1.9.0']
+    assert index.greatest_versions(max_versions=10, max_version='1.2.0') == ['0.1', '1.2.0']
+
+    # versions are added and removed incrementally
+    index.update(('1.10.0', '1.2.0', 'v1.9.0', '1.11.0-dev', '1.11.0', '0.1'))
+    assert index.versions() == ['0.1', '1.2.0', 'v1.9.0', '1.10.0', '1.11.0']
+    assert index.versions(only_releases=False) == [
+        '0.1', '1.2.0', 'v1.9.0', '1.10.0', '1.11.0-dev', '1.11.0',
+    ]
+
+
+def test_invalid_versions():
+    index = version_index.VersionIndex()
+    index.update(('1.0.0', 'latest'))
+
+    assert index.greatest_version(invalid_semver_ok=True) == '1.0.0'
+    with pytest.raises(ValueError):
+        index.greatest_version()
+
+    index.update(('1.0.0',))
+    assert index.greatest_version() == '1.0.0'
+
+
+def test_shared_version_index():
+    index = version_index.version_index('example.org/shared', ('1.0.0',))
+    assert version_index.version_index('example.org/shared', ('1.0.0', '2.0.0')) is index
+    assert index.greatest_version() == '2.0.0'
+
+    other_index = version_index.version_index(
+        'example.org/shared',
+        ('3.0.0',),
+        ocm_repo_url='registry.example.org/ocm',
+    )
+    assert other_index is not index
+    assert other_index.greatest_version() == '3.0.0'
@@ -16,6 +16,10 @@ import middleware.auth
 
 logger = logging.getLogger(__name__)
 
+# for responses which never change for the requested URL (e.g. component versions are immutable);
+# not `public`, as responses must not be served to unauthenticated clients by shared caches
+IMMUTABLE_CACHE_CONTROL = ('private', 'max-age=31536000', 'immutable')
+
 
 @middleware.auth.noauth
 class Ready:
@@ -56,6 +60,35 @@ def dict_factory_date_serialisiation(data):
     return dict((k, convert_value(v)) for k, v in data)
 
 
+def is_not_modified(
+    req: falcon.Request,
+    resp: falcon.Response,
+    etag: str,
+) -> bool:
+    '''
+    sets the (strong) `etag` for the response and checks whether it matches the `If-None-Match`
+    header of the request. If so, the response is turned into a 304 (i.e. without content) and
+    `True` is returned, hence callers do not need to compute the response body.
+    '''
+    resp.etag = etag
+
+    if not req.if_none_match or not any(
+        request_etag == '*' or request_etag == etag
+        for request_etag in req.if_none_match
+    ):
+        return False
+
+    resp.status = falcon.HTTP_NOT_MODIFIED
+    resp.text = None
+    resp.media = None
+    resp.data = None
+    resp.stream = None
+    # 304 responses must not contain content, hence neither announce its type
+    resp.delete_header('Content-Type')
+
+    return True
+
+
 def retrieve_component_descriptor(
     component_id: ocm.ComponentIdentity,
     /,
@@ -0,0 +1,168 @@
+'''
+Sorted indexes of the versions of components, used to look up greatest versions without parsing
+and sorting all versions of a component for each request.
+
+Indexes are kept per component (and OCM repository) and are updated incrementally, i.e. only
+versions which were not known yet are parsed.
+'''
+import bisect
+import collections.abc
+import threading
+
+import cachetools
+import semver
+
+import version as versionutil
+
+
+class VersionIndex:
+    '''
+    versions of a component, sorted by semver (ascending). Releases (i.e. versions without
+    prerelease and build metadata) are additionally indexed separately. Versions which cannot be
+    parsed as semver are not indexed.
+    '''
+    def __init__(self):
+        self._known_versions: frozenset[str] = frozenset()
+        self._invalid_versions: set[str] = set()
+        # (parsed version, version) sorted ascending
+        self._all: list[tuple[semver.VersionInfo, str]] = []
+        self._releases: list[tuple[semver.VersionInfo, str]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_release(parsed_version: semver.VersionInfo) -> bool:
+        return not parsed_version.prerelease and not parsed_version.build
+
+    def update(
+        self,
+        versions: collections.abc.Iterable[str],
+    ):
+        versions = frozenset(versions)
+
+        with self._lock:
+            if versions == self._known_versions:
+                return
+
+            for version in self._known_versions - versions:
+                # version was removed
+                if version in self._invalid_versions:
+                    self._invalid_versions.remove(version)
+                    continue
+
+                entry = (versionutil.parse_to_semver(version), version)
+                self._all.pop(bisect.bisect_left(self._all, entry))
+                if self._is_release(entry[0]):
+                    self._releases.pop(bisect.bisect_left(self._releases, entry))
+
+            added_entries = []
+            for version in versions - self._known_versions:
+                if not (parsed_version := versionutil.parse_to_semver(
+                    version=version,
+                    invalid_semver_ok=True,
+                )):
+                    self._invalid_versions.add(version)
+                    continue
+
+                added_entries.append((parsed_version, version))
+
+            if added_entries:
+                # already sorted runs are merged in linear time
+                added_entries.sort()
+                self._all = sorted(self._all + added_entries)
+                self._releases = sorted(self._releases + [
+                    entry for entry in added_entries
+                    if self._is_release(entry[0])
+                ])
+
+            self._known_versions = versions
+
+    def _entries(
+        self,
+        only_releases: bool,
+        invalid_semver_ok: bool,
+    ) -> list[tuple[semver.VersionInfo, str]]:
+        if not invalid_semver_ok and self._invalid_versions:
+            raise ValueError(f'not a valid semver version: {next(iter(self._invalid_versions))}')
+
+        return self._releases if only_releases else self._all
+
+    def versions(
+        self,
+        only_releases: bool=True,
+        invalid_semver_ok: bool=False,
+    ) -> list[str]:
+        '''
+        returns all (valid) versions, sorted ascending
+        '''
+        with self._lock:
+            return [
+                version for _, version
+                in self._entries(only_releases, invalid_semver_ok)
+            ]
+
+    def greatest_versions(
+        self,
+        max_versions: int,
+        max_version: str=None,
+        only_releases: bool=True,
+        invalid_semver_ok: bool=False,
+    ) -> list[str]:
+        '''
+        returns the `max_versions` greatest versions (sorted ascending) which are less than or equal
+        to `max_version` (if passed)
+        '''
+        with self._lock:
+            entries = self._entries(only_releases, invalid_semver_ok)
+
+            if max_version:
+                end = bisect.bisect_right(
+                    entries,
+                    (versionutil.parse_to_semver(max_version), max_version),
+                )
+            else:
+                end = len(entries)
+
+            return [
+                version for _, version
+                in entries[max(end - max_versions, 0):end]
+            ]
+
+    def greatest_version(
+        self,
+        max_version: str=None,
+        only_releases: bool=True,
+        invalid_semver_ok: bool=False,
+    ) -> str | None:
+        if not (versions := self.greatest_versions(
+            max_versions=1,
+            max_version=max_version,
+            only_releases=only_releases,
+            invalid_semver_ok=invalid_semver_ok,
+        )):
+            return None
+
+        return versions[0]
+
+
+# (component name, ocm repository url) -> VersionIndex
+_version_indexes = cachetools.LRUCache(maxsize=4096)
+_version_indexes_lock = threading.Lock()
+
+
+def version_index(
+    component_name: str,
+    versions: collections.abc.Iterable[str],
+    ocm_repo_url: str=None,
+) -> VersionIndex:
+    '''
+    returns the version index of the given component, updated with the given (current) versions
+    '''
+    key = (component_name, ocm_repo_url)
+
+    with _version_indexes_lock:
+        if not (index := _version_indexes.get(key)):
+            _version_indexes[key] = index = VersionIndex()
+
+    index.update(versions)
+
+    return index